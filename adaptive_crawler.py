@@ -0,0 +1,183 @@
+import asyncio
+import heapq
+import logging
+import os
+import threading
+import time
+import urllib.parse
+from collections import deque
+from dotenv import load_dotenv
+from cancellation import RunCancelled, get_run_token, wait_cancellable
+from cpu_pool import get_cpu_pool
+from dedup import DedupIndex, canonicalize_url, fingerprint
+from passage_ranker import tokenize
+from telemetry import span
+
+load_dotenv()
+
+# Per-query crawl budgets, configurable from .env
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", "15"))
+CRAWL_MAX_BYTES = int(os.getenv("CRAWL_MAX_BYTES", "2000000"))
+CRAWL_DEADLINE_SECONDS = float(os.getenv("CRAWL_DEADLINE_SECONDS", "45"))
+CRAWL_MAX_STALE_PAGES = int(os.getenv("CRAWL_MAX_STALE_PAGES", "4"))
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "3"))
+DEPTH_PENALTY = 0.25
+
+_stats_lock = threading.Lock()
+crawl_stats_log = deque(maxlen=500)
+
+
+def score_link(query_terms, href, anchor_text, depth):
+    """Relevance of an outgoing link: query terms found in its anchor text count double those in its URL."""
+    if not query_terms:
+        return -depth * DEPTH_PENALTY
+    anchor_terms = set(tokenize(anchor_text or ""))
+    url_terms = set(tokenize(urllib.parse.unquote(urllib.parse.urlsplit(href).path).replace("-", " ").replace("_", " ")))
+    anchor_hits = len(query_terms & anchor_terms) / len(query_terms)
+    url_hits = len(query_terms & url_terms) / len(query_terms)
+    return 2 * anchor_hits + url_hits - depth * DEPTH_PENALTY
+
+
+def _same_site(url, seed_hosts):
+    host = (urllib.parse.urlsplit(url).hostname or "").lower()
+    return host.removeprefix("www.") in seed_hosts
+
+
+async def _crawl_page(crawler, url, depth, config):
+    with span("crawl.page", url=url, depth=depth) as page_span:
+        result = await crawler.arun(url, config=config)
+        page_span.set(success=bool(getattr(result, "success", True)), bytes=len(str(getattr(result, "markdown", "") or "")))
+        return result
+
+
+async def best_first_crawl(
+    seed_urls,
+    query,
+    max_depth=2,
+    max_pages=CRAWL_MAX_PAGES,
+    max_bytes=CRAWL_MAX_BYTES,
+    deadline_seconds=CRAWL_DEADLINE_SECONDS,
+    max_stale_pages=CRAWL_MAX_STALE_PAGES,
+    concurrency=CRAWL_CONCURRENCY,
+    token=None,
+):
+    """Crawl the most query-relevant pages reachable from the seeds until a budget runs out or the run is cancelled.
+
+    Returns (pages, stats) where pages are dicts with url, depth and markdown for pages that added novel content.
+    """
+    token = token or get_run_token()
+    start = time.monotonic()
+    query_terms = set(tokenize(query))
+    seed_hosts = {(urllib.parse.urlsplit(u).hostname or "").lower().removeprefix("www.") for u in seed_urls}
+    novelty = DedupIndex()
+    frontier = []
+    seen = set()
+    counter = 0
+    for url in seed_urls:
+        key = canonicalize_url(url)
+        if key not in seen:
+            seen.add(key)
+            # Seeds are always crawled first, in search-rank order
+            heapq.heappush(frontier, (-float("inf"), counter, url, 0))
+            counter += 1
+
+    stats = {
+        "query": query,
+        "pages_fetched": 0,
+        "pages_kept": 0,
+        "bytes_fetched": 0,
+        "stop_reason": "frontier_exhausted",
+    }
+    pages = []
+    stale = 0
+    # crawl4ai pulls in Playwright; it is loaded on the first crawl rather than at app start
+    from crawl4ai import AsyncWebCrawler, CrawlerRunConfig
+    from crawl4ai.content_scraping_strategy import LXMLWebScrapingStrategy
+
+    config = CrawlerRunConfig(scraping_strategy=LXMLWebScrapingStrategy(), verbose=True)
+
+    async with AsyncWebCrawler() as crawler:
+        while frontier:
+            if stats["pages_fetched"] >= max_pages:
+                stats["stop_reason"] = "page_budget"
+                break
+            if stats["bytes_fetched"] >= max_bytes:
+                stats["stop_reason"] = "byte_budget"
+                break
+            remaining = deadline_seconds - (time.monotonic() - start)
+            if remaining <= 0:
+                stats["stop_reason"] = "deadline"
+                break
+            if stale >= max_stale_pages:
+                stats["stop_reason"] = "no_novel_content"
+                break
+            if token.cancelled():
+                stats["stop_reason"] = "cancelled"
+                break
+
+            batch = []
+            while frontier and len(batch) < min(concurrency, max_pages - stats["pages_fetched"]):
+                _, _, url, depth = heapq.heappop(frontier)
+                batch.append((url, depth))
+            try:
+                results = await wait_cancellable(
+                    asyncio.gather(
+                        *(_crawl_page(crawler, url, depth, config) for url, depth in batch),
+                        return_exceptions=True,
+                    ),
+                    token,
+                    timeout=remaining,
+                )
+            except asyncio.TimeoutError:
+                stats["stop_reason"] = "deadline"
+                break
+            except RunCancelled:
+                # Pages already kept are still returned, so the step can use the evidence gathered so far
+                stats["stop_reason"] = "cancelled"
+                break
+
+            # Fingerprints for the novelty check are computed for the whole batch at once, in the CPU pool if configured
+            markdowns = ["" if isinstance(result, Exception) else str(getattr(result, "markdown", "") or "") for result in results]
+            pool = get_cpu_pool()
+            records = await asyncio.gather(*(pool.arun(fingerprint, markdown, url) for markdown, (url, _) in zip(markdowns, batch)))
+
+            for (url, depth), result, markdown, record in zip(batch, results, markdowns, records):
+                stats["pages_fetched"] += 1
+                if isinstance(result, Exception) or not getattr(result, "success", True):
+                    error = result if isinstance(result, Exception) else getattr(result, "error_message", "")
+                    logging.error(f"Deep crawl error for {url}: {error}")
+                    continue
+                stats["bytes_fetched"] += len(markdown.encode("utf-8"))
+                if markdown and novelty.is_novel(markdown, url, record):
+                    pages.append({"url": url, "depth": depth, "markdown": markdown})
+                    stats["pages_kept"] += 1
+                    stale = 0
+                else:
+                    stale += 1
+                if depth >= max_depth:
+                    continue
+                links = (getattr(result, "links", None) or {}).get("internal", [])
+                for link in links:
+                    href = urllib.parse.urljoin(url, link.get("href", ""))
+                    key = canonicalize_url(href)
+                    if not href.startswith("http") or key in seen or not _same_site(href, seed_hosts):
+                        continue
+                    seen.add(key)
+                    score = score_link(query_terms, href, link.get("text", ""), depth + 1)
+                    heapq.heappush(frontier, (-score, counter, href, depth + 1))
+                    counter += 1
+
+    stats["elapsed_seconds"] = round(time.monotonic() - start, 2)
+    logging.info(
+        f"Crawl stats for '{query}': fetched {stats['pages_fetched']}, kept {stats['pages_kept']}, "
+        f"{stats['bytes_fetched']} bytes in {stats['elapsed_seconds']}s (stopped: {stats['stop_reason']})"
+    )
+    with _stats_lock:
+        crawl_stats_log.append(stats)
+    return pages, stats
+
+
+def get_crawl_stats():
+    """Return the per-query crawl stats recorded so far in this process."""
+    with _stats_lock:
+        return list(crawl_stats_log)
@@ -0,0 +1,110 @@
+"""Throughput of CPU-bound parsing, extraction and ranking with and without the CPU pool (cpu_pool.py).
+
+Usage: python benchmarks/bench_cpu_pool.py [--sessions 1 4 8] [--steps 10] [--workers N] [--io-latency 0.05]
+
+Each session is a thread running research steps one after another, the way concurrent Streamlit sessions share
+one server process. A step waits --io-latency seconds (standing in for its network calls), then processes what it
+fetched: dedup fingerprints and BM25 passage selection for the crawled pages in benchmarks/fixtures, HTML head
+extraction for the same pages rendered as HTML, and parsing of an arXiv Atom feed. Inline, that work serializes on
+the GIL across sessions; with the pool it is spread over --workers processes (default: one per CPU).
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import sys
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+
+def load_workload():
+    from markdown_it import MarkdownIt
+
+    with open(os.path.join(BENCH_DIR, "fixtures", "crawl_pages.json"), encoding="utf-8") as f:
+        pages = json.load(f)
+    html = [f"<html><head><title>{page['url']}</title></head><body>{MarkdownIt().render(page['markdown'])}</body></html>".encode("utf-8")
+            for page in pages]
+    with open(os.path.join(BENCH_DIR, "fixtures", "pipeline", "arxiv.xml"), "rb") as f:
+        feed = f.read()
+    # Repeat the fixture's entries to the size of a 50-result page
+    head, _, rest = feed.partition(b"<entry>")
+    entries, _, tail = rest.rpartition(b"</entry>")
+    feed = head + (b"<entry>" + entries + b"</entry>") * 25 + tail
+    return pages, html, feed
+
+
+def run_step(pool, pages, html, feed):
+    from cpu_pool import page_head
+    from dedup import fingerprint
+    from passage_ranker import PASSAGE_TOKEN_BUDGET, select_passages
+    from sources.arxiv import parse_feed
+
+    futures = [pool.submit(fingerprint, page["markdown"], page["url"]) for page in pages]
+    futures += [pool.submit(select_passages, page["markdown"], page["query"], PASSAGE_TOKEN_BUDGET, False) for page in pages]
+    futures += [pool.submit(page_head, body) for body in html]
+    futures.append(pool.submit(parse_feed, feed))
+    return [future.result() for future in futures]
+
+
+def run_sessions(pool, sessions, steps, io_latency, workload):
+    latencies = []
+    lock = threading.Lock()
+
+    def session():
+        for _ in range(steps):
+            start = time.perf_counter()
+            time.sleep(io_latency)
+            run_step(pool, *workload)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=sessions) as executor:
+        for future in [executor.submit(session) for _ in range(sessions)]:
+            future.result()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "seconds": round(elapsed, 2),
+        "steps_per_second": round(sessions * steps / elapsed, 2),
+        "p50_step": round(latencies[len(latencies) // 2], 3),
+        "p90_step": round(latencies[min(len(latencies) - 1, int(0.9 * len(latencies)))], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--steps", type=int, default=10, help="Steps per session.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--io-latency", type=float, default=0.05, help="Seconds of simulated network wait per step.")
+    args = parser.parse_args()
+
+    from cpu_pool import CpuPool
+
+    workload = load_workload()
+    inline = CpuPool(workers=0)
+    pool = CpuPool(workers=args.workers)
+    start = time.perf_counter()
+    pids = pool.warm_up()
+    print(f"CPU pool: {len(pids)} workers warmed up in {time.perf_counter() - start:.2f}s ({os.cpu_count()} CPUs)")
+    # One untimed step per mode, so lazy imports and caches are not measured
+    run_step(inline, *workload)
+    run_step(pool, *workload)
+
+    print(f"{'sessions':>8} {'mode':<7} {'seconds':>8} {'steps/s':>8} {'p50 step':>9} {'p90 step':>9}")
+    try:
+        for sessions in args.sessions:
+            for mode, candidate in [("inline", inline), ("pool", pool)]:
+                r = run_sessions(candidate, sessions, args.steps, args.io_latency, workload)
+                print(f"{sessions:>8} {mode:<7} {r['seconds']:>8.2f} {r['steps_per_second']:>8.2f} "
+                      f"{r['p50_step']:>8.3f}s {r['p90_step']:>8.3f}s")
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Benchmark the DOCX exporter on a synthetic ~50-page report against the previous HTML/BeautifulSoup exporter.
+
+Usage: python benchmarks/bench_docx_export.py [pages]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx_exporter import markdown_to_docx
+from export_pipeline import ExportPipeline
+
+WORDS = (
+    "research market growth analysis policy energy battery model inference data evidence source "
+    "report trend impact regulation investment supply demand price forecast region study"
+).split()
+
+
+def sentence(rng, n=18):
+    words = [rng.choice(WORDS) for _ in range(n)]
+    words[1] = f"**{words[1]}**"
+    words[-1] = f"*{words[-1]}*"
+    return " ".join(words).capitalize() + f" [S{rng.randint(1, 80)}]."
+
+
+def synthetic_report(pages=50, seed=1):
+    """Roughly 500 words per page: headings, paragraphs, nested lists and a table every few pages."""
+    rng = random.Random(seed)
+    parts = ["# Synthetic Research Report"]
+    for page in range(pages):
+        parts.append(f"## Section {page + 1}")
+        for _ in range(3):
+            parts.append(" ".join(sentence(rng) for _ in range(5)))
+        parts.append("\n".join(
+            f"- {sentence(rng, 8)}\n  - {sentence(rng, 6)}\n    - {sentence(rng, 4)}" for _ in range(3)
+        ))
+        parts.append("\n".join(f"{i}. {sentence(rng, 8)}" for i in range(1, 4)))
+        if page % 3 == 0:
+            rows = "\n".join(f"| {rng.choice(WORDS)} | {rng.randint(1, 999)} | {sentence(rng, 5)} |" for _ in range(8))
+            parts.append(f"| Metric | Value | Note |\n|---|---|---|\n{rows}")
+    return "\n\n".join(parts)
+
+
+def legacy_markdown_to_docx(markdown_text):
+    """The exporter previously duplicated in bfsapp/dfsapp: markdown -> HTML -> BeautifulSoup -> python-docx."""
+    import markdown as md
+    from bs4 import BeautifulSoup
+    from docx import Document
+    from docx.oxml import parse_xml
+    from docx.oxml.ns import nsdecls
+
+    html = md.markdown(markdown_text, extensions=['tables'])
+    soup = BeautifulSoup(html, "html.parser")
+    doc = Document()
+    doc.add_heading("DeepQuest Research Report", 0)
+    for element in soup.children:
+        if element.name and element.name.startswith("h") and element.name[1:].isdigit():
+            doc.add_heading(element.get_text(), level=int(element.name[1:]))
+        elif element.name == "ul":
+            for li in element.find_all("li"):
+                doc.add_paragraph(li.get_text(), style="List Bullet")
+        elif element.name == "ol":
+            for li in element.find_all("li"):
+                doc.add_paragraph(li.get_text(), style="List Number")
+        elif element.name == "p":
+            doc.add_paragraph(element.get_text())
+        elif element.name == "table":
+            rows = element.find_all("tr")
+            if not rows:
+                continue
+            table = doc.add_table(rows=len(rows), cols=len(rows[0].find_all(["td", "th"])))
+            for row_idx, row in enumerate(rows):
+                for col_idx, cell in enumerate(row.find_all(["td", "th"])):
+                    table.cell(row_idx, col_idx).text = cell.get_text()
+            table._tbl.tblPr.append(parse_xml(r'''
+                <w:tblBorders %s>
+                    <w:top w:val="single" w:sz="4" w:space="0" w:color="auto"/>
+                    <w:left w:val="single" w:sz="4" w:space="0" w:color="auto"/>
+                    <w:bottom w:val="single" w:sz="4" w:space="0" w:color="auto"/>
+                    <w:right w:val="single" w:sz="4" w:space="0" w:color="auto"/>
+                    <w:insideH w:val="single" w:sz="4" w:space="0" w:color="auto"/>
+                    <w:insideV w:val="single" w:sz="4" w:space="0" w:color="auto"/>
+                </w:tblBorders>''' % nsdecls('w')))
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def timed(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run(pages=50):
+    report = synthetic_report(pages)
+    print(f"Report: {pages} pages, {len(report.split())} words, {len(report)} chars")
+    try:
+        print(f"legacy HTML/BeautifulSoup exporter: {timed(legacy_markdown_to_docx, report):8.1f} ms")
+    except ImportError as e:
+        print(f"legacy exporter skipped ({e})")
+    print(f"token-stream exporter (cold):       {timed(markdown_to_docx, report):8.1f} ms")
+    # Reruns and repeated downloads are served from the export pipeline's rendered file
+    pipeline = ExportPipeline(export_dir=tempfile.mkdtemp(prefix="bench_docx_"))
+    pipeline.request("docx", report).result()
+    cached = timed(lambda: pipeline.request("docx", report).result(), repeat=20)
+    print(f"export pipeline (cached):           {cached:8.3f} ms")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
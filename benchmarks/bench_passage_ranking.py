@@ -0,0 +1,40 @@
+"""Measure prompt-size reduction from passage ranking on saved crawl fixtures.
+
+Usage: python benchmarks/bench_passage_ranking.py [fixture.json ...]
+Each fixture is a JSON list of {"url", "query", "markdown"} records saved from a deep crawl.
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup import estimate_tokens
+from passage_ranker import PASSAGE_TOKEN_BUDGET, select_passages
+
+DEFAULT_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "crawl_pages.json")
+
+
+def run(paths, token_budget=PASSAGE_TOKEN_BUDGET):
+    total_before = total_after = 0
+    print(f"{'url':<50} {'tokens before':>14} {'tokens after':>13} {'ms':>8}")
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            pages = json.load(f)
+        for page in pages:
+            start = time.perf_counter()
+            selected = select_passages(page["markdown"], page["query"], token_budget, use_embeddings=False)
+            elapsed = (time.perf_counter() - start) * 1000
+            before = estimate_tokens(page["markdown"])
+            after = estimate_tokens(selected)
+            total_before += before
+            total_after += after
+            print(f"{page['url'][:50]:<50} {before:>14} {after:>13} {elapsed:>8.1f}")
+    reduction = 100 * (1 - total_after / total_before) if total_before else 0.0
+    print(f"\nTotal: {total_before} -> {total_after} tokens ({reduction:.1f}% reduction, budget {token_budget}/page)")
+    return {"tokens_before": total_before, "tokens_after": total_after, "reduction_pct": reduction}
+
+
+if __name__ == "__main__":
+    run(sys.argv[1:] or [DEFAULT_FIXTURE])
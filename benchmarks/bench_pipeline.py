@@ -0,0 +1,220 @@
+"""Offline end-to-end benchmark of a research run: plan, batched step execution with replanning, and report.
+
+Usage:
+  python benchmarks/bench_pipeline.py [--modes bfs dfs] [--repeat 3] [--llm-latency 0.05] [--http-latency 0.02]
+  python benchmarks/bench_pipeline.py --write-baseline   # record benchmarks/baselines/pipeline.json
+  python benchmarks/bench_pipeline.py --check            # exit 1 if slower or costlier than the baseline
+
+LLM calls and source HTTP are answered from benchmarks/fixtures/pipeline (see replay.py), so no keys or network
+are needed. Each run executes in a fresh subprocess so caches, the ticker index and the quota ledger start empty.
+Timings are medians over --repeat runs; token counts are deterministic for a given fixture set.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baselines", "pipeline.json")
+TIME_TOLERANCE = 0.25
+TOKEN_TOLERANCE = 0.02
+# Differences below this many seconds are treated as noise, whatever the relative change
+TIME_NOISE_FLOOR = 0.1
+STAGES = ["plan", "steps", "replan", "report"]
+
+
+def _peak_memory_mb():
+    try:
+        import resource
+    except ImportError:
+        import tracemalloc
+
+        return round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 2**20 if sys.platform == "darwin" else 2**10
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+
+
+def worker(mode, llm_latency, http_latency, map_reduce):
+    """Run one research session the way bfsapp.py / dfsapp.py do and return its metrics."""
+    import logging
+    import tracemalloc
+
+    logging.basicConfig(level=logging.WARNING)
+    if sys.platform == "win32":
+        tracemalloc.start()
+    from replay import isolate_environment
+
+    isolate_environment(tempfile.mkdtemp(prefix="bench_pipeline_"))
+    if map_reduce:
+        os.environ["MAP_REDUCE_THRESHOLD_TOKENS"] = "0"
+
+    import contextlib
+
+    from dedup import estimate_tokens
+    from engine import execute_plan, finish, plan, research_mode
+    from replay import install
+    from run_context import RunContext
+    from speculative import SpeculativePrefetcher
+
+    execute_step, registry = research_mode(mode)
+    llm, session = install(llm_latency, http_latency)
+    query = llm.fixtures["query"]
+    metrics = {stage: {"seconds": 0.0, "llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0} for stage in STAGES}
+
+    @contextlib.contextmanager
+    def timed(stage):
+        before = llm.snapshot()
+        start = time.perf_counter()
+        yield
+        metrics[stage]["seconds"] += time.perf_counter() - start
+        after = llm.snapshot()
+        metrics[stage]["llm_calls"] += after["calls"] - before["calls"]
+        metrics[stage]["prompt_tokens"] += after["prompt_tokens"] - before["prompt_tokens"]
+        metrics[stage]["completion_tokens"] += after["completion_tokens"] - before["completion_tokens"]
+
+    run = RunContext()
+    run_start = time.perf_counter()
+    # Prefetching is always on here, whatever SPECULATIVE_PREFETCH says
+    prefetcher = SpeculativePrefetcher(registry)
+    with timed("plan"):
+        steps = plan(query, run, prefetcher, max_steps=20)
+    _, completed_steps, context, _ = execute_plan(
+        query, steps, run, execute_step, prefetcher=prefetcher, max_steps=20, stage=timed
+    )
+    prefetcher.close()
+    with timed("report"):
+        report = finish(query, completed_steps, context, run)
+    total = time.perf_counter() - run_start
+
+    for stage in metrics.values():
+        stage["seconds"] = round(stage["seconds"], 3)
+    return {
+        "mode": mode,
+        "seconds": round(total, 3),
+        "stages": metrics,
+        "steps": len(completed_steps),
+        "llm_calls": llm.stats["calls"],
+        "prompt_tokens": llm.stats["prompt_tokens"],
+        "completion_tokens": llm.stats["completion_tokens"],
+        "http_requests": dict(sorted(session.requests.items())),
+        "report_tokens": estimate_tokens(report),
+        "peak_memory_mb": _peak_memory_mb(),
+    }
+
+
+def _median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+
+
+def run_mode(mode, args):
+    runs = []
+    for _ in range(args.repeat):
+        command = [
+            sys.executable, os.path.abspath(__file__), "--worker", mode,
+            "--llm-latency", str(args.llm_latency), "--http-latency", str(args.http_latency),
+        ]
+        if args.map_reduce:
+            command.append("--map-reduce")
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            sys.exit(f"{mode} run failed:\n{completed.stderr}")
+        runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    summary = dict(runs[0])
+    summary["seconds"] = round(_median([r["seconds"] for r in runs]), 3)
+    summary["stages"] = {
+        stage: dict(runs[0]["stages"][stage], seconds=round(_median([r["stages"][stage]["seconds"] for r in runs]), 3))
+        for stage in STAGES
+    }
+    summary["peak_memory_mb"] = max(r["peak_memory_mb"] for r in runs)
+    summary["settings"] = {"llm_latency": args.llm_latency, "http_latency": args.http_latency, "map_reduce": args.map_reduce}
+    return summary
+
+
+def print_summary(summary):
+    print(
+        f"{summary['mode']}: {summary['seconds']:.2f}s, {summary['steps']} steps, {summary['llm_calls']} LLM calls, "
+        f"{summary['prompt_tokens']}+{summary['completion_tokens']} tokens, "
+        f"{sum(summary['http_requests'].values())} HTTP requests, report ~{summary['report_tokens']} tokens, "
+        f"peak {summary['peak_memory_mb']} MB"
+    )
+    for stage in STAGES:
+        m = summary["stages"][stage]
+        print(
+            f"  {stage:<8} {m['seconds']:>7.2f}s  {m['llm_calls']:>3} calls  "
+            f"{m['prompt_tokens']:>7} prompt  {m['completion_tokens']:>6} completion tokens"
+        )
+
+
+def regressions(summary, baseline):
+    """Human-readable regressions of a summary against its baseline entry."""
+    found = []
+    checks = [("total", summary["seconds"], baseline["seconds"])]
+    checks += [(stage, summary["stages"][stage]["seconds"], baseline["stages"][stage]["seconds"]) for stage in STAGES]
+    for label, current, recorded in checks:
+        if current - recorded > TIME_NOISE_FLOOR and current > recorded * (1 + TIME_TOLERANCE):
+            found.append(f"{label} time {recorded:.2f}s -> {current:.2f}s")
+    for key in ["prompt_tokens", "completion_tokens", "llm_calls"]:
+        if summary[key] > baseline[key] * (1 + TOKEN_TOLERANCE):
+            found.append(f"{key} {baseline[key]} -> {summary[key]}")
+    if sum(summary["http_requests"].values()) > sum(baseline["http_requests"].values()):
+        found.append(f"HTTP requests {baseline['http_requests']} -> {summary['http_requests']}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["bfs", "dfs"], choices=["bfs", "dfs"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds added to every LLM call.")
+    parser.add_argument("--http-latency", type=float, default=0.02, help="Seconds added to every source request.")
+    parser.add_argument("--map-reduce", action="store_true", help="Force the map-reduce report writer.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--write-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("--worker", choices=["bfs", "dfs"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(worker(args.worker, args.llm_latency, args.http_latency, args.map_reduce)))
+        return
+
+    summaries = {mode: run_mode(mode, args) for mode in args.modes}
+    for summary in summaries.values():
+        print_summary(summary)
+
+    if args.write_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(summaries, f, indent=1)
+        print(f"Baseline written to {args.baseline}")
+    if args.check:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        failed = False
+        for mode, summary in summaries.items():
+            if mode not in baseline:
+                print(f"{mode}: no baseline entry, skipped")
+                continue
+            if baseline[mode].get("settings") != summary["settings"]:
+                print(f"{mode}: baseline was recorded with {baseline[mode].get('settings')}, skipped")
+                continue
+            found = regressions(summary, baseline[mode])
+            for regression in found:
+                print(f"REGRESSION {mode}: {regression}")
+            failed = failed or bool(found)
+        if failed:
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
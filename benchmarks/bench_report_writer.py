@@ -0,0 +1,94 @@
+"""Compare wall-clock of the single-shot and map-reduce report writers on a research run.
+
+Usage:
+  python benchmarks/bench_report_writer.py --replay [--llm-latency 0.05] [--mode bfs]
+  python benchmarks/bench_report_writer.py [--replay] run.json
+
+--replay answers every LLM call from benchmarks/fixtures/pipeline (see replay.py), so no keys or network are needed;
+without run.json it first researches the fixture query the way bench_pipeline.py does and writes reports from that
+run. Without --replay the configured Azure OpenAI deployments are called, so it needs the usual .env.
+run.json holds {"query": ..., "completed_steps": [{"step": ..., "result": ...}, ...]}.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+
+def load_run(path):
+    with open(path, encoding="utf-8") as f:
+        saved = json.load(f)
+    return saved["query"], [(s["step"], s["result"]) for s in saved["completed_steps"]]
+
+
+def research_run(query, mode):
+    """Completed steps of a replayed research run on the query."""
+    from engine import execute_plan, plan, research_mode
+    from run_context import RunContext
+
+    execute_step, _ = research_mode(mode)
+    run = RunContext()
+    steps = plan(query, run, max_steps=20)
+    _, completed_steps, _, _ = execute_plan(query, steps, run, execute_step, max_steps=20)
+    return completed_steps
+
+
+def run(query, completed_steps, llm=None):
+    from dedup import estimate_tokens
+    from writer import map_reduce_report_writer, report_writer
+
+    context = "".join(f"\nStep: {step}\nResult: {result}\n" for step, result in completed_steps)
+    print(f"{len(completed_steps)} steps, ~{estimate_tokens(context)} context tokens")
+
+    timings = {}
+    for name, write in [
+        ("single-shot", lambda: report_writer(context)),
+        ("map-reduce", lambda: map_reduce_report_writer(query, completed_steps)),
+    ]:
+        before = llm.snapshot() if llm else None
+        start = time.perf_counter()
+        try:
+            report = write()
+            timings[name] = {"seconds": round(time.perf_counter() - start, 1), "report_tokens": estimate_tokens(report)}
+        except Exception as e:
+            timings[name] = {"seconds": round(time.perf_counter() - start, 1), "error": str(e)}
+        if llm:
+            after = llm.snapshot()
+            timings[name].update({key: after[key] - before[key] for key in ["calls", "prompt_tokens", "completion_tokens"]})
+        print(f"{name:<12} {timings[name]}")
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("run", nargs="?", help="Saved run.json; with --replay, omit it to research the fixture query.")
+    parser.add_argument("--replay", action="store_true", help="Answer LLM and source calls from recorded fixtures.")
+    parser.add_argument("--mode", choices=["bfs", "dfs"], default="bfs", help="Research mode of the replayed run.")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds added to every replayed LLM call.")
+    parser.add_argument("--http-latency", type=float, default=0.0, help="Seconds added to every replayed source request.")
+    args = parser.parse_args()
+    if not args.run and not args.replay:
+        parser.error("pass run.json or --replay")
+
+    llm = None
+    if args.replay:
+        from replay import install, isolate_environment
+
+        isolate_environment(tempfile.mkdtemp(prefix="bench_report_writer_"))
+        llm, _ = install(args.llm_latency, args.http_latency)
+    if args.run:
+        query, completed_steps = load_run(args.run)
+    else:
+        query = llm.fixtures["query"]
+        completed_steps = research_run(query, args.mode)
+    run(query, completed_steps, llm)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Cold-start time of the Streamlit apps, the research service and the MCP servers, and Streamlit rerun time.
+
+Usage: python benchmarks/bench_startup.py [--entry-points bfsapp.py googlemcp.py ...] [--repeat 5] [--reruns 5]
+
+Each entry point is imported in --repeat fresh interpreters, as a container or a new Streamlit server process
+would. Scripts with a __main__ guard (service, MCP servers) are imported whole, which also builds their server
+objects; the Streamlit apps are scripts, so only their top-level imports are timed. Reports the median import
+time, the median process time including interpreter start, and the heaviest top-level imports of one run
+(python -X importtime). With Streamlit installed, each app is also run once and rerun --reruns times through
+streamlit.testing.AppTest, the way a widget interaction reruns the script.
+"""
+import argparse
+import ast
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+ENTRY_POINTS = [
+    "bfsapp.py", "dfsapp.py", "research_service.py",
+    "arXivmcp.py", "googlemcp.py", "newsapimcp.py", "secmcp.py", "wikipediamcp.py",
+]
+APPS = ["bfsapp.py", "dfsapp.py"]
+
+
+def modules_to_import(path):
+    """The module itself when it has a __main__ guard, else the modules its top level imports."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.If) and "__main__" in ast.unparse(node.test):
+            return [os.path.splitext(os.path.basename(path))[0]]
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            names.append(node.module)
+    return list(dict.fromkeys(names))
+
+
+def time_import(modules):
+    """(import seconds, process seconds, importtime report) of importing the modules in a fresh interpreter."""
+    code = (
+        "import importlib, time\n"
+        "start = time.perf_counter()\n"
+        f"for name in {modules!r}:\n"
+        "    importlib.import_module(name)\n"
+        "print(time.perf_counter() - start)\n"
+    )
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=REPO_DIR, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed")
+    return float(result.stdout.strip().splitlines()[-1]), elapsed, result.stderr
+
+
+def heaviest_imports(report, top=4):
+    """Top-level packages of an importtime report by cumulative time, as 'name 0.00s'."""
+    totals = {}
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit() or name.startswith("   "):
+            continue
+        root = name.strip().split(".")[0]
+        totals[root] = totals.get(root, 0) + int(cumulative) / 1e6
+    ranked = sorted(totals.items(), key=lambda item: -item[1])[:top]
+    return ", ".join(f"{name} {seconds:.2f}s" for name, seconds in ranked)
+
+
+def time_reruns(path, reruns):
+    """(first run seconds, median rerun seconds, first exception or None) of a Streamlit app script under AppTest."""
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(path, default_timeout=120)
+    start = time.perf_counter()
+    app.run()
+    first = time.perf_counter() - start
+    durations = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        app.run()
+        durations.append(time.perf_counter() - start)
+    return first, statistics.median(durations), app.exception[0].message if app.exception else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entry-points", nargs="+", default=ENTRY_POINTS)
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per entry point.")
+    parser.add_argument("--reruns", type=int, default=5, help="Streamlit reruns per app (0 to skip).")
+    args = parser.parse_args()
+
+    from replay import isolate_environment
+
+    # Stores opened at import (quota ledger, filing and news caches) go to a scratch directory
+    isolate_environment(tempfile.mkdtemp(prefix="bench_startup_"))
+
+    print(f"{'entry point':<22} {'import':>8} {'process':>8}  heaviest imports")
+    for entry in args.entry_points:
+        modules = modules_to_import(os.path.join(REPO_DIR, entry))
+        try:
+            runs = [time_import(modules) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"{entry:<22} failed: {e}")
+            continue
+        import_seconds = statistics.median(run[0] for run in runs)
+        process_seconds = statistics.median(run[1] for run in runs)
+        print(f"{entry:<22} {import_seconds:>7.2f}s {process_seconds:>7.2f}s  {heaviest_imports(runs[0][2])}")
+
+    if args.reruns:
+        try:
+            import streamlit.testing.v1  # noqa: F401
+        except ImportError:
+            print("Streamlit testing API not available; skipping rerun timings.")
+            return
+        for entry in [e for e in APPS if e in args.entry_points]:
+            first, rerun, error = time_reruns(os.path.join(REPO_DIR, entry), args.reruns)
+            print(f"{entry:<22} first run {first:.2f}s, rerun median {rerun:.3f}s" + (f" (script raised: {error})" if error else ""))
+
+
+if __name__ == "__main__":
+    main()
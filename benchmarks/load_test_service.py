@@ -0,0 +1,159 @@
+"""Load test for research_service.py: several tenants submit research jobs concurrently and follow them over SSE.
+
+Usage:
+  python benchmarks/load_test_service.py --replay [--tenants 3] [--jobs 4] [--workers 2]
+  python benchmarks/load_test_service.py --url http://localhost:8080 [--tenants 3] [--jobs 4]
+
+--replay starts the service in-process with its engine threads answering from the recorded fixtures in
+benchmarks/fixtures/pipeline (see replay.py), so no keys or network are needed. --url targets a running service
+(real LLM and source calls; mind the cost). Rejected submissions (429/503) are retried after Retry-After.
+Reports submit latency, queue wait, time to first step, end-to-end time, throughput and rejections per tenant.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+
+async def _follow(session, base_url, job_id, headers, record):
+    """Read the job's SSE stream until it ends, noting when the first step and the final event arrive."""
+    event_type = None
+    async with session.get(f"{base_url}/research/{job_id}/events", headers=headers, timeout=None) as response:
+        async for raw in response.content:
+            line = raw.decode("utf-8").rstrip("\r\n")
+            if line.startswith("event: "):
+                event_type = line[len("event: "):]
+            elif line.startswith("data: "):
+                event = json.loads(line[len("data: "):])
+                now = time.perf_counter()
+                if event_type == "started":
+                    record.setdefault("started", now)
+                elif event_type == "step":
+                    record.setdefault("first_step", now)
+                elif event_type in ("done", "failed", "cancelled"):
+                    record["status"] = event_type
+                    record["finished"] = now
+                    return
+
+
+async def run_job(session, base_url, tenant, query, mode, max_steps, retry_scale, stats):
+    headers = {"X-Tenant-Id": tenant}
+    record = {"tenant": tenant, "rejections": 0}
+    record["submitted"] = time.perf_counter()
+    while True:
+        start = time.perf_counter()
+        async with session.post(f"{base_url}/research", json={"query": query, "mode": mode, "max_steps": max_steps},
+                                headers=headers) as response:
+            body = await response.json()
+            record["submit_latency"] = time.perf_counter() - start
+            if response.status == 202:
+                break
+            if response.status not in (429, 503):
+                record["status"] = f"http {response.status}: {body.get('error')}"
+                return record
+            stats[response.status] = stats.get(response.status, 0) + 1
+            record["rejections"] += 1
+            await asyncio.sleep(float(response.headers.get("Retry-After", "1")) * retry_scale)
+    record["accepted"] = time.perf_counter()
+    await _follow(session, base_url, body["id"], headers, record)
+    async with session.get(f"{base_url}/research/{body['id']}/report", headers=headers) as response:
+        record["report_bytes"] = len(await response.read()) if response.status == 200 else 0
+    return record
+
+
+async def _serve_replay(args):
+    """Start research_service in this process with replayed LLM and source calls; returns (base_url, runner)."""
+    from aiohttp import web
+    from replay import install, isolate_environment
+
+    isolate_environment(tempfile.mkdtemp(prefix="load_test_service_"))
+    import research_service
+
+    service = research_service.ResearchService(
+        workers=args.workers, max_queued=args.max_queued, tenant_max_active=args.tenant_max_active,
+        initializer=install, initargs=(args.llm_latency, args.http_latency),
+    )
+    runner = web.AppRunner(research_service.create_app(service))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", args.port)
+    await site.start()
+    return f"http://127.0.0.1:{args.port}", runner
+
+
+async def main(args):
+    import aiohttp
+
+    runner = None
+    base_url = args.url.rstrip("/") if args.url else None
+    if base_url is None:
+        base_url, runner = await _serve_replay(args)
+    with open(os.path.join(BENCH_DIR, "fixtures", "pipeline", "llm.json"), encoding="utf-8") as f:
+        query = json.load(f)["query"]
+    stats = {}
+    start = time.perf_counter()
+    try:
+        async with aiohttp.ClientSession() as session:
+            records = await asyncio.gather(*(
+                run_job(session, base_url, f"tenant-{t}", f"{query} (job {j})", args.mode, args.max_steps, args.retry_scale, stats)
+                for t in range(args.tenants) for j in range(args.jobs)
+            ))
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+    elapsed = time.perf_counter() - start
+
+    done = [r for r in records if r.get("status") == "done"]
+    print(f"{len(done)}/{len(records)} jobs done in {elapsed:.1f}s ({len(done) / elapsed * 60:.1f} jobs/min); "
+          f"rejections: {stats.get(429, 0)} x 429, {stats.get(503, 0)} x 503")
+    metrics = {
+        "submit latency": [r["submit_latency"] for r in records if "submit_latency" in r],
+        "queue wait": [r["started"] - r["accepted"] for r in done if "started" in r],
+        "first step": [r["first_step"] - r["submitted"] for r in done if "first_step" in r],
+        "end to end": [r["finished"] - r["submitted"] for r in done],
+    }
+    for name, values in metrics.items():
+        print(f"  {name:<15} p50 {_percentile(values, 0.5)}s  p90 {_percentile(values, 0.9)}s  max {_percentile(values, 1.0)}s")
+    for t in range(args.tenants):
+        tenant_records = [r for r in records if r["tenant"] == f"tenant-{t}"]
+        finished = [r["finished"] - r["submitted"] for r in tenant_records if r.get("status") == "done"]
+        print(f"  tenant-{t}: {len(finished)} done, median end to end {_percentile(finished, 0.5)}s, "
+              f"{sum(r['rejections'] for r in tenant_records)} rejections")
+    failed = [r for r in records if r.get("status") != "done"]
+    for r in failed:
+        print(f"  {r['tenant']}: {r.get('status', 'unfinished')}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of a running service; omit with --replay.")
+    parser.add_argument("--replay", action="store_true", help="Start a local service on recorded fixtures.")
+    parser.add_argument("--tenants", type=int, default=3)
+    parser.add_argument("--jobs", type=int, default=4, help="Jobs per tenant, submitted at once.")
+    parser.add_argument("--mode", choices=["bfs", "dfs"], default="bfs")
+    parser.add_argument("--max-steps", type=int, default=20)
+    parser.add_argument("--retry-scale", type=float, default=0.05, help="Multiplier on Retry-After before resubmitting.")
+    parser.add_argument("--workers", type=int, default=4, help="Jobs run at once (--replay only).")
+    parser.add_argument("--max-queued", type=int, default=4, help="Queue limit (--replay only).")
+    parser.add_argument("--tenant-max-active", type=int, default=2, help="Per-tenant limit (--replay only).")
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--http-latency", type=float, default=0.02)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    if not args.url and not args.replay:
+        parser.error("pass --url or --replay")
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,319 @@
+"""Recorded stand-ins for the Azure OpenAI client and the aiohttp session, used by bench_pipeline.py.
+
+ReplayLLMClient answers chat.completions.create() from fixtures/pipeline/llm.json: the plan, replans, tool calls,
+step answers and report parts are picked from the request (response_format, functions, prompt markers), so a run
+takes the same path through planner, executor and writer as a live one. ReplaySession serves the source APIs from
+fixtures/pipeline/http.json and arxiv.xml, with the query substituted into each canned response. Both add a fixed
+latency per call so timings stay comparable between runs.
+"""
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from types import SimpleNamespace
+from urllib.parse import urlparse
+from xml.sax.saxutils import escape
+
+from dedup import estimate_tokens
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "pipeline")
+MCP_REPLAY_URL = "http://mcp.replay/{source}"
+STEP_PATTERN = re.compile(r"^(?:Step|Research Question): (.*)$", re.MULTILINE)
+NOTE_ID_PATTERN = re.compile(r"^\[(\d+)\]", re.MULTILINE)
+SOURCE_ID_PATTERN = re.compile(r"\[S\d+\]")
+
+
+def isolate_environment(data_dir):
+    """Point every persistent store at a scratch directory and the MCP endpoints at ReplaySession.
+
+    Must run before the repo modules are imported, since they read these settings at import time.
+    """
+    os.environ.update({
+        "EDGAR_DATA_DIR": os.path.join(data_dir, "edgar"),
+        "NEWSAPI_DATA_DIR": os.path.join(data_dir, "news"),
+        "GOOGLE_QUOTA_PATH": os.path.join(data_dir, "google_quota.sqlite"),
+        "REPORT_CACHE_PATH": os.path.join(data_dir, "reports.sqlite"),
+        "ROUTING_LOG_PATH": "",
+        "TELEMETRY_EXPORTERS": "",
+        "AZURE_OPENAI_ENDPOINT": "https://replay.invalid",
+        "AZURE_OPENAI_API_KEY": "replay",
+        "AZURE_OPENAI_EMBEDDING_DEPLOYMENT": "",
+    })
+    for source in ["google", "arxiv", "newsapi", "wikipedia"]:
+        os.environ[f"MCP_{source.upper()}_URL"] = MCP_REPLAY_URL.format(source=source)
+
+
+def install(llm_latency=0.0, http_latency=0.0):
+    """Route this process's LLM calls and source HTTP to fresh replay fixtures; returns (llm, session).
+
+    Usable as an initializer, e.g. for research_service.ResearchService in load tests.
+    """
+    from config import set_client
+    from sources.registry import use_session
+
+    llm = ReplayLLMClient(latency=llm_latency)
+    session = ReplaySession(latency=http_latency)
+    set_client(llm)
+    use_session(session)
+    return llm, session
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+        return json.load(f) if name.endswith(".json") else f.read()
+
+
+def _slug(query):
+    return re.sub(r"[^a-z0-9]+", "-", query.lower()).strip("-") or "query"
+
+
+def _fill(template, query):
+    """Substitute __QUERY__ / __SLUG__ in every string of a JSON-like fixture."""
+    if isinstance(template, str):
+        return template.replace("__QUERY__", query).replace("__SLUG__", _slug(query))
+    if isinstance(template, list):
+        return [_fill(item, query) for item in template]
+    if isinstance(template, dict):
+        return {key: _fill(value, query) for key, value in template.items()}
+    return template
+
+
+def _source_ids(text, limit):
+    ids = []
+    for source_id in SOURCE_ID_PATTERN.findall(text or ""):
+        if source_id not in ids:
+            ids.append(source_id)
+    return ids[:limit]
+
+
+class ReplayLLMClient:
+    """Drop-in for the Azure OpenAI client (config.set_client) that answers from the LLM fixture and counts calls and tokens."""
+
+    def __init__(self, fixtures=None, latency=0.0):
+        self.fixtures = fixtures or load_fixture("llm.json")
+        self.latency = latency
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self._lock = threading.Lock()
+        self._replans = 0
+        self.stats = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats)
+
+    def _record(self, prompt_tokens, completion_tokens):
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["completion_tokens"] += completion_tokens
+
+    def _next_replan(self):
+        with self._lock:
+            replans = self.fixtures.get("replans", [])
+            reply = replans[self._replans] if self._replans < len(replans) else {"steps": [], "covered_goals": [], "open_questions": []}
+            self._replans += 1
+        return reply
+
+    def _route(self, step):
+        text = step.lower()
+        for rule in self.fixtures.get("tool_routing", []):
+            if any(keyword in text for keyword in rule["keywords"]):
+                return rule["function"]
+        return self.fixtures["default_function"]
+
+    def _outline(self, prompt):
+        note_ids = [int(i) for i in NOTE_ID_PATTERN.findall(prompt)]
+        titles = self.fixtures["section_titles"]
+        size = self.fixtures.get("outline_section_size", 2)
+        sections = [
+            {"title": titles[n % len(titles)], "note_ids": note_ids[i:i + size]}
+            for n, i in enumerate(range(0, len(note_ids), size))
+        ]
+        return {"sections": sections}
+
+    def _reply(self, messages, kwargs):
+        """(content, function_call) for a request."""
+        schema = (kwargs.get("response_format") or {}).get("json_schema", {}).get("name")
+        if schema == "research_plan":
+            return json.dumps(self.fixtures["plan"]), None
+        if schema == "research_replan":
+            return json.dumps(self._next_replan()), None
+        system = next((m.get("content") or "" for m in messages if m["role"] == "system"), "")
+        prompt = next((m.get("content") or "" for m in reversed(messages) if m["role"] == "user"), "")
+        if schema == "report_outline":
+            return json.dumps(self._outline(prompt)), None
+        called = [m for m in messages if m["role"] == "function"]
+        if kwargs.get("functions"):
+            # Call the step's tool unless its results are already in the conversation (e.g. a prefetched search)
+            match = STEP_PATTERN.search(prompt)
+            step = match.group(1).strip() if match else prompt
+            function = self._route(step)
+            if function not in {m.get("name") for m in called}:
+                query = self.fixtures.get("tool_queries", {}).get(function, step)
+                return None, SimpleNamespace(name=function, arguments=json.dumps({"query": query}))
+        if called:
+            evidence = called[-1].get("content") or ""
+            citations = " ".join(_source_ids(evidence, 3))
+            return self.fixtures["step_answer"].format(citations=citations, evidence=evidence[:600]), None
+        if "note-taking" in system:
+            match = re.search(r"^Research step: (.*)$", prompt, re.MULTILINE)
+            step = match.group(1) if match else "research step"
+            result = prompt.partition("Result:\n")[2]
+            return f"Notes on {step} {' '.join(_source_ids(result, 3))}:\n{result[:400]}", None
+        if "evaluator" in system:
+            return self.fixtures["evaluation"], None
+        if "<<<SECTIONS>>>" in prompt:
+            return self.fixtures["stitch"], None
+        if "Section title:" in prompt:
+            title = re.search(r"^Section title: (.*)$", prompt, re.MULTILINE).group(1)
+            notes = prompt.partition("Notes:\n")[2]
+            return f"## {title}\n\n{notes[:800]}", None
+        return self.fixtures["report"].format(citations=" ".join(_source_ids(prompt, 5))), None
+
+    def create(self, model, messages, stream=False, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        content, function_call = self._reply(messages, kwargs)
+        prompt_tokens = estimate_tokens(json.dumps(messages, default=str))
+        completion_tokens = estimate_tokens(content if content is not None else function_call.arguments)
+        self._record(prompt_tokens, completion_tokens)
+        usage = SimpleNamespace(
+            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, total_tokens=prompt_tokens + completion_tokens
+        )
+        if stream:
+            return self._stream(model, content or "", usage)
+        message = SimpleNamespace(role="assistant", content=content, function_call=function_call)
+        return SimpleNamespace(model=model, choices=[SimpleNamespace(message=message)], usage=usage)
+
+    def _stream(self, model, content, usage):
+        for i in range(0, len(content), 40):
+            delta = SimpleNamespace(content=content[i:i + 40])
+            yield SimpleNamespace(model=model, choices=[SimpleNamespace(delta=delta)], usage=None)
+        yield SimpleNamespace(model=model, choices=[], usage=usage)
+
+
+class _Content:
+    def __init__(self, body):
+        self._body = body
+
+    async def iter_chunked(self, size):
+        for i in range(0, len(self._body), size):
+            yield self._body[i:i + size]
+
+
+class _Response:
+    def __init__(self, status, body):
+        self.status = status
+        self._body = body
+        self.content = _Content(body)
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise RuntimeError(f"replay returned status {self.status}")
+
+    async def json(self, content_type=None):
+        return json.loads(self._body)
+
+    async def text(self):
+        return self._body.decode("utf-8")
+
+    async def read(self):
+        return self._body
+
+
+class _Request:
+    def __init__(self, session, respond):
+        self._session = session
+        self._respond = respond
+
+    async def __aenter__(self):
+        if self._session.latency:
+            await asyncio.sleep(self._session.latency)
+        status, body = await self._respond()
+        if not isinstance(body, bytes):
+            body = (body if isinstance(body, str) else json.dumps(body)).encode("utf-8")
+        return _Response(status, body)
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class ReplaySession:
+    """aiohttp.ClientSession look-alike serving the source APIs, and MCP_REPLAY_URL servers, from fixtures."""
+
+    closed = False
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.http = load_fixture("http.json")
+        self.arxiv = load_fixture("arxiv.xml")
+        self.requests = {}
+
+    def _count(self, url):
+        host = urlparse(url).netloc
+        self.requests[host] = self.requests.get(host, 0) + 1
+
+    def get(self, url, params=None, **kwargs):
+        self._count(url)
+        params = params or {}
+
+        async def respond():
+            return self._get(url, params)
+
+        return _Request(self, respond)
+
+    def post(self, url, data=None, **kwargs):
+        self._count(url)
+
+        async def respond():
+            return await self._mcp(url, kwargs.get("json") or json.loads(data or "{}"))
+
+        return _Request(self, respond)
+
+    def _get(self, url, params):
+        if "googleapis.com" in url:
+            start = int(params.get("start", 1))
+            items = _fill(self.http["google"], params.get("q", ""))["items"]
+            return 200, {"items": items[start - 1:start - 1 + int(params.get("num", 10))]}
+        if "arxiv.org" in url:
+            query = str(params.get("search_query", "")).removeprefix("all:")
+            return 200, self.arxiv.replace("__QUERY__", escape(query)).replace("__SLUG__", _slug(query))
+        if "newsapi.org" in url:
+            return 200, _fill(self.http["newsapi"], params.get("q", ""))
+        if "company_tickers" in url:
+            return 200, self.http["sec_tickers"]
+        if "/submissions/" in url:
+            return 200, self.http["sec_submissions"]
+        if "/companyfacts/" in url:
+            return 200, self.http["sec_companyfacts"]
+        if "wikipedia.org" in url:
+            return 200, self._wikipedia(params)
+        return 404, {"error": f"no replay fixture for {url}"}
+
+    def _wikipedia(self, params):
+        if params.get("generator") == "search":
+            return self.http["wikipedia_search"]
+        pages = {page["pageid"]: page for page in self.http["wikipedia_search"]["query"]["pages"]}
+        found = []
+        for pageid in str(params.get("pageids", "")).split("|"):
+            page = pages.get(int(pageid)) if pageid.isdigit() else None
+            if page is None:
+                continue
+            extract = self.http["wikipedia_extracts"][pageid]
+            if params.get("exintro"):
+                extract = extract.split("\n\n\n==", 1)[0]
+            found.append(dict(page, extract=extract))
+        return {"batchcomplete": True, "query": {"pages": found}}
+
+    async def _mcp(self, url, request):
+        """Answer an MCP JSON-RPC search by running the local adapter against this session."""
+        from sources import registry
+
+        adapter = registry.get(urlparse(url).path.strip("/"))
+        if adapter is None:
+            return 404, {"error": f"no replay MCP server at {url}"}
+        query = request.get("params", {}).get("query", "")
+        records = adapter.parse(await adapter.fetch(self, query), query)
+        return 200, {"jsonrpc": "2.0", "id": request.get("id"), "result": [text for text, _ in records]}
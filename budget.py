@@ -0,0 +1,149 @@
+import logging
+import os
+import threading
+from dotenv import load_dotenv
+from run_context import current_run
+from telemetry import incr
+
+load_dotenv()
+
+# Per-run limits; 0 disables a limit. Cost is in USD, priced from model_router.DEPLOYMENT_CATALOG.
+RUN_TOKEN_BUDGET = int(os.getenv("RUN_TOKEN_BUDGET", "500000"))
+RUN_COST_BUDGET = float(os.getenv("RUN_COST_BUDGET", "0"))
+# Rough tokens one research step costs (executor calls, replanning share, report share); caps the plan size
+BUDGET_TOKENS_PER_STEP = int(os.getenv("BUDGET_TOKENS_PER_STEP", "15000"))
+# Multiple of BUDGET_TOKENS_PER_STEP a step costs by the planner's estimated_cost
+STEP_COST_WEIGHTS = {"low": 0.5, "medium": 1.0, "high": 2.0}
+# Context handed to executors once the run is degraded
+COMPACT_CONTEXT_TOKENS = int(os.getenv("COMPACT_CONTEXT_TOKENS", "4000"))
+# Degradation stages, entered when this fraction of the budget has been spent; each keeps the ones before it
+DEGRADATION_STAGES = [
+    (0.6, "compact_context"),
+    (0.75, "skip_replan"),
+    (0.85, "skip_eval"),
+    (0.9, "single_pass_report"),
+]
+
+
+class RunBudget:
+    """Run-scoped token and cost budget, fed from response.usage of every LLM call.
+
+    Planner, executors and writer ask it how much they may spend; as the budget runs down the run degrades
+    in stages (compact context, no replanning, no evaluation loop, single-pass report) instead of failing.
+    """
+
+    def __init__(self, token_budget=RUN_TOKEN_BUDGET, cost_budget=RUN_COST_BUDGET):
+        self.token_budget = token_budget
+        self.cost_budget = cost_budget
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self.calls = 0
+        self._stage = 0
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self):
+        return self.prompt_tokens + self.completion_tokens
+
+    def record(self, prompt_tokens, completion_tokens, cost=0.0):
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.cost += cost
+            fraction = self._fraction()
+            stage = sum(1 for threshold, _ in DEGRADATION_STAGES if fraction >= threshold)
+            entered = DEGRADATION_STAGES[self._stage:stage]
+            self._stage = max(self._stage, stage)
+        for threshold, name in entered:
+            incr("budget.degraded", stage=name)
+            logging.warning(f"Run budget {fraction:.0%} spent; degrading: {name}")
+
+    def _fraction(self):
+        fractions = [0.0]
+        if self.token_budget:
+            fractions.append(self.tokens / self.token_budget)
+        if self.cost_budget:
+            fractions.append(self.cost / self.cost_budget)
+        return max(fractions)
+
+    def fraction(self):
+        """Share of the tightest limit spent so far."""
+        with self._lock:
+            return self._fraction()
+
+    def stage(self):
+        """Name of the deepest degradation stage entered, or 'normal'."""
+        with self._lock:
+            return DEGRADATION_STAGES[self._stage - 1][1] if self._stage else "normal"
+
+    def degraded(self, name):
+        """True once the run has reached the named degradation stage."""
+        names = [stage for _, stage in DEGRADATION_STAGES]
+        with self._lock:
+            return self._stage > names.index(name)
+
+    def exhausted(self):
+        return self.fraction() >= 1.0
+
+    def remaining_tokens(self):
+        if not self.token_budget:
+            return None
+        with self._lock:
+            return max(self.token_budget - self.tokens, 0)
+
+    def max_steps(self, max_steps):
+        """Cap a plan so its expected spend fits the token budget."""
+        if not self.token_budget or not BUDGET_TOKENS_PER_STEP:
+            return max_steps
+        affordable = max(1, self.remaining_tokens() // BUDGET_TOKENS_PER_STEP)
+        if affordable < max_steps:
+            logging.info(f"Token budget allows about {affordable} steps; capping plan at {affordable} of {max_steps}")
+        return min(max_steps, affordable)
+
+    def affordable_steps(self, steps):
+        """Leading planner step dicts whose estimated_cost fits the remaining token budget; the first is always kept."""
+        remaining = self.remaining_tokens()
+        if remaining is None or not BUDGET_TOKENS_PER_STEP:
+            return steps
+        kept = []
+        for step in steps:
+            remaining -= STEP_COST_WEIGHTS.get(step.get("estimated_cost"), 1.0) * BUDGET_TOKENS_PER_STEP
+            if kept and remaining < 0:
+                logging.info(f"Token budget affords {len(kept)} of {len(steps)} planned steps by estimated cost")
+                incr("budget.steps_dropped", len(steps) - len(kept))
+                break
+            kept.append(step)
+        return kept
+
+    def context_view(self, context, max_tokens=COMPACT_CONTEXT_TOKENS):
+        """The context to send with a step: unchanged normally, only its most recent part once compacted."""
+        if not self.degraded("compact_context") or len(context) <= max_tokens * 4:
+            return context
+        return "[...earlier results omitted to save tokens]\n" + context[-max_tokens * 4:]
+
+    def describe(self):
+        """Short spend line for progress displays."""
+        with self._lock:
+            parts = [f"{self.tokens:,}" + (f" / {self.token_budget:,}" if self.token_budget else "") + " tokens"]
+            parts.append(f"${self.cost:.2f}" + (f" / ${self.cost_budget:.2f}" if self.cost_budget else ""))
+            stage = DEGRADATION_STAGES[self._stage - 1][1] if self._stage else None
+        return " · ".join(parts) + (f" · degraded: {stage.replace('_', ' ')}" if stage else "")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "cost": round(self.cost, 4),
+                "token_budget": self.token_budget,
+                "cost_budget": self.cost_budget,
+                "stage": DEGRADATION_STAGES[self._stage - 1][1] if self._stage else "normal",
+            }
+
+
+def get_run_budget():
+    """Budget of the active run (see run_context); outside a run nothing is limited."""
+    return current_run().budget
@@ -0,0 +1,181 @@
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+from dotenv import load_dotenv
+from run_context import current_run
+from telemetry import incr
+
+load_dotenv()
+
+# Overall time limit for a research run in seconds, counted from "Proceed" (0 = none); the UI can override it
+RUN_SLA_SECONDS = float(os.getenv("RUN_SLA_SECONDS", "0"))
+# Seconds of the run SLA kept back for writing the report once research steps are stopped
+REPORT_RESERVE_SECONDS = float(os.getenv("REPORT_RESERVE_SECONDS", "30"))
+# How often blocked waits wake up to look at the token
+CANCEL_POLL_SECONDS = float(os.getenv("CANCEL_POLL_SECONDS", "0.5"))
+# A browser tab may drop its connection this long (e.g. a network blip) before its run is cancelled
+CANCEL_DISCONNECT_GRACE_SECONDS = float(os.getenv("CANCEL_DISCONNECT_GRACE_SECONDS", "10"))
+
+
+class RunCancelled(Exception):
+    """Raised inside a research run once its token has been cancelled or its deadline has passed."""
+
+
+class CancelToken:
+    """Run-scoped cancellation flag plus optional deadline, checked by steps, source calls, crawls and LLM calls.
+
+    A child token (see child()) stops early enough to leave part of the deadline for later work and is
+    cancelled together with its parent.
+    """
+
+    def __init__(self, deadline_seconds=None, parent=None):
+        self.deadline_seconds = deadline_seconds
+        self.deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+        self.parent = parent
+        self.reason = None
+        self._event = threading.Event()
+        self._released = threading.Event()
+        self._lock = threading.Lock()
+
+    def child(self, reserve_seconds=0):
+        """Token for a phase of this run that must end reserve_seconds before the run's deadline.
+
+        At most a third of a short time limit is reserved, so the phase always gets most of it.
+        """
+        token = CancelToken(parent=self)
+        if self.deadline is not None:
+            token.deadline = self.deadline - min(reserve_seconds, (self.deadline_seconds or 0) / 3)
+        return token
+
+    def cancel(self, reason="cancelled"):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            incr("run.cancelled", reason=reason)
+            logging.info(f"Research run cancelled: {reason}")
+
+    def cancelled(self):
+        if self._event.is_set():
+            return True
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline")
+            return True
+        if self.parent is not None and self.parent.cancelled():
+            self.cancel(self.parent.reason)
+            return True
+        return False
+
+    def remaining(self):
+        """Seconds left before the deadline, or None without one."""
+        deadlines = [token.deadline for token in self._lineage() if token.deadline is not None]
+        return max(min(deadlines) - time.monotonic(), 0.0) if deadlines else None
+
+    def timeout(self, default=None):
+        """A per-call timeout that never outlives the deadline."""
+        remaining = self.remaining()
+        if remaining is None:
+            return default
+        return remaining if default is None else min(default, remaining)
+
+    def check(self):
+        """Raise RunCancelled if the run should stop."""
+        if self.cancelled():
+            raise RunCancelled(self.reason)
+
+    def _lineage(self):
+        token = self
+        while token is not None:
+            yield token
+            token = token.parent
+
+    def watch(self, alive, grace_seconds=0, interval=CANCEL_POLL_SECONDS):
+        """Cancel the token from a background thread once alive() has been False for grace_seconds; stops on release()."""
+        def poll():
+            lost_since = None
+            while not self._released.wait(interval) and not self.cancelled():
+                try:
+                    ok = alive()
+                except Exception as e:
+                    logging.warning(f"Run liveness check failed: {e}")
+                    ok = True
+                if ok:
+                    lost_since = None
+                    continue
+                lost_since = lost_since or time.monotonic()
+                if time.monotonic() - lost_since >= grace_seconds:
+                    self.cancel("client gone")
+
+        threading.Thread(target=poll, name="run-watch", daemon=True).start()
+        return self
+
+    def release(self):
+        """The run has ended; stop any watcher."""
+        self._released.set()
+
+
+def wait_future(future, token):
+    """future.result() that cancels the future and raises RunCancelled as soon as the token fires."""
+    while True:
+        try:
+            return future.result(token.timeout(CANCEL_POLL_SECONDS))
+        except concurrent.futures.TimeoutError:
+            if token.cancelled():
+                future.cancel()
+                token.check()
+
+
+async def wait_cancellable(awaitable, token, timeout=None):
+    """Await on the running loop, cancelling the work and raising RunCancelled as soon as the token fires.
+
+    Raises asyncio.TimeoutError after timeout seconds, like asyncio.wait_for.
+    """
+    task = asyncio.ensure_future(awaitable)
+    end = None if timeout is None else time.monotonic() + timeout
+    while True:
+        wait = token.timeout(CANCEL_POLL_SECONDS)
+        if end is not None:
+            wait = min(wait, max(end - time.monotonic(), 0.0))
+        done, _ = await asyncio.wait({task}, timeout=wait)
+        if done:
+            return task.result()
+        if token.cancelled():
+            task.cancel()
+            token.check()
+        if end is not None and time.monotonic() >= end:
+            task.cancel()
+            raise asyncio.TimeoutError()
+
+
+def as_completed(futures, on_wait=None, interval=CANCEL_POLL_SECONDS):
+    """concurrent.futures.as_completed that wakes every interval seconds to call on_wait, e.g. to refresh the UI.
+
+    In Streamlit that refresh is also where a rerun (new query, stop button) interrupts the script.
+    """
+    pending = set(futures)
+    while pending:
+        done, pending = concurrent.futures.wait(pending, timeout=interval, return_when=concurrent.futures.FIRST_COMPLETED)
+        yield from done
+        if pending and on_wait:
+            on_wait()
+
+
+def streamlit_session_alive():
+    """Liveness check for the Streamlit session running this script: False once its browser tab is gone."""
+    from streamlit.runtime import get_instance
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return lambda: True
+    runtime = get_instance()
+    return lambda: runtime.is_active_session(ctx.session_id)
+
+
+def get_run_token():
+    """Cancel token of the active run (see run_context); outside a run it never fires."""
+    return current_run().token
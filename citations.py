@@ -0,0 +1,126 @@
+import re
+import threading
+from cpu_pool import get_cpu_pool
+from dedup import canonicalize_url, fingerprint, get_run_index
+from run_context import current_run
+
+LABEL_PATTERN = re.compile(r"^\[([^\]]+)\]\s*")
+URL_LINE_PATTERN = re.compile(r"^\s*URL:\s*(\S+)\s*$", re.MULTILINE)
+CITATION_PATTERN = re.compile(r"\[(S\d+)\]")
+MAX_TITLE_LENGTH = 120
+# Result labels produced by the source functions, mapped to the resource type they represent
+LABEL_KINDS = [
+    ("Google Result", "web page"),
+    ("Deep Crawled", "web page"),
+    ("Crawled Website", "web page"),
+    ("ArXiv Result", "paper"),
+    ("News", "article"),
+    ("Wikipedia", "encyclopedia entry"),
+    ("SEC", "filing"),
+]
+
+
+def _kind_for_label(label):
+    for prefix, kind in LABEL_KINDS:
+        if label.startswith(prefix):
+            return kind
+    return None
+
+
+class CitationIndex:
+    """Run-scoped registry giving every retrieved document a stable short ID (S1, S2, ...)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_key = {}
+        self.sources = {}
+
+    def register(self, title, url=None, kind="web page"):
+        """Return the ID for a document, assigning a new one the first time its URL (or title) is seen."""
+        key = canonicalize_url(url) if url else f"title:{(title or '').strip().lower()}"
+        with self._lock:
+            source_id = self._by_key.get(key)
+            if source_id is None:
+                source_id = f"S{len(self.sources) + 1}"
+                self._by_key[key] = source_id
+                self.sources[source_id] = {"id": source_id, "title": (title or url or "").strip(), "url": url, "kind": kind}
+            return source_id
+
+    def load(self, sources):
+        """Re-register sources saved from an earlier run under their original IDs; new ones continue the numbering."""
+        with self._lock:
+            for source_id, entry in sources.items():
+                key = canonicalize_url(entry["url"]) if entry.get("url") else f"title:{(entry.get('title') or '').strip().lower()}"
+                self._by_key.setdefault(key, source_id)
+                self.sources[source_id] = dict(entry)
+        return self
+
+    def cite(self, text, url=None):
+        """Register a formatted search result and rewrite it to start with its short ID instead of label and URL."""
+        match = LABEL_PATTERN.match(text or "")
+        kind = _kind_for_label(match.group(1)) if match else None
+        if not kind:
+            return text
+        body = text[match.end():]
+        url_match = URL_LINE_PATTERN.search(body)
+        url = url or (url_match.group(1) if url_match else None)
+        body = URL_LINE_PATTERN.sub("", body).strip()
+        first_line = body.split("\n", 1)[0].strip()
+        title = first_line[:MAX_TITLE_LENGTH] if first_line and not first_line.startswith("Depth:") else url
+        source_id = self.register(title, url, kind)
+        return f"[{source_id}] {body}"
+
+    def cited_ids(self, text):
+        """IDs referenced in a text, in order of first appearance, restricted to known sources."""
+        seen = []
+        for source_id in CITATION_PATTERN.findall(text or ""):
+            if source_id in self.sources and source_id not in seen:
+                seen.append(source_id)
+        return seen
+
+    def resource_counts(self, ids=None):
+        with self._lock:
+            entries = [self.sources[i] for i in (ids if ids is not None else self.sources)]
+        counts = {}
+        for entry in entries:
+            counts[entry["kind"]] = counts.get(entry["kind"], 0) + 1
+        return counts
+
+    def bibliography(self, report):
+        """Markdown references section for the sources cited in the report, with counts computed in code."""
+        cited = self.cited_ids(report)
+        lines = []
+        for source_id in cited:
+            entry = self.sources[source_id]
+            location = f" - {entry['url']}" if entry["url"] else ""
+            lines.append(f"- [{source_id}] {entry['title']} ({entry['kind']}){location}")
+        counts = self.resource_counts(cited)
+        breakdown = ", ".join(f"{kind}: {n}" for kind, n in sorted(counts.items()))
+        summary = (
+            f"Total resources used: {len(cited)} cited"
+            + (f" ({breakdown})" if breakdown else "")
+            + f", out of {len(self.sources)} retrieved."
+        )
+        return "## References\n\n" + summary + ("\n\n" + "\n".join(lines) if lines else "")
+
+
+def get_citation_index():
+    """Citation index of the active run (see run_context)."""
+    return current_run().citation_index
+
+
+def novel_cited(results, urls=None):
+    """Retrieval post-processing: drop results already seen in this run, tag the rest with citation IDs."""
+    urls = list(urls or [])
+    urls += [None] * (len(results) - len(urls))
+    dedup_index = get_run_index()
+    citation_index = get_citation_index()
+    candidates = [(text, url) for text, url in zip(results, urls) if text and text.strip()]
+    # Fingerprinting is the CPU-heavy part; it runs in the CPU pool when one is configured
+    pool = get_cpu_pool()
+    records = [future.result() for future in [pool.submit(fingerprint, text, url) for text, url in candidates]]
+    return [
+        citation_index.cite(text, url)
+        for (text, url), record in zip(candidates, records)
+        if dedup_index.is_novel(text, url, record)
+    ]
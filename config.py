@@ -1,11 +1,31 @@
-from openai import AzureOpenAI
 import os
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 
-client = AzureOpenAI(
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version="2025-03-01-preview",
-)
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide AzureOpenAI client; openai is imported on the first LLM call, not when config is imported."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from openai import AzureOpenAI
+
+            _client = AzureOpenAI(
+                azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+                api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                api_version="2025-03-01-preview",
+            )
+        return _client
+
+
+def set_client(client):
+    """Use another OpenAI-compatible client for this process, e.g. a replay client in benchmarks."""
+    global _client
+    with _client_lock:
+        _client = client
+    return _client
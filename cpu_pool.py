@@ -0,0 +1,136 @@
+import asyncio
+import concurrent.futures
+import importlib
+import logging
+import multiprocessing
+import os
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Worker processes for CPU-bound parsing, extraction and ranking; 0 (the default) runs those tasks inline
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", "0"))
+# Payloads smaller than this are processed inline: shipping them to a worker costs more than the work
+CPU_POOL_MIN_BYTES = int(os.getenv("CPU_POOL_MIN_BYTES", "4096"))
+# Imported by every worker at start, so the first task sent to it does not pay for them
+CPU_POOL_WARM_MODULES = [
+    "bs4", "docx", "markdown_it", "dedup", "passage_ranker", "sources.arxiv", "sources.wikipedia", "export_pipeline",
+]
+
+
+def _warm_up(modules):
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logging.warning(f"CPU pool worker could not preload {name}: {e}")
+
+
+def _worker_pid():
+    return os.getpid()
+
+
+def page_head(html):
+    """(title, description) of an HTML page given as bytes or text."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    title = soup.title.string if soup.title and soup.title.string else "No title found"
+    description = soup.find("meta", attrs={"name": "description"})
+    description = description.get("content") if description else None
+    return str(title), description or "No description found"
+
+
+class CpuPool:
+    """Opt-in pool of worker processes for CPU-bound parsing, extraction and ranking.
+
+    Tasks are module-level functions that take raw bytes or text and return compact records (tuples of short
+    strings and ints), so arguments and results pickle cheaply. With no workers configured, or for payloads
+    under min_bytes, tasks run inline in the calling thread exactly as before.
+    """
+
+    def __init__(self, workers=CPU_POOL_WORKERS, min_bytes=CPU_POOL_MIN_BYTES, warm_modules=CPU_POOL_WARM_MODULES):
+        self.workers = workers
+        self.min_bytes = min_bytes
+        self.warm_modules = list(warm_modules)
+        self._executor = None
+        self._lock = threading.Lock()
+        self.stats = {"offloaded": 0, "inline": 0}
+
+    @property
+    def enabled(self):
+        return self.workers > 0
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a process that runs Streamlit, asyncio loops and worker threads is unsafe
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_up,
+                    initargs=(self.warm_modules,),
+                )
+            return self._executor
+
+    def warm_up(self):
+        """Start every worker now and wait until each has imported its modules; returns their pids."""
+        if not self.enabled:
+            return []
+        futures = [self._pool().submit(_worker_pid) for _ in range(self.workers)]
+        pids = sorted({future.result() for future in futures})
+        logging.info(f"CPU pool ready: {len(pids)} workers")
+        return pids
+
+    def _offload(self, payload):
+        if not self.enabled or (payload is not None and len(payload) < self.min_bytes):
+            self.stats["inline"] += 1
+            return False
+        self.stats["offloaded"] += 1
+        return True
+
+    def submit(self, fn, payload, *args):
+        """Run fn(payload, *args) in a worker, or inline for small payloads; returns a Future."""
+        if self._offload(payload):
+            return self._pool().submit(fn, payload, *args)
+        future = concurrent.futures.Future()
+        try:
+            future.set_result(fn(payload, *args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def run(self, fn, payload, *args):
+        """Blocking fn(payload, *args)."""
+        return self.submit(fn, payload, *args).result()
+
+    async def arun(self, fn, payload, *args):
+        """fn(payload, *args) awaited on an event loop, which keeps serving I/O while a worker does the work."""
+        return await asyncio.wrap_future(self.submit(fn, payload, *args))
+
+    def map(self, fn, payloads, *args):
+        """[fn(payload, *args) for payload in payloads], with the payloads processed concurrently by the workers."""
+        futures = [self.submit(fn, payload, *args) for payload in payloads]
+        return [future.result() for future in futures]
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_cpu_pool():
+    """Process-wide CpuPool, configured from CPU_POOL_WORKERS; its workers start warming up in the background."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = CpuPool()
+            if _pool.enabled:
+                threading.Thread(target=_pool.warm_up, name="cpu-pool-warm-up", daemon=True).start()
+        return _pool
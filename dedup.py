@@ -0,0 +1,177 @@
+import hashlib
+import logging
+import re
+import threading
+import urllib.parse
+from run_context import current_run
+
+# Query parameters that only track the visitor and never change page content
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "mc_cid", "mc_eid", "ref", "ref_src", "igshid", "_ga",
+}
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 8
+NEAR_DUPLICATE_DISTANCE = 6
+SHINGLE_SIZE = 2
+URL_PATTERN = re.compile(r"URL:\s*(\S+)")
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def canonicalize_url(url):
+    """Normalize a URL so the same page fetched from different sources compares equal."""
+    if not url:
+        return None
+    try:
+        parts = urllib.parse.urlsplit(url.strip())
+    except ValueError:
+        return url.strip()
+    scheme = (parts.scheme or "http").lower()
+    if scheme == "http":
+        scheme = "https"
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    path = re.sub(r"/{2,}", "/", parts.path or "/")
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = [
+        (k, v)
+        for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    ]
+    query.sort()
+    return urllib.parse.urlunsplit((scheme, host, path, urllib.parse.urlencode(query), ""))
+
+
+def extract_url(text):
+    """Return the first 'URL: ...' reference embedded in a formatted result, if any."""
+    match = URL_PATTERN.search(text or "")
+    return match.group(1) if match else None
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token) used for savings reports."""
+    return (len(text) + 3) // 4
+
+
+def _hash64(value):
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text):
+    """64-bit SimHash over word shingles of the text."""
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        shingles = [" ".join(words)] if words else []
+    else:
+        shingles = [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+    weights = [0] * SIMHASH_BITS
+    for shingle in shingles:
+        h = _hash64(shingle)
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+def fingerprint(text, url=None):
+    """Compact record DedupIndex.is_novel() checks: (canonical URL, has words, exact digest, SimHash).
+
+    Pure and CPU-bound, so it can be computed in a worker process (see cpu_pool) and checked here.
+    """
+    canonical = canonicalize_url(url or extract_url(text))
+    normalized = " ".join(WORD_PATTERN.findall(text.lower()))
+    digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+    return canonical, bool(normalized), digest, simhash(normalized)
+
+
+class DedupIndex:
+    """Run-scoped index of everything already sent forward, shared by all step threads."""
+
+    def __init__(self, max_distance=NEAR_DUPLICATE_DISTANCE):
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._urls = set()
+        self._digests = set()
+        self._bands = [dict() for _ in range(SIMHASH_BANDS)]
+        self.stats = {
+            "documents_seen": 0,
+            "documents_kept": 0,
+            "url_duplicates": 0,
+            "exact_duplicates": 0,
+            "near_duplicates": 0,
+            "bytes_saved": 0,
+            "tokens_saved": 0,
+        }
+
+    def _band_keys(self, fingerprint):
+        width = SIMHASH_BITS // SIMHASH_BANDS
+        mask = (1 << width) - 1
+        return [(fingerprint >> (i * width)) & mask for i in range(SIMHASH_BANDS)]
+
+    def _find_near_duplicate(self, fingerprint):
+        for band, key in zip(self._bands, self._band_keys(fingerprint)):
+            for candidate in band.get(key, ()):
+                if hamming_distance(candidate, fingerprint) <= self.max_distance:
+                    return True
+        return False
+
+    def _record_drop(self, reason, text):
+        self.stats[reason] += 1
+        self.stats["bytes_saved"] += len(text.encode("utf-8"))
+        self.stats["tokens_saved"] += estimate_tokens(text)
+
+    def is_novel(self, text, url=None, record=None):
+        """Return True and index the document if it has not been seen in this run.
+
+        `record` is the document's fingerprint() when it was already computed elsewhere.
+        """
+        canonical, has_words, digest, simhash_value = record or fingerprint(text, url)
+        with self._lock:
+            self.stats["documents_seen"] += 1
+            if canonical and canonical in self._urls:
+                self._record_drop("url_duplicates", text)
+                return False
+            if digest in self._digests:
+                self._record_drop("exact_duplicates", text)
+                return False
+            if has_words and self._find_near_duplicate(simhash_value):
+                self._record_drop("near_duplicates", text)
+                return False
+            if canonical:
+                self._urls.add(canonical)
+            self._digests.add(digest)
+            if has_words:
+                for band, key in zip(self._bands, self._band_keys(simhash_value)):
+                    band.setdefault(key, []).append(simhash_value)
+            self.stats["documents_kept"] += 1
+            return True
+
+    def filter(self, results, urls=None):
+        """Keep only novel results. `urls` optionally pairs each result with its source URL."""
+        urls = list(urls or [])
+        urls += [None] * (len(results) - len(urls))
+        return [text for text, url in zip(results, urls) if text and self.is_novel(text, url)]
+
+    def report(self):
+        with self._lock:
+            stats = dict(self.stats)
+        logging.info(
+            f"Dedup: kept {stats['documents_kept']} of {stats['documents_seen']} documents, "
+            f"saved {stats['bytes_saved']} bytes (~{stats['tokens_saved']} tokens)"
+        )
+        return stats
+
+
+def get_run_index():
+    """Dedup index of the active run (see run_context)."""
+    return current_run().dedup_index
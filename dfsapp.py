@@ -1,14 +1,24 @@
 import streamlit as st
 from dotenv import load_dotenv
-from writer import report_writer, eval_agent
-from planner import plan_research, replanner
+from writer import eval_agent
+from engine import execute_plan, finish, plan, start_prefetcher
 from dfs_stepexecutor import execute_step
-from io import BytesIO
-from docx import Document
-from bs4 import BeautifulSoup
-import markdown as md
 import logging
-import concurrent.futures
+import threading
+from export_panel import render_export_panel
+from export_pipeline import build_bundle
+from telemetry import RunTelemetry
+from run_context import RunContext
+from cancellation import (
+    CANCEL_DISCONNECT_GRACE_SECONDS, RUN_SLA_SECONDS, CancelToken, streamlit_session_alive,
+)
+from report_cache import (
+    REPORT_CACHE, get_report_cache, lookup_report, refresh_report, restore_run, steps_context, store_report,
+    time_sensitive_steps,
+)
+from sources import mcp_registry
+from config import get_client
+from cpu_pool import get_cpu_pool
 
 load_dotenv()
 
@@ -17,6 +27,20 @@ logging.basicConfig(
     format="%(asctime)s [%(levelname)s] %(message)s"
 )
 
+
+@st.cache_resource(show_spinner=False)
+def shared_resources():
+    """Clients and pools shared by every session of this server, created on its first script run rather than per rerun.
+
+    The CPU pool's workers (when CPU_POOL_WORKERS is set) and the LLM client, which loads openai, start in the
+    background so the first page renders without waiting for them.
+    """
+    threading.Thread(target=get_client, name="llm-client-warm-up", daemon=True).start()
+    return get_cpu_pool(), get_report_cache() if REPORT_CACHE else None
+
+
+shared_resources()
+
 st.set_page_config(
     page_title="Depth-First Deep Research App",
     page_icon="🧠",
@@ -27,60 +51,6 @@ st.set_page_config(
 st.title("deepQuest v2")
 st.sidebar.title("Research Steps")
 
-def generate_word_doc_from_markdown(markdown_text):
-    try:
-        html = md.markdown(markdown_text, extensions=['tables'])
-        soup = BeautifulSoup(html, "html.parser")
-        doc = Document()
-        doc.add_heading("DeepQuest Research Report", 0)
-
-        for element in soup.children:
-            if element.name and element.name.startswith("h") and element.name[1:].isdigit():
-                level = int(element.name[1:])
-                doc.add_heading(element.get_text(), level=level)
-            elif element.name == "ul":
-                for li in element.find_all("li"):
-                    doc.add_paragraph(li.get_text(), style="List Bullet")
-            elif element.name == "ol":
-                for li in element.find_all("li"):
-                    doc.add_paragraph(li.get_text(), style="List Number")
-            elif element.name == "p":
-                doc.add_paragraph(element.get_text())
-            elif element.name == "table":
-                rows = element.find_all("tr")
-                if not rows:
-                    continue
-                cols = rows[0].find_all(["td", "th"])
-                n_cols = len(cols)
-                n_rows = len(rows)
-                table = doc.add_table(rows=n_rows, cols=n_cols)
-                for row_idx, row in enumerate(rows):
-                    cells = row.find_all(["td", "th"])
-                    for col_idx, cell in enumerate(cells):
-                        table.cell(row_idx, col_idx).text = cell.get_text()
-                # Add borders to the table
-                tbl = table._tbl
-                from docx.oxml import parse_xml
-                from docx.oxml.ns import nsdecls
-                tblPr = tbl.tblPr
-                borders = parse_xml(r'''
-                    <w:tblBorders %s>
-                        <w:top w:val="single" w:sz="4" w:space="0" w:color="auto"/>
-                        <w:left w:val="single" w:sz="4" w:space="0" w:color="auto"/>
-                        <w:bottom w:val="single" w:sz="4" w:space="0" w:color="auto"/>
-                        <w:right w:val="single" w:sz="4" w:space="0" w:color="auto"/>
-                        <w:insideH w:val="single" w:sz="4" w:space="0" w:color="auto"/>
-                        <w:insideV w:val="single" w:sz="4" w:space="0" w:color="auto"/>
-                    </w:tblBorders>''' % nsdecls('w'))
-                tblPr.append(borders)
-        buffer = BytesIO()
-        doc.save(buffer)
-        buffer.seek(0)
-        return buffer
-    except Exception as e:
-        logging.error(f"Error converting markdown to Word: {e}")
-        return None
-
 # --- Session State Management ---
 if "query" not in st.session_state:
     st.session_state.query = ""
@@ -96,6 +66,15 @@ if "proceed" not in st.session_state:
     st.session_state.proceed = False
 if "steps_initialized" not in st.session_state:
     st.session_state.steps_initialized = False
+if "run" not in st.session_state:
+    # Dedup and citation indices, telemetry, budget and cancel token of this session's research run
+    st.session_state.run = RunContext(telemetry=RunTelemetry(app="dfs"))
+if "prefetcher" not in st.session_state:
+    st.session_state.prefetcher = None
+if "cached_run" not in st.session_state:
+    st.session_state.cached_run = None
+if "stopped" not in st.session_state:
+    st.session_state.stopped = False
 
 query = st.chat_input("Enter your research query:")
 if query and (st.session_state.query != query):
@@ -106,20 +85,78 @@ if query and (st.session_state.query != query):
     st.session_state.report = None
     st.session_state.proceed = False
     st.session_state.steps_initialized = False
+    # Anything still running for the previous query stops now
+    st.session_state.run.token.cancel("superseded")
+    st.session_state.run.token.release()
+    st.session_state.run = RunContext(telemetry=RunTelemetry(app="dfs", query=query))
+    st.session_state.stopped = False
+    # An earlier run of a similar query is offered before any planning is spent on this one
+    st.session_state.cached_run = lookup_report(query, "dfs")
+    if st.session_state.prefetcher:
+        st.session_state.prefetcher.close()
+        st.session_state.prefetcher = None
     st.session_state.query = query
 
 # Set your max_steps dynamically or statically as needed
 max_steps = 20  # Or use a value from Q-learning or user input
 
+
+def use_cached_run(completed_steps, report, run):
+    """Show a cached (or refreshed) run as this session's finished research."""
+    st.session_state.steps = [step for step, _ in completed_steps]
+    st.session_state.completed_steps = completed_steps
+    st.session_state.context = steps_context(completed_steps)
+    st.session_state.run = run
+    st.session_state.report = report
+    st.session_state.proceed = True
+    st.session_state.steps_initialized = True
+    st.session_state.cached_run = None
+
+
+cached_run = st.session_state.cached_run
+if cached_run and not st.session_state.steps_initialized:
+    stale = time_sensitive_steps(cached_run)
+    st.info(
+        f"A report for a similar query (\"{cached_run['query']}\", {cached_run['age_hours']}h old, "
+        f"similarity {cached_run['similarity']}) is available."
+    )
+    cols = st.columns(3)
+    if cols[0].button("Use cached report"):
+        run = st.session_state.run
+        use_cached_run(
+            cached_run["completed_steps"], cached_run["report"], restore_run(cached_run, run.telemetry, run.budget, run.token)
+        )
+        st.rerun()
+    if cols[1].button(f"Refresh time-sensitive steps ({len(stale)})", disabled=not stale):
+        run = st.session_state.run
+        run = restore_run(cached_run, run.telemetry, run.budget, run.token)
+        try:
+            with st.spinner(f"Re-running {len(stale)} of {len(cached_run['completed_steps'])} steps..."):
+                completed_steps, _, report = refresh_report(cached_run, st.session_state.query, execute_step, run)
+        except Exception as e:
+            logging.error(f"Error refreshing cached report: {e}")
+            st.error("Brain down, try again shortly!")
+            st.stop()
+        run.telemetry.finish()
+        store_report(st.session_state.query, "dfs", report, completed_steps, run.citation_index)
+        use_cached_run(completed_steps, report, run)
+        st.rerun()
+    if cols[2].button("Run fresh research"):
+        st.session_state.cached_run = None
+        st.rerun()
+    with st.expander("Cached report", expanded=True):
+        st.markdown(cached_run["report"])
+
 # Only generate steps when a new query is submitted
-if query and (not st.session_state.steps_initialized or st.session_state.query != query):
-    st.session_state.steps = plan_research(query, max_steps=max_steps)
+if st.session_state.query and not st.session_state.steps_initialized and not st.session_state.cached_run:
+    # Warm searches for each step while the plan is still streaming in
+    st.session_state.prefetcher = start_prefetcher(mcp_registry)
+    st.session_state.steps = plan(st.session_state.query, st.session_state.run, st.session_state.prefetcher, max_steps)
     st.session_state.completed_steps = []
     st.session_state.context = ""
     st.session_state.report = None
     st.session_state.proceed = False
     st.session_state.steps_initialized = True
-    st.session_state.query = query
     # st.write(f"Query: {query}")
 
 if st.session_state.query and st.session_state.steps:
@@ -154,14 +191,23 @@ if st.session_state.query and st.session_state.steps:
         if st.sidebar.button("Add Step") and new_step.strip():
             st.session_state.steps.append(new_step.strip())
             st.rerun()
+        run_sla = st.sidebar.number_input(
+            "Time limit in seconds (0 = none)", min_value=0, value=int(RUN_SLA_SECONDS), step=30,
+            help="The report is written from whatever evidence exists when the limit is near.",
+        )
         # Proceed button
         if st.sidebar.button("Proceed with Research"):
             st.session_state.proceed = True
+            # The run's deadline starts now; closing the tab cancels whatever is still running
+            st.session_state.run.token = CancelToken(run_sla or None).watch(
+                streamlit_session_alive(), CANCEL_DISCONNECT_GRACE_SECONDS
+            )
             st.rerun()
         # Show current steps
         # st.sidebar.markdown("**Current Steps:**\n" + "\n".join([step.lstrip('.0123456789 ').strip() for step in st.session_state.steps]))
     else:
         try:
+            run = st.session_state.run
             steps = st.session_state.steps
             completed_steps = st.session_state.completed_steps
             sidebar_steps = st.sidebar.empty()
@@ -176,53 +222,60 @@ if st.session_state.query and st.session_state.steps:
                     step_lines.append(f"{clean_step}\n\n")
             sidebar_steps.markdown("\n".join(step_lines))
 
-            context = st.session_state.context
-            replan_rounds = 0
-            replan_limit_reached = False
-            max_steps_warning_shown = False
-
-            progress_bar = st.progress(0, text="Starting research steps...")
-
-            # --- Parallel execution in batches of 3 ---
-            batch_size = 3
-            i = len(completed_steps)
-            while i < len(st.session_state.steps):
-                batch_steps = st.session_state.steps[i:i+batch_size]
-                with concurrent.futures.ThreadPoolExecutor(max_workers=batch_size) as executor:
-                    future_to_step = {executor.submit(execute_step, step, context): step for step in batch_steps}
-                    for idx, future in enumerate(concurrent.futures.as_completed(future_to_step)):
-                        step = future_to_step[future]
-                        try:
-                            result = future.result()
-                        except Exception as e:
-                            logging.error(f"Error executing step '{step}': {e}")
-                            st.error("Brain down, try again shortly!")
-                            st.stop()
-                        completed_steps.append((step, result))
-                        context += f"\nStep: {step}\nResult: {result}\n"
-                        st.session_state.completed_steps = completed_steps
-                        st.session_state.context = context
-                        progress = int((len(completed_steps) / len(st.session_state.steps)) * 100)
-                        progress_bar.progress(progress / 100, text=f"Completed {len(completed_steps)} of {len(st.session_state.steps)} steps")
-                i += batch_size
-                # Replanning after every 3 steps
-                if not replan_limit_reached:
-                    try:
-                        new_steps, replan_rounds, replan_limit_reached = replanner(
-                            context, st.session_state.steps, replan_rounds, 3, replan_limit_reached, max_steps=max_steps
-                        )
-                        st.session_state.steps = new_steps
-                    except Exception as e:
-                        logging.error(f"Error during replanning: {e}")
-                        st.error("Brain down, try again shortly!")
-                        st.stop()
-
-            progress_bar.progress(1.0, text="All steps completed!")
+            budget = run.budget
+            if not st.session_state.report and st.sidebar.button("Stop and write report"):
+                st.session_state.stopped = True
+
+            progress_bar = st.progress(0, text=f"Starting research steps... ({budget.describe()})")
+
+            def show_progress():
+                completed = len(st.session_state.completed_steps)
+                seconds_left = run.token.remaining()
+                progress_bar.progress(
+                    min(completed / len(st.session_state.steps), 1.0),
+                    text=f"Completed {completed} of {len(st.session_state.steps)} steps · {budget.describe()}"
+                    + (f" · {seconds_left:.0f}s left" if seconds_left is not None else ""),
+                )
+
+            def on_step(step, result, completed_steps, context):
+                st.session_state.completed_steps = completed_steps
+                st.session_state.context = context
+                show_progress()
+
+            def on_replan(steps, new_steps):
+                st.session_state.steps = steps
+
+            try:
+                # Progress refreshes while waiting are where a rerun (new query, stop button) interrupts the steps
+                _, completed_steps, context, stop_reason = execute_plan(
+                    st.session_state.query, st.session_state.steps, run, execute_step,
+                    completed_steps=completed_steps, context=st.session_state.context,
+                    prefetcher=st.session_state.prefetcher, max_steps=max_steps,
+                    should_stop=lambda: st.session_state.stopped, on_step=on_step, on_replan=on_replan,
+                    on_wait=show_progress,
+                )
+            except Exception:
+                st.error("Brain down, try again shortly!")
+                st.stop()
+            if stop_reason == "budget":
+                st.warning("Run budget used up; writing the report from the steps completed so far.")
+            elif stop_reason:
+                st.warning("Research stopped; writing the report from the steps completed so far.")
+
+            progress_bar.progress(1.0, text=f"All steps completed! ({budget.describe()})")
+            if st.session_state.prefetcher:
+                st.session_state.prefetcher.report()
+                st.session_state.prefetcher.close()
+                st.session_state.prefetcher = None
 
             # Generate report only if not already in session state
             if not st.session_state.report:
                 try:
-                    st.session_state.report = report_writer(context)
+                    st.session_state.report = finish(st.session_state.query, completed_steps, context, run)
+                    store_report(
+                        st.session_state.query, "dfs", st.session_state.report, completed_steps,
+                        run.citation_index,
+                    )
                 except Exception as e:
                     logging.error(f"Error generating report: {e}")
                     st.error("Brain down, try again shortly!")
@@ -237,13 +290,22 @@ if st.session_state.report:
     # st.write(f"Query: {query}")
     st.subheader("Final Research Report")
     st.markdown(st.session_state.report)
-    word_buffer = generate_word_doc_from_markdown(st.session_state.report)
-    if word_buffer:
-        st.download_button(
-            label="Download Report as Word Document",
-            data=word_buffer,
-            file_name="deepquest_report.docx",
-            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        )
-    else:
-        st.error("Brain down, try again shortly!")
+    if st.session_state.run.telemetry.finished:
+        with st.expander("Run summary"):
+            st.table(st.session_state.run.telemetry.summary_rows())
+            counters = st.session_state.run.telemetry.counter
+            st.caption(
+                f"Spend: {st.session_state.run.budget.describe()}. "
+                f"Source calls: {counters('source.calls'):g}, cache hits: {counters('source.cache_hits'):g}, "
+                f"retries: {counters('source.retries'):g}, errors: {counters('source.errors'):g}; "
+                f"LLM fallbacks: {counters('llm.fallbacks'):g}"
+            )
+    render_export_panel(
+        st.session_state.report,
+        build_bundle(
+            st.session_state.query,
+            st.session_state.steps,
+            st.session_state.completed_steps,
+            st.session_state.run.citation_index,
+        ),
+    )
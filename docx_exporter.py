@@ -0,0 +1,189 @@
+import copy
+import functools
+import hashlib
+from io import BytesIO
+
+MAX_LIST_LEVEL = 3
+DOCUMENT_TITLE = "DeepQuest Research Report"
+
+TABLE_BORDERS_XML = r'''
+    <w:tblBorders %s>
+        <w:top w:val="single" w:sz="4" w:space="0" w:color="auto"/>
+        <w:left w:val="single" w:sz="4" w:space="0" w:color="auto"/>
+        <w:bottom w:val="single" w:sz="4" w:space="0" w:color="auto"/>
+        <w:right w:val="single" w:sz="4" w:space="0" w:color="auto"/>
+        <w:insideH w:val="single" w:sz="4" w:space="0" w:color="auto"/>
+        <w:insideV w:val="single" w:sz="4" w:space="0" w:color="auto"/>
+    </w:tblBorders>'''
+LINK_COLOR = (0x05, 0x63, 0xC1)
+
+
+@functools.lru_cache(maxsize=None)
+def _docx_parts():
+    """(markdown parser, table borders, link colour), built on the first export rather than at import.
+
+    Keeps python-docx and markdown-it out of app start-up. Each table gets a deep copy of the borders instead of
+    re-parsing the XML.
+    """
+    from docx.oxml import parse_xml
+    from docx.oxml.ns import nsdecls
+    from docx.shared import RGBColor
+    from markdown_it import MarkdownIt
+
+    # Raw HTML in a report stays literal text
+    parser = MarkdownIt("commonmark", {"html": False}).enable("table").enable("strikethrough")
+    return parser, parse_xml(TABLE_BORDERS_XML % nsdecls('w')), RGBColor(*LINK_COLOR)
+
+
+def _add_inline(paragraph, inline_token):
+    """Append the children of an inline token to a paragraph as formatted runs."""
+    bold = italic = strike = 0
+    link = None
+    for child in inline_token.children or []:
+        kind = child.type
+        if kind == "strong_open":
+            bold += 1
+        elif kind == "strong_close":
+            bold -= 1
+        elif kind == "em_open":
+            italic += 1
+        elif kind == "em_close":
+            italic -= 1
+        elif kind == "s_open":
+            strike += 1
+        elif kind == "s_close":
+            strike -= 1
+        elif kind == "link_open":
+            link = child.attrGet("href")
+        elif kind == "link_close":
+            if link and not link.startswith("#"):
+                paragraph.add_run(f" ({link})").italic = True
+            link = None
+        elif kind == "softbreak":
+            paragraph.add_run(" ")
+        elif kind == "hardbreak":
+            paragraph.add_run().add_break()
+        elif kind in ("text", "code_inline", "html_inline"):
+            run = paragraph.add_run(child.content)
+            if bold:
+                run.bold = True
+            if italic:
+                run.italic = True
+            if strike:
+                run.font.strike = True
+            if kind == "code_inline":
+                run.font.name = "Courier New"
+            if link:
+                run.underline = True
+                run.font.color.rgb = _docx_parts()[2]
+
+
+def _list_style(list_stack):
+    ordered = list_stack[-1]
+    level = min(len(list_stack), MAX_LIST_LEVEL)
+    base = "List Number" if ordered else "List Bullet"
+    return base if level == 1 else f"{base} {level}"
+
+
+class _StyledDocument:
+    """Wraps a Document, resolving style names to style IDs once instead of on every paragraph."""
+
+    def __init__(self):
+        from docx import Document
+
+        self.doc = Document()
+        self._style_ids = {}
+
+    def add_paragraph(self, style=None, text=""):
+        paragraph = self.doc.add_paragraph(text)
+        if style:
+            if style not in self._style_ids:
+                self._style_ids[style] = self.doc.styles[style].style_id
+            # Setting pStyle directly skips python-docx's per-call lookup through all styles
+            paragraph._p.style = self._style_ids[style]
+        return paragraph
+
+    def add_heading(self, text, level):
+        return self.add_paragraph("Title" if level == 0 else f"Heading {level}", text)
+
+
+def _build_table(doc, rows):
+    if not rows:
+        return
+    n_cols = max(len(row) for row in rows)
+    table = doc.add_table(rows=len(rows), cols=n_cols)
+    for table_row, row in zip(table.rows, rows):
+        cells = table_row.cells
+        for col_idx, (inline, is_header) in enumerate(row):
+            paragraph = cells[col_idx].paragraphs[0]
+            _add_inline(paragraph, inline)
+            if is_header:
+                for run in paragraph.runs:
+                    run.bold = True
+    table._tbl.tblPr.append(copy.deepcopy(_docx_parts()[1]))
+
+
+def markdown_to_docx(markdown_text):
+    """Convert markdown to DOCX bytes in a single pass over the markdown-it token stream."""
+    styled = _StyledDocument()
+    doc = styled.doc
+    styled.add_heading(DOCUMENT_TITLE, 0)
+    tokens = _docx_parts()[0].parse(markdown_text or "")
+    list_stack = []
+    quote_depth = 0
+    pending = None  # paragraph or heading awaiting its inline content
+    table_rows = None
+    for i, token in enumerate(tokens):
+        kind = token.type
+        if kind == "heading_open":
+            pending = styled.add_heading("", level=min(int(token.tag[1:]), 9))
+        elif kind == "paragraph_open":
+            if table_rows is None:
+                if list_stack and tokens[i - 1].type == "list_item_open":
+                    pending = styled.add_paragraph(_list_style(list_stack))
+                elif list_stack:
+                    # Continuation paragraph inside a list item keeps the list indentation
+                    level = min(len(list_stack), MAX_LIST_LEVEL)
+                    pending = styled.add_paragraph("List Continue" if level == 1 else f"List Continue {level}")
+                elif quote_depth:
+                    pending = styled.add_paragraph("Quote")
+                else:
+                    pending = doc.add_paragraph()
+        elif kind == "inline":
+            if table_rows is not None:
+                table_rows[-1].append((token, tokens[i - 1].type == "th_open"))
+            elif pending is not None:
+                _add_inline(pending, token)
+        elif kind in ("heading_close", "paragraph_close"):
+            pending = None
+        elif kind == "bullet_list_open":
+            list_stack.append(False)
+        elif kind == "ordered_list_open":
+            list_stack.append(True)
+        elif kind in ("bullet_list_close", "ordered_list_close"):
+            list_stack.pop()
+        elif kind == "blockquote_open":
+            quote_depth += 1
+        elif kind == "blockquote_close":
+            quote_depth -= 1
+        elif kind in ("fence", "code_block"):
+            paragraph = doc.add_paragraph()
+            run = paragraph.add_run(token.content.rstrip("\n"))
+            run.font.name = "Courier New"
+        elif kind == "hr":
+            doc.add_paragraph("_" * 40)
+        elif kind == "table_open":
+            table_rows = []
+        elif kind == "tr_open":
+            table_rows.append([])
+        elif kind == "table_close":
+            _build_table(doc, table_rows)
+            table_rows = None
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def report_hash(markdown_text):
+    """Key of a report's exports; export_pipeline keeps one rendered file per report hash and format (see export_key)."""
+    return hashlib.sha256((markdown_text or "").encode("utf-8")).hexdigest()
@@ -0,0 +1,143 @@
+import concurrent.futures
+import contextlib
+import logging
+from dotenv import load_dotenv
+from cancellation import REPORT_RESERVE_SECONDS, RunCancelled, as_completed
+from planner import PlanState, plan_research, replanner
+from run_context import use_run
+from speculative import SPECULATIVE_PREFETCH, SpeculativePrefetcher
+from telemetry import bind_context
+
+load_dotenv()
+
+BATCH_SIZE = 3
+MAX_REPLAN_ROUNDS = 3
+
+
+def research_mode(mode):
+    """(execute_step, source registry) of a mode: "bfs" calls the sources directly, "dfs" goes through their MCP servers."""
+    if mode == "dfs":
+        from dfs_stepexecutor import execute_step
+        from sources import mcp_registry as registry
+    else:
+        from bfs_stepexecutor import execute_step
+        from sources import registry
+    return execute_step, registry
+
+
+def start_prefetcher(registry):
+    """A SpeculativePrefetcher on the registry, or None when SPECULATIVE_PREFETCH is off."""
+    return SpeculativePrefetcher(registry) if SPECULATIVE_PREFETCH else None
+
+
+def plan(query, run, prefetcher=None, max_steps=20):
+    """Research plan for the query; each step goes to the prefetcher with its source hints as soon as it streams in."""
+    on_step = (lambda step: prefetcher.submit(step["text"], step.get("source_hints", ()))) if prefetcher else None
+    with use_run(run):
+        return plan_research(query, max_steps=max_steps, on_step=on_step)
+
+
+def next_batch(steps, started, step_details, batch_size=BATCH_SIZE):
+    """Up to batch_size unstarted steps, in plan order, whose depends_on steps all ran in earlier batches.
+
+    Dependencies on steps outside the plan (e.g. dropped as duplicates) are ignored; if no step is ready
+    (a dependency cycle), the first unstarted step runs anyway.
+    """
+    texts_by_id = {details["id"]: text for text, details in step_details.items()}
+    pending = [step for step in steps if step not in started]
+
+    def ready(step):
+        depends_on = [texts_by_id.get(i) for i in step_details.get(step, {}).get("depends_on", [])]
+        return all(text in started or text not in steps for text in depends_on)
+
+    return [step for step in pending if ready(step)][:batch_size] or pending[:1]
+
+
+def execute_plan(query, steps, run, execute_step, completed_steps=None, context="", prefetcher=None, max_steps=20,
+                 batch_size=BATCH_SIZE, should_stop=None, on_step=None, on_replan=None, on_wait=None, stage=None):
+    """Execute plan steps in parallel batches, replanning after each batch, until done, out of budget or stopped.
+
+    A step runs only in a batch after the steps it depends_on (see next_batch), so it sees their results.
+
+    This is the research loop of the Streamlit apps, the research service and the pipeline benchmark. It resumes after
+    completed_steps (e.g. on a Streamlit rerun) and stops early enough to leave REPORT_RESERVE_SECONDS of the run's
+    time limit for the report. Hooks: should_stop() is checked before each batch, on_step(step, result,
+    completed_steps, context) runs as each step finishes, on_replan(steps, new_steps) after each replan, on_wait()
+    while a batch is running (where a Streamlit rerun interrupts the script), and stage(name) is a context manager
+    around the "steps" and "replan" stages.
+
+    Returns (steps, completed_steps, context, stop_reason); stop_reason is None when every step ran, "budget" when
+    the run budget was used up, or why the steps were stopped.
+    """
+    completed_steps = [] if completed_steps is None else completed_steps
+    stage = stage or (lambda name: contextlib.nullcontext())
+    steps = list(steps)
+    with use_run(run):
+        steps_token = run.token.child(REPORT_RESERVE_SECONDS)
+        plan_state = PlanState(query)
+        replan_rounds = 0
+        replan_limit_reached = False
+        stop_reason = None
+        started = {step for step, _ in completed_steps}
+        while any(step not in started for step in steps):
+            if run.budget.exhausted():
+                stop_reason = "budget"
+                logging.warning(f"Run budget exhausted after {len(completed_steps)} steps: {run.budget.describe()}")
+                break
+            if (should_stop and should_stop()) or steps_token.cancelled():
+                stop_reason = steps_token.reason or "stop requested"
+                logging.warning(f"Research stopped after {len(completed_steps)} steps ({stop_reason})")
+                break
+            batch_context = ""
+            with stage("steps"), concurrent.futures.ThreadPoolExecutor(max_workers=batch_size) as executor:
+                future_to_step = {
+                    executor.submit(bind_context(execute_step), step, context, prefetcher, steps_token): step
+                    for step in next_batch(steps, started, run.steps, batch_size)
+                }
+                started.update(future_to_step.values())
+                try:
+                    for future in as_completed(future_to_step, on_wait=on_wait):
+                        step = future_to_step[future]
+                        try:
+                            result = future.result()
+                        except RunCancelled:
+                            continue
+                        except Exception as e:
+                            logging.error(f"Error executing step '{step}': {e}")
+                            raise
+                        completed_steps.append((step, result))
+                        context += f"\nStep: {step}\nResult: {result}\n"
+                        batch_context += f"\nStep: {step}\nResult: {result}\n"
+                        if on_step:
+                            on_step(step, result, completed_steps, context)
+                except BaseException:
+                    # Stop the batch's remaining steps instead of letting the executor wait them out
+                    steps_token.cancel("interrupted")
+                    raise
+            if not replan_limit_reached and not steps_token.cancelled():
+                planned = len(steps)
+                try:
+                    with stage("replan"):
+                        steps, replan_rounds, replan_limit_reached = replanner(
+                            batch_context, steps, replan_rounds, MAX_REPLAN_ROUNDS, replan_limit_reached,
+                            max_steps=max_steps, plan_state=plan_state,
+                        )
+                except Exception as e:
+                    logging.error(f"Error during replanning: {e}")
+                    raise
+                if on_replan:
+                    on_replan(steps, steps[planned:])
+        run.dedup_index.report()
+        plan_state.report()
+    return steps, completed_steps, context, stop_reason
+
+
+def finish(query, completed_steps, context, run):
+    """Write the report from the completed steps, close the run's telemetry and release its cancel token."""
+    from writer import write_report
+
+    with use_run(run):
+        report = write_report(query, completed_steps, context)
+    run.telemetry.finish()
+    run.token.release()
+    return report
@@ -0,0 +1,44 @@
+import time
+import streamlit as st
+from export_pipeline import EXPORT_FORMATS, get_export_pipeline
+
+POLL_SECONDS = 0.5
+
+
+def _rerun_panel():
+    """Rerun only this panel when it is running as a fragment; on a full script run Streamlit requires a full rerun."""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    st.rerun(scope="fragment" if ctx is not None and ctx.fragment_ids_this_run else "app")
+
+
+@st.fragment
+def render_export_panel(report, bundle):
+    """Download buttons for every export format; formats are rendered in the background on first request."""
+    pipeline = get_export_pipeline()
+    # DOCX is the usual download, so start it as soon as the report is shown
+    pipeline.request("docx", report, bundle)
+    pending = False
+    for col, (fmt, (_, ext, mime, label)) in zip(st.columns(len(EXPORT_FORMATS)), EXPORT_FORMATS.items()):
+        status = pipeline.status(fmt, report, bundle)
+        if status == "ready":
+            # Hand Streamlit the file on disk rather than keeping another copy of it in session state
+            with open(pipeline.path(fmt, report, bundle), "rb") as f:
+                col.download_button(
+                    label=f"Download {label}",
+                    data=f,
+                    file_name=f"deepquest_report.{ext}",
+                    mime=mime,
+                    key=f"download_{fmt}",
+                )
+        elif status == "pending":
+            pending = True
+            col.button(f"Preparing {label}...", disabled=True, key=f"pending_{fmt}")
+        elif col.button(f"Prepare {label}" if status == "missing" else f"Retry {label}", key=f"prepare_{fmt}"):
+            pipeline.request(fmt, report, bundle)
+            _rerun_panel()
+    if pending:
+        # Only this panel reruns while exports are being rendered
+        time.sleep(POLL_SECONDS)
+        _rerun_panel()
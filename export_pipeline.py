@@ -0,0 +1,185 @@
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+from cpu_pool import get_cpu_pool
+from docx_exporter import markdown_to_docx, report_hash
+
+load_dotenv()
+
+EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join(tempfile.gettempdir(), "deepquest_exports"))
+# Optional TTF font for PDF export; without it the PDF falls back to Latin-1 core fonts
+PDF_FONT_PATH = os.getenv("PDF_FONT_PATH")
+MAX_EXPORTS = 64
+# Formats that write the run bundle as well as the report
+BUNDLE_FORMATS = {"json"}
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>DeepQuest Research Report</title>
+<style>
+body {{ font-family: Georgia, serif; max-width: 50em; margin: 2em auto; line-height: 1.5; color: #222; }}
+table {{ border-collapse: collapse; }}
+th, td {{ border: 1px solid #999; padding: 0.3em 0.6em; }}
+code, pre {{ font-family: Consolas, monospace; background: #f4f4f4; }}
+blockquote {{ border-left: 3px solid #ccc; margin-left: 0; padding-left: 1em; color: #555; }}
+</style>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+
+def _markdown_to_html_body(report):
+    """HTML for the report's markdown; raw HTML in the report is escaped, since it comes from crawled pages via the LLM."""
+    from markdown_it import MarkdownIt
+
+    return MarkdownIt("commonmark", {"html": False}).enable("table").enable("strikethrough").render(report or "")
+
+
+def render_docx(report, bundle, path):
+    with open(path, "wb") as f:
+        f.write(markdown_to_docx(report))
+
+
+def render_html(report, bundle, path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(HTML_TEMPLATE.format(body=_markdown_to_html_body(report)))
+
+
+def render_pdf(report, bundle, path):
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    body = _markdown_to_html_body(report)
+    if PDF_FONT_PATH:
+        pdf.add_font("ReportFont", fname=PDF_FONT_PATH)
+        pdf.set_font("ReportFont", size=11)
+    else:
+        pdf.set_font("Helvetica", size=11)
+        # Core PDF fonts only cover Latin-1
+        body = body.encode("latin-1", "replace").decode("latin-1")
+    pdf.add_page()
+    pdf.write_html(body)
+    pdf.output(path)
+
+
+def render_json(report, bundle, path):
+    """Machine-readable bundle: query, plan, step results, sources and the report, written straight to disk."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(dict(bundle or {}, report=report), f, ensure_ascii=False, indent=1, default=str)
+
+
+# Format name -> (renderer, file extension, MIME type, label)
+EXPORT_FORMATS = OrderedDict([
+    ("docx", (render_docx, "docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document", "Word Document")),
+    ("html", (render_html, "html", "text/html", "HTML")),
+    ("pdf", (render_pdf, "pdf", "application/pdf", "PDF")),
+    ("json", (render_json, "json", "application/json", "JSON Bundle")),
+])
+
+
+def export_key(fmt, report, bundle=None):
+    """Memo key of an export: the report hash, combined with the bundle's hash for formats that write the bundle."""
+    digest = report_hash(report)
+    if fmt in BUNDLE_FORMATS:
+        bundle_json = json.dumps(bundle or {}, sort_keys=True, default=str)
+        digest = hashlib.sha256(f"{digest}\n{bundle_json}".encode("utf-8")).hexdigest()
+    return digest, fmt
+
+
+class ExportPipeline:
+    """Renders report exports on demand in a background worker and memoizes the files per export_key."""
+
+    def __init__(self, export_dir=EXPORT_DIR, max_workers=2, max_exports=MAX_EXPORTS):
+        self.export_dir = export_dir
+        self.max_exports = max_exports
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="export")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+
+    def _render(self, fmt, report, bundle, path):
+        renderer = EXPORT_FORMATS[fmt][0]
+        os.makedirs(self.export_dir, exist_ok=True)
+        # Render to a temporary name so readers never see a half-written file
+        partial = f"{path}.part"
+        # Rendering is CPU-bound; with a CPU pool configured it runs in a worker and only the file comes back
+        get_cpu_pool().run(renderer, report, bundle, partial)
+        os.replace(partial, path)
+        logging.info(f"Exported report as {fmt}: {path} ({os.path.getsize(path)} bytes)")
+        return path
+
+    def request(self, fmt, report, bundle=None):
+        """Start rendering a format (if not already started) and return its Future, which resolves to a file path."""
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {fmt}")
+        key = export_key(fmt, report, bundle)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not (job.done() and job.exception() is not None):
+                self._jobs.move_to_end(key)
+                return job
+            path = os.path.join(self.export_dir, f"{key[0][:16]}.{EXPORT_FORMATS[fmt][1]}")
+            job = self._executor.submit(self._render, fmt, report, bundle, path)
+            self._jobs[key] = job
+            self._evict()
+            return job
+
+    def status(self, fmt, report, bundle=None):
+        """'missing', 'pending', 'ready' or 'failed' for a format of a report."""
+        with self._lock:
+            job = self._jobs.get(export_key(fmt, report, bundle))
+        if job is None:
+            return "missing"
+        if not job.done():
+            return "pending"
+        return "failed" if job.exception() is not None else "ready"
+
+    def path(self, fmt, report, bundle=None):
+        with self._lock:
+            job = self._jobs.get(export_key(fmt, report, bundle))
+        if job is None or not job.done() or job.exception() is not None:
+            return None
+        return job.result()
+
+    def _evict(self):
+        while len(self._jobs) > self.max_exports:
+            _, job = self._jobs.popitem(last=False)
+            if job.done() and job.exception() is None:
+                try:
+                    os.remove(job.result())
+                except OSError:
+                    pass
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_export_pipeline():
+    """Process-wide export pipeline shared by all sessions."""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = ExportPipeline()
+        return _pipeline
+
+
+def build_bundle(query, steps, completed_steps, citation_index=None):
+    """Collect the run data that goes into the JSON export alongside the report."""
+    return {
+        "query": query,
+        "plan": list(steps),
+        "steps": [{"step": step, "result": result} for step, result in completed_steps],
+        "sources": list(citation_index.sources.values()) if citation_index else [],
+    }
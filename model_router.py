@@ -0,0 +1,285 @@
+import concurrent.futures
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dotenv import load_dotenv
+from config import get_client
+from dedup import estimate_tokens
+from budget import get_run_budget
+from cancellation import RunCancelled, get_run_token, wait_future
+from telemetry import bind_context, get_run_telemetry
+
+load_dotenv()
+
+# Routing policy: "static" (per-task default first), "latency" (fastest within SLO) or "cost" (cheapest within SLO)
+ROUTING_POLICY = os.getenv("ROUTING_POLICY", "static")
+# Deployments available on the Azure OpenAI resource, in fallback order; every task needs two it can use to fall back
+MODEL_DEPLOYMENTS = [
+    d.strip() for d in os.getenv("MODEL_DEPLOYMENTS", "gpt-4.1,gpt-4.1-mini,model-router").split(",") if d.strip()
+]
+# JSONL log of every routing decision; off unless a path is set
+ROUTING_LOG_PATH = os.getenv("ROUTING_LOG_PATH", "")
+LATENCY_WINDOW = 200
+# Threads that make the blocking LLM calls, so callers can wait on them cancellably
+LLM_CALL_WORKERS = int(os.getenv("LLM_CALL_WORKERS", "32"))
+
+# Known deployment characteristics; USD per 1k tokens
+DEPLOYMENT_CATALOG = {
+    "gpt-4.1": {"context_window": 1000000, "input_cost": 0.002, "output_cost": 0.008, "capabilities": {"json_schema", "functions"}},
+    "gpt-4.1-mini": {"context_window": 1000000, "input_cost": 0.0004, "output_cost": 0.0016, "capabilities": {"json_schema", "functions"}},
+    "gpt-4.1-nano": {"context_window": 1000000, "input_cost": 0.0001, "output_cost": 0.0004, "capabilities": {"json_schema", "functions"}},
+    "model-router": {"context_window": 200000, "input_cost": 0.002, "output_cost": 0.008, "capabilities": set()},
+}
+DEFAULT_DEPLOYMENT_SPEC = {"context_window": 128000, "input_cost": 0.002, "output_cost": 0.008, "capabilities": set()}
+
+# Per-task default deployment, latency SLO (seconds), expected output size and required capabilities
+TASK_PROFILES = {
+    "planner": {"default": "gpt-4.1", "latency_slo": 30, "expected_output_tokens": 1000, "requires": {"json_schema"}},
+    "executor": {"default": "gpt-4.1", "latency_slo": 60, "expected_output_tokens": 1500, "requires": {"functions"}},
+    "summarizer": {"default": "gpt-4.1", "latency_slo": 60, "expected_output_tokens": 1000, "requires": set()},
+    "outliner": {"default": "gpt-4.1", "latency_slo": 30, "expected_output_tokens": 500, "requires": {"json_schema"}},
+    "writer": {"default": "model-router", "latency_slo": 180, "expected_output_tokens": 6000, "requires": set()},
+    "evaluator": {"default": "model-router", "latency_slo": 30, "expected_output_tokens": 200, "requires": set()},
+}
+
+
+def retryable_errors():
+    """Transient OpenAI errors that fall back to the next deployment; openai is only imported once a call fails."""
+    from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+    return (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+
+class DeploymentStats:
+    """Observed latency histogram and error counts for one deployment."""
+
+    def __init__(self):
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.successes = 0
+        self.errors = 0
+
+    def p90(self):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(0.9 * len(ordered)))]
+
+    def error_rate(self):
+        total = self.successes + self.errors
+        return self.errors / total if total else 0.0
+
+
+class ModelRouter:
+    """Picks a deployment per call from task type, prompt size, latency SLO and observed behaviour."""
+
+    def __init__(self, deployments=None, policy=None, log_path=None):
+        self.deployments = list(deployments or MODEL_DEPLOYMENTS)
+        self.policy = policy or ROUTING_POLICY
+        self.log_path = log_path if log_path is not None else ROUTING_LOG_PATH
+        self._lock = threading.Lock()
+        self._stats = {d: DeploymentStats() for d in self.deployments}
+        for task, profile in TASK_PROFILES.items():
+            capable = [d for d in self.deployments if profile["requires"] <= self._spec(d)["capabilities"]]
+            if len(capable) < 2:
+                logging.warning(
+                    f"Only {capable or 'no deployment'} in MODEL_DEPLOYMENTS can serve {task} calls "
+                    f"(needs {sorted(profile['requires'])}); they have no fallback"
+                )
+
+    def _spec(self, deployment):
+        return DEPLOYMENT_CATALOG.get(deployment, DEFAULT_DEPLOYMENT_SPEC)
+
+    def _estimated_cost(self, deployment, prompt_tokens, output_tokens):
+        return deployment_cost(deployment, prompt_tokens, output_tokens)
+
+    def candidates(self, task, prompt_tokens, requires=()):
+        """Deployments to try for a call, best first; later entries are fallbacks."""
+        profile = TASK_PROFILES.get(task, TASK_PROFILES["executor"])
+        requires = set(profile["requires"]) | set(requires)
+        eligible = [
+            d for d in self.deployments
+            if requires <= self._spec(d)["capabilities"]
+            and prompt_tokens + profile["expected_output_tokens"] <= self._spec(d)["context_window"]
+        ]
+        if not eligible:
+            eligible = list(self.deployments)
+        slo = profile["latency_slo"]
+        with self._lock:
+            observed = {d: (self._stats[d].p90(), self._stats[d].error_rate()) for d in eligible}
+
+        def within_slo(d):
+            p90 = observed[d][0]
+            return p90 is None or p90 <= slo
+
+        if self.policy == "latency":
+            # Unobserved deployments are assumed to sit at half the SLO until measured
+            key = lambda d: (observed[d][0] if observed[d][0] is not None else slo / 2) * (1 + 4 * observed[d][1])
+        elif self.policy == "cost":
+            key = lambda d: (
+                not within_slo(d),
+                self._estimated_cost(d, prompt_tokens, profile["expected_output_tokens"]) * (1 + 4 * observed[d][1]),
+            )
+        else:
+            key = lambda d: (d != profile["default"], self.deployments.index(d))
+        return sorted(eligible, key=key)
+
+    def _record(self, deployment, latency, ok):
+        with self._lock:
+            stats = self._stats.setdefault(deployment, DeploymentStats())
+            if ok:
+                stats.successes += 1
+                stats.latencies.append(latency)
+            else:
+                stats.errors += 1
+
+    def _log_decision(self, decision):
+        logging.info(
+            f"Routing {decision['task']} ({decision['prompt_tokens']} tokens, policy {decision['policy']}) "
+            f"-> {decision['chosen']} after {len(decision['attempts']) - 1} fallbacks"
+        )
+        if not self.log_path:
+            return
+        try:
+            with self._lock, open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(decision) + "\n")
+        except OSError as e:
+            logging.warning(f"Could not write routing log: {e}")
+
+    def chat_completion(self, task, messages, requires=(), token=None, **kwargs):
+        """Create a chat completion for a task, falling back to the next deployment on 429/timeout/5xx.
+
+        Raises RunCancelled as soon as the run's cancel token fires, even mid-call: the request runs on a worker
+        thread and is abandoned (its response closed once it arrives); no call outlives its deadline.
+        """
+        token = token or get_run_token()
+        prompt_tokens = estimate_tokens(json.dumps(messages, default=str))
+        order = self.candidates(task, prompt_tokens, requires)
+        if not order:
+            raise ValueError("No model deployments configured; set MODEL_DEPLOYMENTS.")
+        decision = {
+            "ts": time.time(),
+            "task": task,
+            "policy": self.policy,
+            "prompt_tokens": prompt_tokens,
+            "candidates": order,
+            "attempts": [],
+            "chosen": None,
+        }
+        telemetry = get_run_telemetry()
+        span = telemetry.start_span("llm", task=task, policy=self.policy, estimated_prompt_tokens=prompt_tokens)
+        last_error = None
+        for deployment in order:
+            start = time.perf_counter()
+            try:
+                token.check()
+                if token.remaining() is not None:
+                    kwargs["timeout"] = token.timeout(kwargs.get("timeout"))
+                future = _call_pool.submit(
+                    bind_context(get_client().chat.completions.create), model=deployment, messages=messages, **kwargs
+                )
+                try:
+                    response = wait_future(future, token)
+                except RunCancelled:
+                    _close_when_done(future)
+                    raise
+            except retryable_errors() as e:
+                latency = time.perf_counter() - start
+                self._record(deployment, latency, ok=False)
+                decision["attempts"].append({"deployment": deployment, "latency": round(latency, 3), "error": type(e).__name__})
+                logging.warning(f"Deployment {deployment} failed for {task} ({type(e).__name__}), falling back")
+                telemetry.incr("llm.fallbacks", task=task, deployment=deployment, error=type(e).__name__)
+                last_error = e
+                continue
+            except Exception as e:
+                span.fail(e)
+                telemetry.end_span(span)
+                raise
+            latency = time.perf_counter() - start
+            self._record(deployment, latency, ok=True)
+            decision["attempts"].append({"deployment": deployment, "latency": round(latency, 3), "error": None})
+            decision["chosen"] = deployment
+            self._log_decision(decision)
+            span.set(deployment=deployment, fallbacks=len(decision["attempts"]) - 1)
+            telemetry.incr("llm.calls", task=task, deployment=deployment)
+            if kwargs.get("stream"):
+                # Usage arrives with the last chunk, so the span stays open until the stream is drained
+                return _traced_stream(response, telemetry, span, token)
+            _record_usage(telemetry, span, getattr(response, "usage", None))
+            telemetry.observe("llm.latency", latency, task=task, deployment=deployment)
+            telemetry.end_span(span)
+            return response
+        self._log_decision(decision)
+        span.fail(last_error)
+        telemetry.end_span(span)
+        raise last_error
+
+    def snapshot(self):
+        """Per-deployment p90 latency, error rate and call counts."""
+        with self._lock:
+            return {
+                d: {"p90_latency": s.p90(), "error_rate": s.error_rate(), "successes": s.successes, "errors": s.errors}
+                for d, s in self._stats.items()
+            }
+
+
+def deployment_cost(deployment, prompt_tokens, output_tokens):
+    """USD cost of a call from the deployment's catalog prices."""
+    spec = DEPLOYMENT_CATALOG.get(deployment, DEFAULT_DEPLOYMENT_SPEC)
+    return (prompt_tokens * spec["input_cost"] + output_tokens * spec["output_cost"]) / 1000
+
+
+def _record_usage(telemetry, span, usage):
+    """Feed a call's token usage to the run's telemetry and budget; the prompt estimate stands in if usage is missing."""
+    if usage is None:
+        prompt_tokens, completion_tokens = span.attributes.get("estimated_prompt_tokens", 0), 0
+    else:
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    cost = deployment_cost(span.attributes.get("deployment"), prompt_tokens, completion_tokens)
+    span.set(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, cost=round(cost, 6))
+    task = span.attributes.get("task")
+    telemetry.incr("llm.tokens", prompt_tokens, task=task, kind="prompt")
+    telemetry.incr("llm.tokens", completion_tokens, task=task, kind="completion")
+    telemetry.incr("llm.cost", cost, task=task)
+    get_run_budget().record(prompt_tokens, completion_tokens, cost)
+
+
+def _close_when_done(future):
+    """Close the response of an abandoned call once it arrives, releasing its connection instead of reading it."""
+    def close(done):
+        if not done.cancelled() and done.exception() is None:
+            getattr(done.result(), "close", lambda: None)()
+
+    future.add_done_callback(close)
+
+
+def _traced_stream(stream, telemetry, span, token):
+    usage = None
+    try:
+        for chunk in stream:
+            if token.cancelled():
+                # Closing the response stops the generation server-side as well
+                getattr(stream, "close", lambda: None)()
+                token.check()
+            usage = getattr(chunk, "usage", None) or usage
+            yield chunk
+    except Exception as e:
+        span.fail(e)
+        raise
+    finally:
+        _record_usage(telemetry, span, usage)
+        span.end()
+        telemetry.observe("llm.latency", span.duration, task=span.attributes.get("task"), deployment=span.attributes.get("deployment"))
+        telemetry.end_span(span)
+
+
+_call_pool = concurrent.futures.ThreadPoolExecutor(max_workers=LLM_CALL_WORKERS, thread_name_prefix="llm-call")
+router = ModelRouter()
+
+
+def chat_completion(task, messages, **kwargs):
+    """Route a chat completion through the shared router."""
+    return router.chat_completion(task, messages, **kwargs)
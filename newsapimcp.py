@@ -1,34 +1,16 @@
-from newsapi import NewsApiClient
 import logging
-import os
 from fastmcp import FastMCP
 from dotenv import load_dotenv
+from sources import registry
 load_dotenv()
 
 mcp = FastMCP(name="NewsAPI Search Tool", host="0.0.0.0",port=8050)
 
-NEWSAPI_KEY = os.getenv("NEWSAPI_KEY")
-
-def newsapi_call(newsapi, query):
-    try:
-        return newsapi.get_everything(
-            q=query, language="en", sort_by="relevancy", page_size=5
-        )
-    except Exception as e:
-        logging.error(f"Error in newsapi_call: {e}")
-        raise
-
 @mcp.tool("newsapi_search")
 def newsapi_search(query):
+    """Recent news articles for a query; repeat queries only fetch articles published since the last call."""
     try:
-        newsapi = NewsApiClient(api_key=NEWSAPI_KEY)
-        articles = newsapi_call(newsapi, query)
-        results = []
-        for i, article in enumerate(articles.get("articles", [])):
-            results.append(
-                f"[News {i + 1}] {article['title']} ({article['source']['name']})\n{article['description']}\nURL: {article['url']}"
-            )
-        return results
+        return [text for text, _ in registry.fetch("newsapi", query)]
     except Exception as e:
         logging.error(f"NewsAPI Error: {e}")
         return [f"NewsAPI Error: {str(e)}"]
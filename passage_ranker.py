@@ -0,0 +1,171 @@
+import logging
+import math
+import os
+import re
+from collections import Counter
+from dotenv import load_dotenv
+from dedup import estimate_tokens
+
+load_dotenv()
+
+# Token budget kept per crawled page and target chunk size, both configurable from .env
+PASSAGE_TOKEN_BUDGET = int(os.getenv("PASSAGE_TOKEN_BUDGET", "1200"))
+PASSAGE_CHUNK_TOKENS = int(os.getenv("PASSAGE_CHUNK_TOKENS", "200"))
+# Optional embedding rerank: set to an Azure OpenAI embedding deployment name to enable
+EMBEDDING_DEPLOYMENT = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT")
+RERANK_CANDIDATES = 20
+
+TOKEN_PATTERN = re.compile(r"\w+")
+HEADING_PATTERN = re.compile(r"^#{1,6}\s")
+LINE_PATTERN = re.compile(r"\n")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is",
+    "it", "of", "on", "or", "that", "the", "this", "to", "was", "what", "when", "which",
+    "who", "why", "with",
+}
+
+
+def tokenize(text):
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def split_block(block, max_tokens):
+    """Split a block over max_tokens (a long list, table, code block or paragraph) on line, then sentence, boundaries."""
+    if estimate_tokens(block) <= max_tokens:
+        return [block]
+    for separator, joiner in ((LINE_PATTERN, "\n"), (SENTENCE_PATTERN, " ")):
+        pieces = [piece for piece in separator.split(block) if piece.strip()]
+        if len(pieces) > 1:
+            break
+    else:
+        # One unbroken sentence: cut it by length
+        size = max(1, len(block) * max_tokens // estimate_tokens(block))
+        return [block[i:i + size] for i in range(0, len(block), size)]
+    parts = []
+    current = []
+    current_tokens = 0
+    for piece in pieces:
+        for part in split_block(piece, max_tokens):
+            part_tokens = estimate_tokens(part)
+            if current and current_tokens + part_tokens > max_tokens:
+                parts.append(joiner.join(current))
+                current, current_tokens = [], 0
+            current.append(part)
+            current_tokens += part_tokens
+    if current:
+        parts.append(joiner.join(current))
+    return parts
+
+
+def chunk_markdown(markdown, max_tokens=PASSAGE_CHUNK_TOKENS):
+    """Split markdown into paragraph-aligned chunks of roughly max_tokens, each prefixed by its heading.
+
+    Blocks larger than max_tokens on their own are split on line or sentence boundaries first (see split_block).
+    """
+    chunks = []
+    heading = ""
+    current = []
+    current_tokens = 0
+
+    def flush():
+        if current:
+            body = "\n\n".join(current)
+            chunks.append(f"{heading}\n{body}" if heading and not body.startswith(heading) else body)
+
+    for block in re.split(r"\n\s*\n", markdown or ""):
+        block = block.strip()
+        if not block:
+            continue
+        if HEADING_PATTERN.match(block):
+            flush()
+            current, current_tokens = [], 0
+            heading = block.splitlines()[0]
+        for piece in split_block(block, max_tokens):
+            piece_tokens = estimate_tokens(piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                flush()
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    flush()
+    return chunks
+
+
+def bm25_scores(chunks, query, k1=1.5, b=0.75):
+    """Score each chunk against the query with Okapi BM25."""
+    docs = [Counter(tokenize(chunk)) for chunk in chunks]
+    terms = set(tokenize(query))
+    if not docs or not terms:
+        return [0.0] * len(chunks)
+    lengths = [sum(doc.values()) for doc in docs]
+    avg_length = (sum(lengths) / len(lengths)) or 1.0
+    n = len(docs)
+    idf = {}
+    for term in terms:
+        df = sum(1 for doc in docs if term in doc)
+        idf[term] = math.log(1 + (n - df + 0.5) / (df + 0.5))
+    scores = []
+    for doc, length in zip(docs, lengths):
+        score = 0.0
+        for term in terms:
+            tf = doc.get(term, 0)
+            if tf:
+                score += idf[term] * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_length))
+        scores.append(score)
+    return scores
+
+
+def embed_texts(texts):
+    """Embed texts with the configured Azure OpenAI embedding deployment."""
+    from config import get_client
+
+    response = get_client().embeddings.create(model=EMBEDDING_DEPLOYMENT, input=list(texts))
+    return [item.embedding for item in response.data]
+
+
+def cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def embedding_rerank(chunks, query, candidates):
+    """Reorder candidate chunk indices by embedding cosine similarity to the query."""
+    vectors = embed_texts([query] + [chunks[i] for i in candidates])
+    query_vec = vectors[0]
+    similarity = {i: cosine(query_vec, vec) for i, vec in zip(candidates, vectors[1:])}
+    return sorted(candidates, key=lambda i: similarity[i], reverse=True)
+
+
+def select_passages(markdown, query, token_budget=PASSAGE_TOKEN_BUDGET, use_embeddings=None):
+    """Return the most query-relevant passages of a page that fit in token_budget, in page order."""
+    if not markdown:
+        return ""
+    if estimate_tokens(markdown) <= token_budget:
+        return markdown
+    chunks = chunk_markdown(markdown)
+    scores = bm25_scores(chunks, query)
+    ranked = sorted(range(len(chunks)), key=lambda i: scores[i], reverse=True)
+    # Drop chunks that share no terms with the query; fall back to page order if nothing matches
+    ranked = [i for i in ranked if scores[i] > 0] or list(range(len(chunks)))
+    if use_embeddings is None:
+        use_embeddings = bool(EMBEDDING_DEPLOYMENT)
+    if use_embeddings:
+        try:
+            head = embedding_rerank(chunks, query, ranked[:RERANK_CANDIDATES])
+            ranked = head + ranked[RERANK_CANDIDATES:]
+        except Exception as e:
+            logging.warning(f"Embedding rerank failed, using BM25 order: {e}")
+    kept = []
+    used = 0
+    for i in ranked:
+        cost = estimate_tokens(chunks[i])
+        if used + cost > token_budget:
+            continue
+        kept.append(i)
+        used += cost
+    if not kept:
+        # Even the best chunk is over budget (e.g. a long heading prefix): keep as much of it as fits
+        return chunks[ranked[0]][:token_budget * 4]
+    return "\n\n[...]\n\n".join(chunks[i] for i in sorted(kept))
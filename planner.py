@@ -1,74 +1,386 @@
 from dotenv import load_dotenv
-from config import client
+from budget import get_run_budget
+from model_router import chat_completion
+from passage_ranker import EMBEDDING_DEPLOYMENT, cosine, embed_texts, tokenize
+from run_context import current_run
+from telemetry import incr, span
+import json
 import logging
+import time
 
 load_dotenv()
 
+SOURCES = ["google", "arxiv", "newsapi", "sec", "wikipedia"]
+# Token-overlap and embedding similarity above which two steps count as the same step
+STEP_JACCARD_THRESHOLD = 0.7
+STEP_COSINE_THRESHOLD = 0.9
+# Share of never-seen terms in a batch of results below which replanning is skipped
+REPLAN_NOVELTY_THRESHOLD = 0.15
 
-def plan_research(query, max_steps=20):
-    """Ask the LLM to generate a step-by-step research plan for the query, with a dynamic max_steps limit."""
+STEP_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "id": {"type": "integer", "description": "1-based position of the step in the plan."},
+        "text": {"type": "string", "description": "The full, self-contained instruction for this step."},
+        "source_hints": {
+            "type": "array",
+            "items": {"type": "string", "enum": SOURCES},
+            "description": "Sources most likely to hold the evidence for this step.",
+        },
+        "depends_on": {
+            "type": "array",
+            "items": {"type": "integer"},
+            "description": "Ids of steps whose results this step needs.",
+        },
+        "estimated_cost": {
+            "type": "string",
+            "enum": ["low", "medium", "high"],
+            "description": "Rough effort: number of searches and amount of reading needed.",
+        },
+    },
+    "required": ["id", "text", "source_hints", "depends_on", "estimated_cost"],
+    "additionalProperties": False,
+}
+
+PLAN_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "research_plan",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {"steps": {"type": "array", "items": STEP_SCHEMA}},
+            "required": ["steps"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+REPLAN_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "research_replan",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "steps": {"type": "array", "items": STEP_SCHEMA},
+                "covered_goals": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Short statements of what the research has established so far.",
+                },
+                "open_questions": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Questions still unanswered for the original query.",
+                },
+            },
+            "required": ["steps", "covered_goals", "open_questions"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+class PlanState:
+    """Compact running state of a research run, sent to the replanner instead of the full context."""
+
+    def __init__(self, query):
+        self.query = query
+        self.covered_goals = []
+        self.open_questions = []
+        self.seen_terms = set()
+        self.stats = {"calls": 0, "skipped": 0, "prompt_tokens": 0, "completion_tokens": 0, "latency_seconds": 0.0}
+
+    def is_novel(self, new_results):
+        """Cheap local coverage check: do the newest results add terms or touch an open question?"""
+        terms = set(tokenize(new_results))
+        if not terms:
+            return False
+        if not self.seen_terms:
+            return True
+        if any(set(tokenize(question)) & terms for question in self.open_questions):
+            return True
+        return len(terms - self.seen_terms) / len(terms) >= REPLAN_NOVELTY_THRESHOLD
+
+    def summary(self):
+        covered = "\n".join(f"- {goal}" for goal in self.covered_goals) or "- (none yet)"
+        questions = "\n".join(f"- {question}" for question in self.open_questions) or "- (none recorded)"
+        return f"Original query: {self.query}\n\nCovered so far:\n{covered}\n\nOpen questions:\n{questions}"
+
+    def record_usage(self, usage, latency):
+        self.stats["calls"] += 1
+        self.stats["latency_seconds"] += latency
+        if usage is not None:
+            self.stats["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+            self.stats["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+
+    def report(self):
+        stats = dict(self.stats, latency_seconds=round(self.stats["latency_seconds"], 2))
+        logging.info(
+            f"Replanning: {stats['calls']} LLM calls, {stats['skipped']} skipped, "
+            f"{stats['prompt_tokens']} prompt + {stats['completion_tokens']} completion tokens, "
+            f"{stats['latency_seconds']}s"
+        )
+        return stats
+
+
+class _StepStreamParser:
+    """Incrementally pulls complete step objects out of a streamed {"steps": [...]} JSON document."""
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._start = None
+
+    def feed(self, delta):
+        self.buffer += delta
+        steps = []
+        while self._pos < len(self.buffer):
+            ch = self.buffer[self._pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+                if self._depth == 2:
+                    self._start = self._pos
+            elif ch == "}":
+                if self._depth == 2 and self._start is not None:
+                    try:
+                        steps.append(json.loads(self.buffer[self._start:self._pos + 1]))
+                    except json.JSONDecodeError:
+                        pass
+                    self._start = None
+                self._depth -= 1
+            self._pos += 1
+        return steps
+
+
+def _is_duplicate_step(candidate, existing, existing_vectors=None, candidate_vector=None):
+    """True if candidate says the same thing as any existing step (token overlap or embedding similarity)."""
+    candidate_terms = set(tokenize(candidate))
+    for i, step in enumerate(existing):
+        if step.strip().lower() == candidate.strip().lower():
+            return True
+        terms = set(tokenize(step))
+        union = candidate_terms | terms
+        if union and len(candidate_terms & terms) / len(union) >= STEP_JACCARD_THRESHOLD:
+            return True
+        if candidate_vector is not None and existing_vectors is not None:
+            if cosine(candidate_vector, existing_vectors[i]) >= STEP_COSINE_THRESHOLD:
+                return True
+    return False
+
+
+def dedupe_steps(candidates, existing=()):
+    """Return candidate step dicts that are not semantically duplicated by existing texts or each other."""
+    existing = list(existing)
+    texts = [c["text"] for c in candidates]
+    vectors = None
+    if EMBEDDING_DEPLOYMENT and texts:
+        try:
+            vectors = embed_texts(existing + texts)
+        except Exception as e:
+            logging.warning(f"Step embedding failed, using token overlap only: {e}")
+    kept = []
+    kept_texts = list(existing)
+    kept_vectors = list(vectors[:len(existing)]) if vectors else None
+    for i, candidate in enumerate(candidates):
+        vector = vectors[len(existing) + i] if vectors else None
+        if _is_duplicate_step(candidate["text"], kept_texts, kept_vectors, vector):
+            logging.info(f"Dropping duplicate step: {candidate['text']}")
+            continue
+        kept.append(candidate)
+        kept_texts.append(candidate["text"])
+        if kept_vectors is not None:
+            kept_vectors.append(vector)
+    return kept
+
+
+def _request_plan(messages, on_step=None, response_format=PLAN_RESPONSE_FORMAT):
+    """Call the planner with a JSON schema; stream and report steps via on_step if given.
+
+    Returns (content, model name, usage).
+    """
+    if not on_step:
+        response = chat_completion("planner", messages, response_format=response_format)
+        return response.choices[0].message.content, getattr(response, 'model', None), getattr(response, 'usage', None)
+    stream = chat_completion(
+        "planner",
+        messages,
+        response_format=response_format,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    parser = _StepStreamParser()
+    name = None
+    usage = None
+    for chunk in stream:
+        name = name or getattr(chunk, 'model', None)
+        usage = getattr(chunk, 'usage', None) or usage
+        if not chunk.choices:
+            continue
+        for step in parser.feed(chunk.choices[0].delta.content or ""):
+            if str(step.get("text", "")).strip():
+                on_step(dict(step, text=step["text"].strip()))
+    return parser.buffer, name, usage
+
+
+def _load_plan_json(plan_text):
+    try:
+        data = json.loads(plan_text)
+    except json.JSONDecodeError as e:
+        logging.error(f"Could not parse structured plan: {e}")
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _parse_plan(plan_text):
+    return _plan_steps(_load_plan_json(plan_text))
+
+
+def _plan_steps(data):
+    steps = data.get("steps", [])
+    return [
+        dict(step, text=step["text"].strip())
+        for step in steps
+        if isinstance(step, dict) and str(step.get("text", "")).strip()
+    ]
+
+
+def get_run_steps():
+    """Planner step dicts of the active run (see run_context), by step text."""
+    return current_run().steps
+
+
+def _record_steps(new_steps):
+    """Add step dicts to the active run, renumbering ids that clash with its earlier steps."""
+    known = get_run_steps()
+    taken = {step["id"] for step in known.values()}
+    renumbered = {}
+    for step in new_steps:
+        if not isinstance(step.get("id"), int) or step["id"] in taken:
+            new_id = max(taken, default=0) + 1
+            renumbered[step.get("id")] = new_id
+            step["id"] = new_id
+        taken.add(step["id"])
+    for step in new_steps:
+        step["depends_on"] = [renumbered.get(i, i) for i in step.get("depends_on", []) if renumbered.get(i, i) != step["id"]]
+        step.setdefault("source_hints", [])
+        step.setdefault("estimated_cost", "medium")
+        known[step["text"]] = step
+
+
+def plan_research_structured(query, max_steps=20, on_step=None):
+    """Generate a research plan as step dicts with id, text, source_hints, depends_on and estimated_cost.
+
+    If on_step is given the plan is streamed and on_step is called with each step dict as it arrives,
+    so callers can start work on early steps before the full plan is ready. The plan is cut to the steps
+    whose estimated cost the run budget can afford and recorded in the active run.
+    """
+    max_steps = get_run_budget().max_steps(max_steps)
     plan_prompt = (
         "You are an expert research agent. "
         f"Given the following user query, create a clear, step-by-step research plan. "
         f"Each step should be actionable and focused on gathering or synthesizing information needed to answer the query. "
-        f"Do not add unnecessary steps. Return the plan as a numbered list. "
+        f"Do not add unnecessary or overlapping steps. "
         f"Do not exceed {max_steps} steps in your plan.\n\n"
         f"User Query: {query}"
     )
-    response = client.chat.completions.create(
-        model="gpt-4.1",
-        messages=[
-            {"role": "system", "content": "You are a research planning assistant."},
-            {"role": "user", "content": plan_prompt},
-        ],
-    )
-    plan_text = response.choices[0].message.content
-    name = getattr(response, 'model', "model_not_found")
-    if name:
-        logging.info(f"Planning step used model: {name}")
-    else:
-        logging.warning("No model name found in planning response, using default model.")
-    steps = [
-        step[2:].strip()
-        for step in plan_text.split("\n")
-        if step.strip() and step[0].isdigit()
+    messages = [
+        {"role": "system", "content": "You are a research planning assistant."},
+        {"role": "user", "content": plan_prompt},
     ]
-    return steps
+    with span("plan", max_steps=max_steps, streamed=bool(on_step)) as plan_span:
+        plan_text, name, _ = _request_plan(messages, on_step)
+        if name:
+            logging.info(f"Planning step used model: {name}")
+        else:
+            logging.warning("No model name found in planning response, using default model.")
+        plan = get_run_budget().affordable_steps(dedupe_steps(_parse_plan(plan_text))[:max_steps])
+        plan_span.set(steps=len(plan))
+    _record_steps(plan)
+    return plan
+
+
+def plan_research(query, max_steps=20, on_step=None):
+    """Ask the LLM to generate a step-by-step research plan for the query, with a dynamic max_steps limit."""
+    return [step["text"] for step in plan_research_structured(query, max_steps, on_step)]
 
-def replanner(context, steps, replan_rounds, max_replan_rounds, replan_limit_reached, max_steps=20):
-    """Handles replanning logic and returns updated steps, replan_rounds, and replan_limit_reached, with a dynamic max_steps limit."""
+def replanner(new_results, steps, replan_rounds, max_replan_rounds, replan_limit_reached, max_steps=20, plan_state=None):
+    """Handles replanning logic and returns updated steps, replan_rounds, and replan_limit_reached, with a dynamic max_steps limit.
+
+    Only the newest step results are sent, together with the compact plan_state (covered goals and open
+    questions), which is updated from the reply. The LLM call is skipped when the results add nothing new.
+    """
     if replan_limit_reached:
         return steps, replan_rounds, replan_limit_reached
+    if get_run_budget().degraded("skip_replan"):
+        logging.info("Replanning skipped: run budget is running low.")
+        incr("replan.skipped_for_budget")
+        return steps, replan_rounds, True
+    if plan_state is None:
+        plan_state = PlanState("")
+
+    novel = plan_state.is_novel(new_results)
+    plan_state.seen_terms.update(tokenize(new_results))
+    if not novel:
+        plan_state.stats["skipped"] += 1
+        incr("replan.skipped")
+        logging.info("Replanning skipped: newest results add nothing new.")
+        return steps, replan_rounds, replan_limit_reached
 
+    known = get_run_steps()
+    current_plan = "\n".join(f"{known.get(step, {}).get('id', i + 1)}. {step}" for i, step in enumerate(steps))
     replan_prompt = (
-        f"Given the completed steps and results so far:\n{context}\n\n"
-        f"As an autonomous agent, do you need to add any new steps to fully answer the original query? "
-        f"If yes, list them as a numbered list, but do not exceed a total of {max_steps} steps in the plan (count including already completed and planned steps). "
-        f"If not, reply 'No additional steps needed.'"
-        f"Do not return already present steps in the new plan.\n\n"
+        f"Research state:\n{plan_state.summary()}\n\n"
+        f"Current plan:\n{current_plan}\n\n"
+        f"Newest step results:\n{new_results}\n\n"
+        f"As an autonomous agent, update the covered goals and open questions using the newest results, "
+        f"and decide whether any new steps are needed to fully answer the original query. "
+        f"If yes, return only the new steps, numbered after the highest id in the current plan, but do not exceed a total of {max_steps} steps in the plan (count including already completed and planned steps). "
+        f"If not, return an empty list of steps. "
+        f"Do not return steps that are already in the current plan.\n\n"
     )
-    replan_response = client.chat.completions.create(
-        model="gpt-4.1",
-        messages=[
-            {"role": "system", "content": "You are a research planning assistant."},
-            {"role": "user", "content": replan_prompt},
-        ],
-    )
-    replan_text = replan_response.choices[0].message.content.strip().lower()
-    name = getattr(replan_response, 'model', None)
+    start = time.perf_counter()
+    with span("replan", round=replan_rounds, planned_steps=len(steps)) as replan_span:
+        replan_text, name, usage = _request_plan(
+            [
+                {"role": "system", "content": "You are a research planning assistant."},
+                {"role": "user", "content": replan_prompt},
+            ],
+            response_format=REPLAN_RESPONSE_FORMAT,
+        )
+        reply = _load_plan_json(replan_text)
+        replan_span.set(proposed_steps=len(reply.get("steps", [])))
+    plan_state.record_usage(usage, time.perf_counter() - start)
     if name:
         logging.info(f"Replanning step used model: {name}")
-    if "no additional steps needed" in replan_text:
+    plan_state.covered_goals = [g for g in reply.get("covered_goals", plan_state.covered_goals) if g]
+    plan_state.open_questions = [q for q in reply.get("open_questions", plan_state.open_questions) if q]
+    new_steps = _plan_steps(reply)
+    if not new_steps:
         replan_rounds = 0  # Reset replan rounds if no new steps
         return steps, replan_rounds, replan_limit_reached
 
-    # Parse new steps, avoid duplicates, and enforce max_steps
-    new_steps = [
-        s[2:].strip() for s in replan_text.split("\n") if s.strip() and s[0].isdigit()
-    ]
-    # Only add steps if total does not exceed max_steps
-    allowed_new_steps = new_steps[: max(0, max_steps - len(steps))]
-    new_unique_steps = [new_step for new_step in allowed_new_steps if new_step not in steps]
+    # Drop steps that restate existing ones, then enforce max_steps
+    new_unique_steps = get_run_budget().affordable_steps(
+        dedupe_steps(new_steps, steps)[: max(0, max_steps - len(steps))]
+    )
+    _record_steps(new_unique_steps)
+    new_unique_steps = [step["text"] for step in new_unique_steps]
     if new_unique_steps:
         steps.extend(new_unique_steps)
         replan_rounds += 1
@@ -0,0 +1,211 @@
+import concurrent.futures
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from dotenv import load_dotenv
+from citations import CitationIndex
+from passage_ranker import EMBEDDING_DEPLOYMENT, cosine, embed_texts, tokenize
+from run_context import RunContext, use_run
+from telemetry import bind_context, incr, span
+
+load_dotenv()
+
+REPORT_CACHE = os.getenv("REPORT_CACHE", "true").lower() in ("1", "true", "yes")
+REPORT_CACHE_PATH = os.getenv("REPORT_CACHE_PATH", os.path.join(tempfile.gettempdir(), "deepquest_reports", "reports.sqlite"))
+# Earlier runs older than this are never offered
+REPORT_CACHE_MAX_AGE_HOURS = float(os.getenv("REPORT_CACHE_MAX_AGE_HOURS", "72"))
+# Query similarity needed for a match: embedding cosine when an embedding deployment is configured, else token overlap
+REPORT_CACHE_COSINE_THRESHOLD = float(os.getenv("REPORT_CACHE_COSINE_THRESHOLD", "0.92"))
+REPORT_CACHE_JACCARD_THRESHOLD = float(os.getenv("REPORT_CACHE_JACCARD_THRESHOLD", "0.75"))
+# Most recent runs compared against a new query
+REPORT_CACHE_CANDIDATES = int(os.getenv("REPORT_CACHE_CANDIDATES", "500"))
+
+# Steps whose answers go stale quickly; they are the ones re-run by an incremental refresh
+TIME_SENSITIVE_PATTERN = re.compile(
+    r"\b(news|latest|recent(ly)?|current(ly)?|today|this (week|month|quarter|year)|announce\w*|price[sd]?|"
+    r"stock|shares|earnings|quarterly|guidance|outlook|forecast\w*|upcoming|ongoing)\b",
+    re.IGNORECASE,
+)
+# Citation kinds whose content changes between runs
+TIME_SENSITIVE_KINDS = {"article", "filing"}
+
+
+def normalize_query(query):
+    return " ".join((query or "").lower().split())
+
+
+def _jaccard(a, b):
+    a, b = set(tokenize(a)), set(tokenize(b))
+    return len(a & b) / len(a | b) if a | b else 0.0
+
+
+class ReportCache:
+    """Cross-session SQLite store of finished research runs, looked up by query similarity within a freshness window."""
+
+    def __init__(self, path=None):
+        self.path = path or REPORT_CACHE_PATH
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._vectors = {}
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.executescript(
+            "PRAGMA journal_mode=WAL;"
+            "CREATE TABLE IF NOT EXISTS reports (id INTEGER PRIMARY KEY, query TEXT, normalized TEXT, mode TEXT,"
+            " embedding TEXT, created_at REAL, report TEXT, completed_steps TEXT, sources TEXT);"
+            "CREATE INDEX IF NOT EXISTS reports_created ON reports (created_at);"
+            "CREATE INDEX IF NOT EXISTS reports_mode_created ON reports (mode, created_at);"
+        )
+
+    def _embed(self, query):
+        """Embedding of a normalized query, or None without an embedding deployment; remembered for store()."""
+        if not EMBEDDING_DEPLOYMENT:
+            return None
+        if query not in self._vectors:
+            try:
+                self._vectors = {query: embed_texts([query])[0]}
+            except Exception as e:
+                logging.warning(f"Report cache: embedding failed, matching on token overlap: {e}")
+                return None
+        return self._vectors[query]
+
+    def lookup(self, query, mode, max_age_hours=REPORT_CACHE_MAX_AGE_HOURS):
+        """Best earlier run of the same mode ("bfs" or "dfs") for a similar query within the freshness window, or None.
+
+        Runs of the other mode are never offered, since refreshing one re-runs its steps with this mode's executor.
+        """
+        key = normalize_query(query)
+        with span("report_cache.lookup") as lookup_span:
+            vector = self._embed(key)
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT id, normalized, embedding FROM reports WHERE mode = ? AND created_at >= ?"
+                    " ORDER BY created_at DESC LIMIT ?",
+                    (mode, time.time() - max_age_hours * 3600, REPORT_CACHE_CANDIDATES),
+                ).fetchall()
+            best = None
+            for row_id, normalized, embedding in rows:
+                if normalized == key:
+                    similarity, threshold = 1.0, 1.0
+                elif vector is not None and embedding:
+                    similarity, threshold = cosine(vector, json.loads(embedding)), REPORT_CACHE_COSINE_THRESHOLD
+                else:
+                    similarity, threshold = _jaccard(key, normalized), REPORT_CACHE_JACCARD_THRESHOLD
+                if similarity >= threshold and (best is None or similarity > best[0]):
+                    best = (similarity, row_id)
+            lookup_span.set(candidates=len(rows), hit=best is not None)
+        incr("report_cache.hits" if best else "report_cache.misses")
+        if best is None:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT query, mode, created_at, report, completed_steps, sources FROM reports WHERE id = ?", (best[1],)
+            ).fetchone()
+        entry = dict(zip(("query", "mode", "created_at", "report", "completed_steps", "sources"), row))
+        entry["completed_steps"] = [tuple(pair) for pair in json.loads(entry["completed_steps"])]
+        entry["sources"] = json.loads(entry["sources"])
+        entry["similarity"] = round(best[0], 3)
+        entry["age_hours"] = round((time.time() - entry["created_at"]) / 3600, 1)
+        logging.info(f"Report cache hit for '{query}': '{entry['query']}' ({entry['similarity']} similar, {entry['age_hours']}h old)")
+        return entry
+
+    def store(self, query, mode, report, completed_steps, citation_index):
+        """Save a finished run so later sessions can reuse it."""
+        key = normalize_query(query)
+        vector = self._embed(key)
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO reports (query, normalized, mode, embedding, created_at, report, completed_steps, sources)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    query, key, mode, json.dumps(vector) if vector is not None else None, time.time(), report,
+                    json.dumps([list(pair) for pair in completed_steps]), json.dumps(citation_index.sources),
+                ),
+            )
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_report_cache():
+    """Process-wide ReportCache, opened on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ReportCache()
+        return _cache
+
+
+def lookup_report(query, mode):
+    """Cached run of the mode for a similar query, or None when the cache is disabled, empty or unavailable."""
+    if not REPORT_CACHE:
+        return None
+    try:
+        return get_report_cache().lookup(query, mode)
+    except Exception as e:
+        logging.warning(f"Report cache lookup failed: {e}")
+        return None
+
+
+def store_report(query, mode, report, completed_steps, citation_index):
+    if not REPORT_CACHE or not report:
+        return
+    try:
+        get_report_cache().store(query, mode, report, completed_steps, citation_index)
+    except Exception as e:
+        logging.warning(f"Report cache store failed: {e}")
+
+
+def steps_context(completed_steps):
+    return "".join(f"\nStep: {step}\nResult: {result}\n" for step, result in completed_steps)
+
+
+def time_sensitive_steps(entry):
+    """Indices of cached steps worth re-running: time-sensitive wording, or evidence from news or filings."""
+    citations = CitationIndex().load(entry["sources"])
+    indices = []
+    for i, (step, result) in enumerate(entry["completed_steps"]):
+        kinds = {citations.sources[source_id]["kind"] for source_id in citations.cited_ids(result)}
+        if TIME_SENSITIVE_PATTERN.search(step) or kinds & TIME_SENSITIVE_KINDS:
+            indices.append(i)
+    return indices
+
+
+def restore_run(entry, telemetry=None, budget=None, token=None):
+    """RunContext for continuing a cached run: its citation index, a fresh dedup index and the given parts."""
+    citation_index = CitationIndex().load(entry["sources"])
+    return RunContext(citation_index=citation_index, telemetry=telemetry, budget=budget, token=token)
+
+
+def refresh_report(entry, query, execute_step, run, prefetcher=None, batch_size=3):
+    """Re-run only the time-sensitive steps of a cached run and rewrite the report from the updated results.
+
+    run is the RunContext from restore_run. Returns (completed_steps, context, report).
+    """
+    with use_run(run):
+        return _refresh(entry, query, execute_step, prefetcher, batch_size)
+
+
+def _refresh(entry, query, execute_step, prefetcher, batch_size):
+    from writer import write_report
+
+    completed_steps = list(entry["completed_steps"])
+    stale = time_sensitive_steps(entry)
+    with span("report_cache.refresh", steps=len(stale), of=len(completed_steps)):
+        if not stale:
+            return completed_steps, steps_context(completed_steps), entry["report"]
+        # Stale steps see the results of the steps that are kept, as they would in a full run
+        context = steps_context(pair for i, pair in enumerate(completed_steps) if i not in stale)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=batch_size) as executor:
+            futures = {executor.submit(bind_context(execute_step), completed_steps[i][0], context, prefetcher): i for i in stale}
+            for future in concurrent.futures.as_completed(futures):
+                i = futures[future]
+                completed_steps[i] = (completed_steps[i][0], future.result())
+        logging.info(f"Report cache: refreshed {len(stale)} of {len(completed_steps)} steps for '{query}'")
+        context = steps_context(completed_steps)
+        return completed_steps, context, write_report(query, completed_steps, context)
@@ -0,0 +1,482 @@
+"""HTTP service running research jobs for other services, with progress streamed over Server-Sent Events.
+
+  POST   /research                   {"query": ..., "mode": "bfs"|"dfs", "max_steps": 20, "deadline_seconds": 0}
+                                     -> 202 {"id", ...}
+  GET    /research/{id}              job status, progress and spend
+  GET    /research/{id}/events       SSE progress stream (resumable with Last-Event-ID)
+  GET    /research/{id}/report       the report as Markdown once the job is done
+  GET    /research/{id}/export/{fmt} the report as docx, html, pdf or json
+  POST   /research/{id}/cancel       (or DELETE /research/{id}) cancel a queued or running job
+  GET    /health                     pool and queue occupancy
+
+Jobs run concurrently on one shared pool of engine threads; each job's research state is its own RunContext (see
+run_context), and CPU-heavy parsing goes to the CPU pool when CPU_POOL_WORKERS is set. Admission control caps
+active jobs per tenant (429) and queued jobs overall (503); queued jobs are handed to the pool round-robin across
+tenants only when a thread is free, so the pool never builds a backlog.
+Tenants are identified by API key when SERVICE_API_KEYS is set, otherwise by the X-Tenant-Id header.
+"""
+import asyncio
+import concurrent.futures
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from aiohttp import web
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SERVICE_HOST = os.getenv("SERVICE_HOST", "0.0.0.0")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8080"))
+# Research jobs run at once
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", "4"))
+# Jobs waiting for a free engine thread, across all tenants
+SERVICE_MAX_QUEUED = int(os.getenv("SERVICE_MAX_QUEUED", "8"))
+# Queued plus running jobs allowed per tenant
+SERVICE_TENANT_MAX_ACTIVE = int(os.getenv("SERVICE_TENANT_MAX_ACTIVE", "2"))
+SERVICE_MAX_STEPS = int(os.getenv("SERVICE_MAX_STEPS", "20"))
+# Default time limit per job in seconds (0 = none); the report is written from the evidence gathered by then
+SERVICE_RUN_SLA_SECONDS = float(os.getenv("SERVICE_RUN_SLA_SECONDS", "0"))
+# Finished jobs (and their reports) are kept this long
+SERVICE_JOB_TTL = int(os.getenv("SERVICE_JOB_TTL", "3600"))
+# "key:tenant,key:tenant"; when set, requests must send "Authorization: Bearer <key>"
+SERVICE_API_KEYS = os.getenv("SERVICE_API_KEYS", "")
+SSE_KEEPALIVE_SECONDS = 15
+RETRY_AFTER_SECONDS = 30
+FINISHED = ("done", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# --- Engine side ---
+
+def run_job(job_id, query, mode, max_steps, publish, cancelled, deadline_seconds=None):
+    """Run one research job with the engine the apps use, reporting progress as events through publish(job_id, event)."""
+    from cancellation import CancelToken, RunCancelled
+    from engine import execute_plan, finish, plan, research_mode, start_prefetcher
+    from export_pipeline import build_bundle
+    from run_context import RunContext
+    from telemetry import RunTelemetry
+
+    execute_step, registry = research_mode(mode)
+
+    def emit(kind, **data):
+        publish(job_id, dict(data, type=kind, ts=time.time()))
+
+    def check_cancelled():
+        if cancelled.get(job_id):
+            raise JobCancelled()
+
+    # A cancel request stops in-flight LLM, source and crawl calls, not just the next step
+    token = CancelToken(deadline_seconds).watch(lambda: not cancelled.get(job_id))
+    run = RunContext(telemetry=RunTelemetry(app=f"service-{mode}", job=job_id), token=token)
+    budget = run.budget
+    prefetcher = start_prefetcher(registry)
+    emit("started", thread=threading.current_thread().name)
+    try:
+        steps = plan(query, run, prefetcher, max_steps)
+        emit("plan", steps=steps, spend=budget.snapshot())
+
+        def on_step(step, result, completed_steps, context):
+            emit("step", step=step, completed=len(completed_steps), total=len(steps), spend=budget.snapshot())
+
+        def on_replan(new_plan, new_steps):
+            nonlocal steps
+            steps = new_plan
+            if new_steps:
+                emit("replan", new_steps=new_steps, total=len(steps))
+
+        steps, completed_steps, context, stop_reason = execute_plan(
+            query, steps, run, execute_step, prefetcher=prefetcher, max_steps=max_steps,
+            should_stop=lambda: bool(cancelled.get(job_id)), on_step=on_step, on_replan=on_replan,
+        )
+        check_cancelled()
+        if stop_reason == "budget":
+            emit("budget_exhausted", spend=budget.snapshot())
+        elif stop_reason:
+            emit("deadline", completed=len(completed_steps))
+        emit("writing_report", completed=len(completed_steps))
+        report = finish(query, completed_steps, context, run)
+        return {
+            "status": "done",
+            "report": report,
+            "bundle": build_bundle(query, steps, completed_steps, run.citation_index),
+            "spend": budget.snapshot(),
+            "summary": run.telemetry.summary_rows(),
+        }
+    except (JobCancelled, RunCancelled):
+        if not cancelled.get(job_id):
+            raise
+        return {"status": "cancelled", "spend": budget.snapshot()}
+    finally:
+        token.release()
+        if prefetcher:
+            prefetcher.close()
+
+
+# --- Service side ---
+
+class Job:
+    def __init__(self, tenant, query, mode, max_steps, deadline_seconds=None):
+        self.id = uuid.uuid4().hex
+        self.tenant = tenant
+        self.query = query
+        self.mode = mode
+        self.max_steps = max_steps
+        self.deadline_seconds = deadline_seconds
+        self.status = "queued"
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.events = []
+        self.changed = asyncio.Condition()
+        self.result = None
+        self.error = None
+        self.completed = 0
+        self.total = None
+        self.spend = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "tenant": self.tenant,
+            "query": self.query,
+            "mode": self.mode,
+            "max_steps": self.max_steps,
+            "deadline_seconds": self.deadline_seconds,
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "progress": {"completed": self.completed, "total": self.total},
+            "spend": self.spend,
+            "error": self.error,
+            "links": {
+                "self": f"/research/{self.id}",
+                "events": f"/research/{self.id}/events",
+                "report": f"/research/{self.id}/report",
+                "cancel": f"/research/{self.id}/cancel",
+            },
+        }
+
+
+class ResearchService:
+    """Job table, admission control and round-robin dispatch onto a shared pool of engine threads.
+
+    initializer(*initargs) runs once before the first job, e.g. to install replay clients in load tests.
+    """
+
+    def __init__(self, workers=SERVICE_WORKERS, max_queued=SERVICE_MAX_QUEUED, tenant_max_active=SERVICE_TENANT_MAX_ACTIVE,
+                 initializer=None, initargs=()):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.tenant_max_active = tenant_max_active
+        self.jobs = {}
+        self._pending = OrderedDict()
+        self._running = 0
+        self._cancelled = {}
+        if initializer:
+            initializer(*initargs)
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="research-job")
+        self._loop = None
+
+    def start(self, loop):
+        self._loop = loop
+
+    def close(self):
+        # Running jobs see their cancel flag within a fraction of a second and stop their in-flight calls
+        for job in self.jobs.values():
+            if job.status not in FINISHED:
+                self._cancelled[job.id] = True
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _publish_threadsafe(self, job_id, event):
+        self._loop.call_soon_threadsafe(self._on_event, job_id, event)
+
+    def queued(self):
+        return sum(len(jobs) for jobs in self._pending.values())
+
+    def active(self, tenant):
+        return sum(1 for job in self.jobs.values() if job.tenant == tenant and job.status not in FINISHED)
+
+    def admit(self, tenant, query, mode, max_steps, deadline_seconds=None):
+        """Create and enqueue a job, or raise the HTTP error explaining why it was refused."""
+        if self.active(tenant) >= self.tenant_max_active:
+            raise web.HTTPTooManyRequests(
+                text=json.dumps({"error": f"tenant already has {self.tenant_max_active} active jobs"}),
+                content_type="application/json",
+                headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            )
+        if self._running >= self.workers and self.queued() >= self.max_queued:
+            raise web.HTTPServiceUnavailable(
+                text=json.dumps({"error": "research queue is full"}),
+                content_type="application/json",
+                headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            )
+        job = Job(tenant, query, mode, max_steps, deadline_seconds)
+        self.jobs[job.id] = job
+        self._pending.setdefault(tenant, deque()).append(job)
+        self._publish(job, {"type": "queued", "ts": time.time(), "position": self.queued()})
+        self._dispatch()
+        return job
+
+    def _dispatch(self):
+        # Round-robin over tenants: take one job from the tenant at the front, then move that tenant to the back
+        while self._running < self.workers and self._pending:
+            tenant, jobs = next(iter(self._pending.items()))
+            job = jobs.popleft()
+            if jobs:
+                self._pending.move_to_end(tenant)
+            else:
+                del self._pending[tenant]
+            self._running += 1
+            job.status = "running"
+            job.started = time.time()
+            future = self._pool.submit(
+                run_job, job.id, job.query, job.mode, job.max_steps, self._publish_threadsafe, self._cancelled,
+                job.deadline_seconds,
+            )
+            future.add_done_callback(lambda f, job=job: self._loop.call_soon_threadsafe(self._on_done, job, f))
+
+    def _on_event(self, job_id, event):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        if event["type"] in ("plan", "replan", "step"):
+            job.total = len(event["steps"]) if event["type"] == "plan" else event["total"]
+        if event["type"] == "step":
+            job.completed = event["completed"]
+        if "spend" in event:
+            job.spend = event["spend"]
+        self._publish(job, event)
+
+    def _on_done(self, job, future):
+        self._running -= 1
+        self._cancelled.pop(job.id, None)
+        try:
+            result = future.result()
+        except concurrent.futures.CancelledError:
+            result = {"status": "cancelled"}
+        except Exception as e:
+            logging.error(f"Research job {job.id} failed: {e!r}")
+            result = {"status": "failed"}
+            job.error = str(e) or type(e).__name__
+        self._finish(job, result["status"], result)
+        self._dispatch()
+
+    def _finish(self, job, status, result=None):
+        job.status = status
+        job.finished = time.time()
+        job.result = result if status == "done" else None
+        if result and result.get("spend"):
+            job.spend = result["spend"]
+        self._publish(job, {"type": status, "ts": job.finished, "error": job.error, "spend": job.spend})
+
+    def _publish(self, job, event):
+        job.events.append(event)
+
+        async def notify():
+            async with job.changed:
+                job.changed.notify_all()
+
+        asyncio.ensure_future(notify())
+
+    def cancel(self, job):
+        if job.status in FINISHED:
+            return False
+        for tenant, jobs in list(self._pending.items()):
+            if job in jobs:
+                jobs.remove(job)
+                if not jobs:
+                    del self._pending[tenant]
+                self._finish(job, "cancelled")
+                return True
+        # Running jobs notice within a fraction of a second and abandon their in-flight calls
+        self._cancelled[job.id] = True
+        job.status = "cancelling"
+        self._publish(job, {"type": "cancelling", "ts": time.time()})
+        return True
+
+    def purge(self, ttl=SERVICE_JOB_TTL):
+        cutoff = time.time() - ttl
+        for job_id in [j.id for j in self.jobs.values() if j.finished and j.finished < cutoff]:
+            del self.jobs[job_id]
+
+    def health(self):
+        tenants = {}
+        for job in self.jobs.values():
+            if job.status not in FINISHED:
+                tenants[job.tenant] = tenants.get(job.tenant, 0) + 1
+        return {"workers": self.workers, "running": self._running, "queued": self.queued(), "active_by_tenant": tenants}
+
+
+# --- HTTP layer ---
+
+def _api_keys():
+    keys = {}
+    for pair in SERVICE_API_KEYS.split(","):
+        key, _, tenant = pair.strip().partition(":")
+        if key:
+            keys[key] = tenant or key
+    return keys
+
+
+def _tenant(request):
+    keys = request.app["api_keys"]
+    if keys:
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        if token not in keys:
+            raise web.HTTPUnauthorized(text=json.dumps({"error": "invalid API key"}), content_type="application/json")
+        return keys[token]
+    return request.headers.get("X-Tenant-Id", "default")
+
+
+def _job(request):
+    job = request.app["service"].jobs.get(request.match_info["job_id"])
+    # Other tenants' jobs are reported as missing rather than forbidden
+    if job is None or job.tenant != _tenant(request):
+        raise web.HTTPNotFound(text=json.dumps({"error": "unknown job"}), content_type="application/json")
+    return job
+
+
+def _bad_request(message):
+    return web.HTTPBadRequest(text=json.dumps({"error": message}), content_type="application/json")
+
+
+async def submit(request):
+    tenant = _tenant(request)
+    try:
+        body = await request.json()
+    except ValueError:
+        raise _bad_request("body must be JSON")
+    query = str(body.get("query") or "").strip()
+    mode = body.get("mode", "bfs")
+    if not query:
+        raise _bad_request("query is required")
+    if mode not in ("bfs", "dfs"):
+        raise _bad_request("mode must be 'bfs' or 'dfs'")
+    try:
+        max_steps = max(1, min(int(body.get("max_steps", SERVICE_MAX_STEPS)), SERVICE_MAX_STEPS))
+    except (TypeError, ValueError):
+        raise _bad_request("max_steps must be an integer")
+    try:
+        deadline_seconds = max(0.0, float(body.get("deadline_seconds", SERVICE_RUN_SLA_SECONDS)))
+    except (TypeError, ValueError):
+        raise _bad_request("deadline_seconds must be a number")
+    job = request.app["service"].admit(tenant, query, mode, max_steps, deadline_seconds or None)
+    return web.json_response(job.to_dict(), status=202, headers={"Location": f"/research/{job.id}"})
+
+
+async def status(request):
+    return web.json_response(_job(request).to_dict())
+
+
+async def events(request):
+    job = _job(request)
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+    await response.prepare(request)
+    try:
+        cursor = int(request.headers.get("Last-Event-ID", "-1")) + 1
+    except ValueError:
+        cursor = 0
+    while True:
+        while cursor < len(job.events):
+            event = job.events[cursor]
+            # write() waits for the socket to drain, so a slow client only holds up its own stream
+            await response.write(f"id: {cursor}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n".encode("utf-8"))
+            cursor += 1
+        if job.status in FINISHED:
+            break
+        async with job.changed:
+            try:
+                await asyncio.wait_for(job.changed.wait(), timeout=SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                await response.write(b": keepalive\n\n")
+    await response.write_eof()
+    return response
+
+
+def _finished_result(job):
+    if job.status != "done":
+        raise web.HTTPConflict(
+            text=json.dumps({"error": f"job is {job.status}", "status": job.status}), content_type="application/json"
+        )
+    return job.result
+
+
+async def report(request):
+    result = _finished_result(_job(request))
+    return web.Response(text=result["report"], content_type="text/markdown", charset="utf-8")
+
+
+async def export(request):
+    from export_pipeline import EXPORT_FORMATS, get_export_pipeline
+
+    job = _job(request)
+    fmt = request.match_info["fmt"]
+    if fmt not in EXPORT_FORMATS:
+        raise _bad_request(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    result = _finished_result(job)
+    path = await asyncio.wrap_future(get_export_pipeline().request(fmt, result["report"], result["bundle"]))
+    _, extension, mime, _ = EXPORT_FORMATS[fmt]
+    return web.FileResponse(path, headers={
+        "Content-Type": mime,
+        "Content-Disposition": f'attachment; filename="research_{job.id[:8]}.{extension}"',
+    })
+
+
+async def cancel(request):
+    job = _job(request)
+    request.app["service"].cancel(job)
+    return web.json_response(job.to_dict(), status=202)
+
+
+async def health(request):
+    return web.json_response(request.app["service"].health())
+
+
+async def _purge_finished(app):
+    while True:
+        await asyncio.sleep(60)
+        app["service"].purge()
+
+
+def create_app(service=None):
+    """The aiohttp application; pass a ResearchService to customise the pool (e.g. an engine initializer)."""
+    app = web.Application()
+    app["service"] = service or ResearchService()
+    app["api_keys"] = _api_keys()
+
+    async def on_startup(app):
+        app["service"].start(asyncio.get_running_loop())
+        app["purger"] = asyncio.ensure_future(_purge_finished(app))
+
+    async def on_cleanup(app):
+        app["purger"].cancel()
+        app["service"].close()
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_post("/research", submit)
+    app.router.add_get("/research/{job_id}", status)
+    app.router.add_delete("/research/{job_id}", cancel)
+    app.router.add_get("/research/{job_id}/events", events)
+    app.router.add_get("/research/{job_id}/report", report)
+    app.router.add_get("/research/{job_id}/export/{fmt}", export)
+    app.router.add_post("/research/{job_id}/cancel", cancel)
+    app.router.add_get("/health", health)
+    return app
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    web.run_app(create_app(), host=SERVICE_HOST, port=SERVICE_PORT)
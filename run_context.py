@@ -0,0 +1,62 @@
+import contextlib
+import contextvars
+import threading
+
+_current_run = contextvars.ContextVar("current_run", default=None)
+
+
+class RunContext:
+    """Everything scoped to one research run: plan details, dedup and citation indices, telemetry, budget and cancel token.
+
+    The active run lives in a context variable (see use_run), so concurrent runs in one process, such as two
+    Streamlit sessions or two service jobs, never see each other's state. Worker threads pick it up through
+    telemetry.bind_context and source-loop tasks through the source registry. Parts not given start fresh.
+    steps maps each planned step's text to its planner step dict (id, source_hints, depends_on, estimated_cost).
+    """
+
+    def __init__(self, dedup_index=None, citation_index=None, telemetry=None, budget=None, token=None, steps=None):
+        from budget import RunBudget
+        from cancellation import CancelToken
+        from citations import CitationIndex
+        from dedup import DedupIndex
+        from telemetry import RunTelemetry
+
+        self.dedup_index = DedupIndex() if dedup_index is None else dedup_index
+        self.citation_index = CitationIndex() if citation_index is None else citation_index
+        self.telemetry = RunTelemetry() if telemetry is None else telemetry
+        self.budget = RunBudget() if budget is None else budget
+        self.token = CancelToken() if token is None else token
+        self.steps = {} if steps is None else steps
+
+
+@contextlib.contextmanager
+def use_run(run):
+    """Make run the active run for the code inside the with block (and the threads and tasks it hands work to)."""
+    reset = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(reset)
+
+
+_process_run = None
+_process_lock = threading.Lock()
+
+
+def _process_default():
+    """State for calls made outside any run (e.g. an MCP server answering one query): no limits, exporters or deadline."""
+    global _process_run
+    with _process_lock:
+        if _process_run is None:
+            from budget import RunBudget
+            from telemetry import RunTelemetry
+
+            _process_run = RunContext(
+                telemetry=RunTelemetry("process", exporters=[]), budget=RunBudget(token_budget=0, cost_budget=0)
+            )
+        return _process_run
+
+
+def current_run():
+    """The active RunContext, or the process-wide default outside any run."""
+    return _current_run.get() or _process_default()
@@ -0,0 +1,14 @@
+from sources.registry import SourceAdapter, SourceRegistry, SourceUnavailable
+from sources.builtin import BUILTIN_ADAPTERS, McpSourceAdapter
+from sources.fake import FakeSourceAdapter
+
+# Registry used by the BFS app: every source is called directly
+registry = SourceRegistry()
+for _adapter in BUILTIN_ADAPTERS:
+    registry.register(_adapter())
+
+# Registry used by the DFS app: sources go through their MCP servers, except SEC which has none
+mcp_registry = SourceRegistry()
+for _adapter in BUILTIN_ADAPTERS:
+    _local = _adapter()
+    mcp_registry.register(_local if _local.name == "sec" else McpSourceAdapter(_local))
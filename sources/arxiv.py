@@ -0,0 +1,209 @@
+import logging
+import os
+import re
+import threading
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from dotenv import load_dotenv
+from cpu_pool import get_cpu_pool
+from sources.registry import RateLimiter, SourceAdapter, run_with_session
+
+load_dotenv()
+
+ARXIV_API_URL = "http://export.arxiv.org/api/query"
+ARXIV_MAX_RESULTS = int(os.getenv("ARXIV_MAX_RESULTS", "10"))
+# arXiv serves at most 2000 entries per request; smaller pages start returning results sooner
+ARXIV_PAGE_SIZE = int(os.getenv("ARXIV_PAGE_SIZE", "50"))
+ARXIV_ID_BATCH = int(os.getenv("ARXIV_ID_BATCH", "100"))
+ARXIV_SUMMARY_CHARS = int(os.getenv("ARXIV_SUMMARY_CHARS", "1200"))
+ARXIV_ABSTRACT_CACHE_SIZE = int(os.getenv("ARXIV_ABSTRACT_CACHE_SIZE", "5000"))
+# Full-text PDFs are only downloaded when a store directory is configured
+ARXIV_PDF_DIR = os.getenv("ARXIV_PDF_DIR")
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+OPENSEARCH = "{http://a9.com/-/spec/opensearch/1.1/}"
+ARXIV_ID_PATTERN = re.compile(r"\b(\d{4}\.\d{4,5}|[a-z\-]+(?:\.[A-Z]{2})?/\d{7})(?:v\d+)?\b")
+
+# arXiv asks for one request every 3 seconds per client; every request below, from any session, waits its turn here
+_arxiv_limiter = RateLimiter(1, 3.0)
+
+
+def _text(element, tag):
+    child = element.find(tag)
+    return " ".join(child.text.split()) if child is not None and child.text else ""
+
+
+def _entry_record(entry):
+    abs_url = _text(entry, f"{ATOM}id")
+    pdf_url = next((link.get("href") for link in entry.findall(f"{ATOM}link") if link.get("title") == "pdf"), None)
+    match = ARXIV_ID_PATTERN.search(abs_url)
+    return {
+        "id": match.group(1) if match else abs_url,
+        "title": _text(entry, f"{ATOM}title") or "No title",
+        "summary": _text(entry, f"{ATOM}summary") or "No summary",
+        "authors": [_text(author, f"{ATOM}name") for author in entry.findall(f"{ATOM}author")],
+        "published": _text(entry, f"{ATOM}published")[:10],
+        "url": abs_url,
+        "pdf_url": pdf_url,
+    }
+
+
+class FeedParser:
+    """Incremental Atom feed parser: feed() it response chunks, collect entries as each one closes."""
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=("end",))
+        self.entries = []
+        self.total_results = None
+
+    def feed(self, chunk):
+        self._parser.feed(chunk)
+        for _, element in self._parser.read_events():
+            if element.tag == f"{ATOM}entry":
+                # arXiv reports unknown ids as an entry without a title
+                if element.find(f"{ATOM}title") is not None:
+                    self.entries.append(_entry_record(element))
+                element.clear()
+            elif element.tag == f"{OPENSEARCH}totalResults" and element.text:
+                self.total_results = int(element.text)
+
+    def close(self):
+        self._parser.close()
+        return self.entries
+
+
+def parse_feed(data):
+    """(entries, total results) of a complete Atom feed response, e.g. in a CPU pool worker."""
+    parser = FeedParser()
+    parser.feed(data)
+    parser.close()
+    return parser.entries, parser.total_results
+
+
+class AbstractCache:
+    """Thread-safe LRU of parsed arXiv entries keyed by arXiv ID (without version)."""
+
+    def __init__(self, max_size=ARXIV_ABSTRACT_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, arxiv_id):
+        with self._lock:
+            entry = self._entries.get(arxiv_id)
+            if entry is not None:
+                self._entries.move_to_end(arxiv_id)
+            return entry
+
+    def put(self, entry):
+        with self._lock:
+            self._entries[entry["id"]] = entry
+            self._entries.move_to_end(entry["id"])
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+abstract_cache = AbstractCache()
+
+
+async def _fetch_feed(session, params):
+    """(entries, total results) of one feed request, with the entries added to the abstract cache."""
+    await _arxiv_limiter.acquire()
+    pool = get_cpu_pool()
+    async with session.get(ARXIV_API_URL, params=params) as response:
+        response.raise_for_status()
+        if pool.enabled:
+            # Parse the whole feed in a worker rather than chunk by chunk on the source loop
+            entries, total_results = await pool.arun(parse_feed, await response.read())
+        else:
+            parser = FeedParser()
+            async for chunk in response.content.iter_chunked(16384):
+                parser.feed(chunk)
+            entries, total_results = parser.close(), parser.total_results
+    for entry in entries:
+        abstract_cache.put(entry)
+    return entries, total_results
+
+
+async def search_entries(session, query, max_results=ARXIV_MAX_RESULTS, page_size=ARXIV_PAGE_SIZE):
+    """Entries for a search query, paging with start= until max_results or the end of the result set."""
+    entries = []
+    while len(entries) < max_results:
+        size = min(page_size, max_results - len(entries))
+        params = {"search_query": f"all:{query}", "start": len(entries), "max_results": size}
+        page, total = await _fetch_feed(session, params)
+        entries.extend(page)
+        if len(page) < size or len(entries) >= (total or 0):
+            break
+    return entries
+
+
+async def lookup_ids(session, arxiv_ids, batch_size=ARXIV_ID_BATCH):
+    """Entries for known arXiv IDs: cached abstracts first, the rest fetched in id_list batches."""
+    missing = [arxiv_id for arxiv_id in dict.fromkeys(arxiv_ids) if abstract_cache.get(arxiv_id) is None]
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        await _fetch_feed(session, {"id_list": ",".join(batch), "max_results": len(batch)})
+    return [entry for entry in map(abstract_cache.get, arxiv_ids) if entry is not None]
+
+
+async def download_pdf(session, arxiv_id, pdf_dir=None):
+    """Store the full-text PDF of a paper locally (once) and return its path."""
+    pdf_dir = pdf_dir or ARXIV_PDF_DIR
+    if not pdf_dir:
+        raise ValueError("Set ARXIV_PDF_DIR to enable arXiv PDF downloads")
+    path = os.path.join(pdf_dir, f"{arxiv_id.replace('/', '_')}.pdf")
+    if os.path.exists(path):
+        return path
+    os.makedirs(pdf_dir, exist_ok=True)
+    entry = abstract_cache.get(arxiv_id)
+    url = entry["pdf_url"] if entry and entry.get("pdf_url") else f"https://arxiv.org/pdf/{arxiv_id}"
+    await _arxiv_limiter.acquire()
+    partial = f"{path}.part"
+    async with session.get(url) as response:
+        response.raise_for_status()
+        with open(partial, "wb") as f:
+            async for chunk in response.content.iter_chunked(65536):
+                f.write(chunk)
+    os.replace(partial, path)
+    logging.info(f"Stored arXiv PDF {arxiv_id} at {path}")
+    return path
+
+
+def fetch_pdf(arxiv_id):
+    """Blocking download_pdf for callers outside the source loop."""
+    return run_with_session(lambda session: download_pdf(session, arxiv_id))
+
+
+class ArxivAdapter(SourceAdapter):
+    name = "arxiv"
+    function_name = "search_arxiv_api"
+    description = "Searches ArXiv and returns relevant results for a query."
+    query_description = "The search query for ArXiv, or one or more arXiv IDs."
+    error_label = "ArXiv Search"
+    # Request spacing is enforced per HTTP request by the module-level limiter
+    rate_limit = (100, 1.0)
+    timeout = 90
+    cache_ttl = 24 * 3600
+
+    async def fetch(self, session, query):
+        arxiv_ids = [match.group(1) for match in ARXIV_ID_PATTERN.finditer(query)]
+        if arxiv_ids:
+            return await lookup_ids(session, arxiv_ids)
+        return await search_entries(session, query)
+
+    def parse(self, raw, query):
+        results = []
+        for i, entry in enumerate(raw):
+            summary = entry["summary"]
+            if len(summary) > ARXIV_SUMMARY_CHARS:
+                summary = summary[:ARXIV_SUMMARY_CHARS] + "..."
+            authors = ", ".join(entry["authors"][:5]) + (" et al." if len(entry["authors"]) > 5 else "")
+            results.append((
+                f"[ArXiv Result {i + 1}] {entry['title']}\n"
+                f"Authors: {authors} ({entry['published']})\n"
+                f"Summary: {summary}\n"
+                f"URL: {entry['url']}",
+                entry["url"],
+            ))
+        return results
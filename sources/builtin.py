@@ -0,0 +1,58 @@
+import json
+import os
+from dotenv import load_dotenv
+from sources.arxiv import ArxivAdapter
+from sources.edgar import EdgarAdapter
+from sources.google import GoogleAdapter
+from sources.newsapi import NewsApiAdapter
+from sources.registry import SourceAdapter
+from sources.wikipedia import WikipediaAdapter
+
+load_dotenv()
+
+# Source name -> (environment variable, default endpoint) of its MCP server
+MCP_ENDPOINTS = {
+    "newsapi": ("MCP_NEWSAPI_URL", "http://20.232.217.19:8050/sse"),
+    "wikipedia": ("MCP_WIKIPEDIA_URL", "http://172.210.93.168:8053/sse"),
+    "arxiv": ("MCP_ARXIV_URL", "http://20.232.76.152:8950/sse"),
+    "google": ("MCP_GOOGLE_URL", "http://52.224.133.79:8051/sse"),
+}
+
+
+class McpSourceAdapter(SourceAdapter):
+    """Serves a source through its MCP server, keeping the schema and call limits of the local adapter it wraps."""
+
+    def __init__(self, local):
+        self.local = local
+        self.name = local.name
+        self.function_name = local.function_name
+        self.description = local.description
+        self.query_description = local.query_description
+        self.error_label = f"[MCP] {local.name}"
+        self.rate_limit = local.rate_limit
+        self.max_concurrency = local.max_concurrency
+        self.cache_ttl = local.cache_ttl
+        self.timeout = 20
+        self.retries = 0
+        env_var, default_url = MCP_ENDPOINTS[local.name]
+        self.url = os.getenv(env_var, default_url)
+
+    async def fetch(self, session, query):
+        payload = {"jsonrpc": "2.0", "method": f"{self.name}_search", "params": {"query": query}, "id": 1}
+        headers = {"Content-Type": "application/json", "Accept": "application/json"}
+        async with session.post(self.url, data=json.dumps(payload), headers=headers) as response:
+            # Failures raise rather than return, so the registry retries them and never caches them
+            response.raise_for_status()
+            data = await response.json(content_type=None)
+        if "error" in data:
+            raise RuntimeError(f"{self.name} server error: {data['error']}")
+        return data
+
+    def parse(self, raw, query):
+        result = raw.get("result", "[MCP] No result returned.")
+        # MCP servers return either a list of results or one pre-joined string
+        results = result if isinstance(result, list) else str(result).split("\n\n")
+        return [(str(text), None) for text in results]
+
+
+BUILTIN_ADAPTERS = [GoogleAdapter, ArxivAdapter, NewsApiAdapter, EdgarAdapter, WikipediaAdapter]
@@ -0,0 +1,305 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from dotenv import load_dotenv
+from sources.registry import RateLimiter, SourceAdapter
+
+load_dotenv()
+
+# SEC requires a User-Agent naming the requester and a contact address
+EDGAR_USER_AGENT = os.getenv("EDGAR_USER_AGENT", "deepQuest/1.0 (contact@example.com)")
+EDGAR_DATA_DIR = os.getenv("EDGAR_DATA_DIR", os.path.join(tempfile.gettempdir(), "deepquest_edgar"))
+EDGAR_INDEX_MAX_AGE = int(os.getenv("EDGAR_INDEX_MAX_AGE", str(24 * 3600)))
+EDGAR_CACHE_TTL = int(os.getenv("EDGAR_CACHE_TTL", str(24 * 3600)))
+EDGAR_MAX_FILINGS = int(os.getenv("EDGAR_MAX_FILINGS", "8"))
+
+TICKERS_URL = "https://www.sec.gov/files/company_tickers.json"
+SUBMISSIONS_URL = "https://data.sec.gov/submissions/CIK{cik:010d}.json"
+COMPANY_FACTS_URL = "https://data.sec.gov/api/xbrl/companyfacts/CIK{cik:010d}.json"
+ARCHIVES_URL = "https://www.sec.gov/Archives/edgar/data/{cik}/{accession}/{document}"
+
+# Forms worth showing to the research agent; the rest (Form 4, 144, ...) are ownership and housekeeping noise
+KEY_FORMS = {"10-K", "10-Q", "8-K", "20-F", "40-F", "6-K", "S-1", "S-4", "DEF 14A", "10-K/A", "10-Q/A", "20-F/A"}
+
+# (label, taxonomy, concepts tried in order, unit)
+KEY_FACTS = [
+    ("Revenue", "us-gaap", ["Revenues", "RevenueFromContractWithCustomerExcludingAssessedTax", "SalesRevenueNet"], "USD"),
+    ("Net income", "us-gaap", ["NetIncomeLoss", "ProfitLoss"], "USD"),
+    ("Operating income", "us-gaap", ["OperatingIncomeLoss"], "USD"),
+    ("Total assets", "us-gaap", ["Assets"], "USD"),
+    ("Total liabilities", "us-gaap", ["Liabilities"], "USD"),
+    ("Stockholders' equity", "us-gaap", ["StockholdersEquity"], "USD"),
+    ("Cash and equivalents", "us-gaap", ["CashAndCashEquivalentsAtCarryingValue"], "USD"),
+    ("Diluted EPS", "us-gaap", ["EarningsPerShareDiluted"], "USD/shares"),
+    ("Shares outstanding", "dei", ["EntityCommonStockSharesOutstanding"], "shares"),
+]
+
+# SEC allows at most 10 requests per second per client; every request below, from any session, waits its turn here
+_sec_limiter = RateLimiter(10, 1.0)
+
+WORD_PATTERN = re.compile(r"[a-z0-9&]+")
+TICKER_PATTERN = re.compile(r"\b[A-Z]{2,5}(?:[.-][A-Z])?\b")
+
+
+def _normalize_name(name):
+    return " ".join(WORD_PATTERN.findall((name or "").lower()))
+
+
+class TickerIndex:
+    """Local SQLite index of SEC tickers and company names to CIKs, refreshed from company_tickers.json when stale."""
+
+    def __init__(self, path=None, max_age=EDGAR_INDEX_MAX_AGE):
+        self.path = path or os.path.join(EDGAR_DATA_DIR, "tickers.sqlite")
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.executescript(
+            "PRAGMA journal_mode=WAL;"
+            "PRAGMA mmap_size=67108864;"
+            "CREATE TABLE IF NOT EXISTS companies (rank INTEGER, cik INTEGER, ticker TEXT, title TEXT, name TEXT);"
+            "CREATE INDEX IF NOT EXISTS companies_ticker ON companies (ticker);"
+            "CREATE INDEX IF NOT EXISTS companies_name ON companies (name);"
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);"
+        )
+
+    def age(self):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'refreshed_at'").fetchone()
+        return time.time() - float(row[0]) if row else float("inf")
+
+    def is_stale(self):
+        return self.age() > self.max_age
+
+    def load(self, tickers_json):
+        """Replace the index with the contents of company_tickers.json ({"0": {"cik_str", "ticker", "title"}, ...})."""
+        rows = [
+            (int(rank), int(entry["cik_str"]), entry["ticker"].upper(), entry["title"], _normalize_name(entry["title"]))
+            for rank, entry in tickers_json.items()
+        ]
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM companies")
+            self._db.executemany("INSERT INTO companies VALUES (?, ?, ?, ?, ?)", rows)
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('refreshed_at', ?)", (str(time.time()),))
+        logging.info(f"EDGAR ticker index refreshed: {len(rows)} companies")
+
+    def _first(self, sql, params):
+        with self._lock:
+            row = self._db.execute(sql + " ORDER BY rank LIMIT 1", params).fetchone()
+        return {"cik": row[0], "ticker": row[1], "title": row[2]} if row else None
+
+    def resolve(self, query):
+        """Best company for a free-text query: a CIK or ticker, its name, ever shorter name prefixes, then mentioned tickers."""
+        select = "SELECT cik, ticker, title FROM companies WHERE "
+        query = (query or "").strip()
+        if query.isdigit():
+            return self._first(select + "cik = ?", (int(query),))
+        match = self._first(select + "ticker = ?", (query.upper().replace(".", "-"),))
+        if match:
+            return match
+        words = _normalize_name(query).split()
+        for size in range(len(words), 0, -1):
+            prefix = " ".join(words[:size])
+            # Single short words ("the", "ai") match too many names to be a useful guess
+            if size == 1 and len(prefix) < 3:
+                break
+            match = self._first(select + "name = ?", (prefix,)) or self._first(select + "name LIKE ?", (prefix + " %",))
+            if match:
+                return match
+        for ticker in TICKER_PATTERN.findall(query):
+            match = self._first(select + "ticker = ?", (ticker.replace(".", "-"),))
+            if match:
+                return match
+        return None
+
+
+class DiskCache:
+    """JSON documents on disk with a TTL, written atomically so concurrent sessions never read partial files."""
+
+    def __init__(self, directory=None, ttl=EDGAR_CACHE_TTL):
+        self.directory = directory or os.path.join(EDGAR_DATA_DIR, "cache")
+        self.ttl = ttl
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, value):
+        path = self._path(key)
+        partial = f"{path}.{threading.get_ident()}.part"
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        os.replace(partial, path)
+
+
+def _column(recent, key, i):
+    values = recent.get(key) or []
+    return values[i] if i < len(values) else ""
+
+
+def compact_submissions(submissions, max_filings=EDGAR_MAX_FILINGS):
+    """Company header and the most recent key filings from a submissions JSON document."""
+    recent = submissions.get("filings", {}).get("recent", {})
+    cik = int(submissions.get("cik", 0))
+    filings = []
+    for i, form in enumerate(recent.get("form", [])):
+        if form not in KEY_FORMS:
+            continue
+        accession = recent["accessionNumber"][i].replace("-", "")
+        document = _column(recent, "primaryDocument", i)
+        filings.append({
+            "form": form,
+            "filed": recent["filingDate"][i],
+            "period": _column(recent, "reportDate", i),
+            "description": _column(recent, "primaryDocDescription", i),
+            "url": ARCHIVES_URL.format(cik=cik, accession=accession, document=document),
+        })
+        if len(filings) >= max_filings:
+            break
+    return {
+        "cik": cik,
+        "name": submissions.get("name"),
+        "tickers": submissions.get("tickers", []),
+        "sic": submissions.get("sicDescription"),
+        "fiscal_year_end": submissions.get("fiscalYearEnd"),
+        "filings": filings,
+    }
+
+
+def _latest_fact(facts, taxonomy, concepts, unit):
+    """Most recent annual value of the first concept that has one, falling back to the latest value of any form."""
+    for concept in concepts:
+        values = facts.get(taxonomy, {}).get(concept, {}).get("units", {}).get(unit)
+        if not values:
+            continue
+        annual = [v for v in values if v.get("form", "").startswith(("10-K", "20-F", "40-F")) and v.get("fp") == "FY"]
+        best = max(annual or values, key=lambda v: (v.get("end", ""), v.get("filed", "")))
+        return {"concept": concept, "value": best["val"], "end": best.get("end"), "form": best.get("form")}
+    return None
+
+
+def compact_company_facts(company_facts):
+    """Key financial facts (label -> latest value) from a company-facts JSON document."""
+    facts = company_facts.get("facts", {})
+    key_facts = {}
+    for label, taxonomy, concepts, unit in KEY_FACTS:
+        fact = _latest_fact(facts, taxonomy, concepts, unit)
+        if fact:
+            key_facts[label] = fact
+    return key_facts
+
+
+def _format_value(value, label):
+    if label == "Diluted EPS":
+        return f"${value:,.2f}"
+    if label == "Shares outstanding":
+        return f"{value:,.0f}"
+    for size, suffix in ((1e12, "T"), (1e9, "B"), (1e6, "M")):
+        if abs(value) >= size:
+            return f"${value / size:,.2f}{suffix}"
+    return f"${value:,.0f}"
+
+
+class EdgarAdapter(SourceAdapter):
+    """SEC EDGAR: resolves the company from a local ticker index, then reads its submissions and XBRL facts JSON."""
+
+    name = "sec"
+    function_name = "search_sec_api"
+    description = "Searches SEC EDGAR for a company (name or ticker) and returns its recent filings and key financial facts."
+    query_description = "The company name or ticker to look up in SEC EDGAR."
+    error_label = "SEC API"
+    # The registry limits whole lookups; each SEC request below goes through the 10 requests/second limiter
+    rate_limit = (20, 1.0)
+    timeout = 60
+    cache_ttl = EDGAR_CACHE_TTL
+
+    def __init__(self, index=None, cache=None):
+        self._index = index
+        self._disk = cache
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = TickerIndex()
+        return self._index
+
+    @property
+    def disk(self):
+        if self._disk is None:
+            self._disk = DiskCache()
+        return self._disk
+
+    async def _get_json(self, session, url):
+        await _sec_limiter.acquire()
+        async with session.get(url, headers={"User-Agent": EDGAR_USER_AGENT}) as response:
+            if response.status == 404:
+                return None
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    async def _cached(self, session, key, url, compact):
+        document = self.disk.get(key)
+        if document is None:
+            raw = await self._get_json(session, url)
+            if raw is None:
+                return None
+            # Only the compacted form is kept; company facts are several MB raw
+            document = compact(raw)
+            self.disk.put(key, document)
+        return document
+
+    async def refresh_index(self, session):
+        self.index.load(await self._get_json(session, TICKERS_URL))
+
+    async def fetch(self, session, query):
+        if self.index.is_stale():
+            try:
+                await self.refresh_index(session)
+            except Exception as e:
+                # A stale index still resolves most names; only fail when there is none at all
+                if self.index.age() == float("inf"):
+                    raise
+                logging.warning(f"EDGAR ticker index refresh failed, using stale index: {e}")
+        company = self.index.resolve(query)
+        if company is None:
+            return None
+        cik = company["cik"]
+        submissions = await self._cached(session, f"submissions-{cik}", SUBMISSIONS_URL.format(cik=cik), compact_submissions)
+        facts = await self._cached(session, f"facts-{cik}", COMPANY_FACTS_URL.format(cik=cik), compact_company_facts)
+        return {"company": company, "submissions": submissions or {}, "facts": facts or {}}
+
+    def parse(self, raw, query):
+        if raw is None:
+            return [(f"SEC API: No filings found for '{query}'.", None)]
+        company, submissions, facts = raw["company"], raw["submissions"], raw["facts"]
+        cik = company["cik"]
+        profile_url = f"https://www.sec.gov/cgi-bin/browse-edgar?action=getcompany&CIK={cik:010d}"
+        lines = [f"[SEC Company] {submissions.get('name') or company['title']} ({company['ticker']}, CIK {cik})"]
+        if submissions.get("sic"):
+            lines.append(f"Industry: {submissions['sic']}")
+        for label, fact in facts.items():
+            lines.append(f"{label}: {_format_value(fact['value'], label)} (period ending {fact['end']}, {fact['form']})")
+        records = [("\n".join(lines) + f"\nURL: {profile_url}", profile_url)]
+        for i, filing in enumerate(submissions.get("filings", [])):
+            text = f"[SEC Filing {i + 1}] {company['title']} {filing['form']} filed {filing['filed']}"
+            if filing["period"]:
+                text += f" for period {filing['period']}"
+            if filing["description"] and filing["description"] != filing["form"]:
+                text += f"\n{filing['description']}"
+            records.append((f"{text}\nURL: {filing['url']}", filing["url"]))
+        return records
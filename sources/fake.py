@@ -0,0 +1,34 @@
+import asyncio
+from sources.registry import SourceAdapter
+
+
+class FakeSourceAdapter(SourceAdapter):
+    """Offline adapter that answers from canned results, for tests and benchmarks.
+
+    `responses` maps a query to a list of (text, url) records; unknown queries get one generated record.
+    `latency` simulates the network round trip of fetch().
+    """
+
+    rate_limit = (1000, 1.0)
+    retries = 0
+    uses_http = False
+
+    def __init__(self, name="fake", responses=None, latency=0.0, function_name=None):
+        self.name = name
+        self.function_name = function_name or f"search_{name}_api"
+        self.description = f"Searches the {name} test source and returns canned results for a query."
+        self.error_label = f"{name} source"
+        self.responses = responses or {}
+        self.latency = latency
+        self.calls = []
+
+    async def fetch(self, session, query):
+        self.calls.append(query)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.responses.get(query)
+
+    def parse(self, raw, query):
+        if raw is None:
+            return [(f"[{self.name} Result 1] Canned result for {query}", f"https://{self.name}.test/{len(query)}")]
+        return list(raw)
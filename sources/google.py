@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from sources.registry import SourceAdapter, SourceUnavailable
+
+load_dotenv()
+
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+SEARCH_ENGINE_ID = os.getenv("SEARCH_ENGINE_ID")
+GOOGLE_SEARCH_URL = "https://www.googleapis.com/customsearch/v1"
+# Custom Search returns at most 10 results per request; more results are fetched as concurrent start= pages
+GOOGLE_RESULTS = int(os.getenv("GOOGLE_RESULTS", "10"))
+GOOGLE_DAILY_QUOTA = int(os.getenv("GOOGLE_DAILY_QUOTA", "100"))
+# Requests kept in reserve: below this many, queries are answered from cached results only
+GOOGLE_QUOTA_RESERVE = int(os.getenv("GOOGLE_QUOTA_RESERVE", "5"))
+GOOGLE_QUOTA_PATH = os.getenv("GOOGLE_QUOTA_PATH", os.path.join(tempfile.gettempdir(), "deepquest_google_quota.sqlite"))
+RESULTS_PER_PAGE = 10
+# Only the fields parse() reads are requested
+RESULT_FIELDS = "items(title,link,displayLink,snippet)"
+
+
+def _quota_day():
+    """Custom Search quotas reset at midnight Pacific time."""
+    try:
+        from zoneinfo import ZoneInfo
+
+        return datetime.now(ZoneInfo("America/Los_Angeles")).date().isoformat()
+    except Exception:
+        return datetime.now(timezone.utc).date().isoformat()
+
+
+class QuotaLedger:
+    """Daily request count for the Custom Search API, kept in SQLite so the app, service and googlemcp.py share one budget.
+
+    SQLite's write lock makes charges atomic across processes, as in newsapi.ArticleStore.
+    """
+
+    def __init__(self, path=None, daily_quota=GOOGLE_DAILY_QUOTA, reserve=GOOGLE_QUOTA_RESERVE):
+        self.path = path or GOOGLE_QUOTA_PATH
+        self.daily_quota = daily_quota
+        self.reserve = reserve
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._db.executescript(
+            "PRAGMA journal_mode=WAL;"
+            "CREATE TABLE IF NOT EXISTS quota (day TEXT PRIMARY KEY, used INTEGER NOT NULL);"
+        )
+
+    def _used(self, day):
+        row = self._db.execute("SELECT used FROM quota WHERE day = ?", (day,)).fetchone()
+        return row[0] if row else 0
+
+    def used(self):
+        with self._lock:
+            return self._used(_quota_day())
+
+    def remaining(self):
+        return max(self.daily_quota - self.used(), 0)
+
+    def available(self):
+        """Requests that may still be spent before the reserve is reached."""
+        return max(self.remaining() - self.reserve, 0)
+
+    def charge(self, requests=1, limit=None):
+        """Add up to requests to today's count, never taking it past limit; returns how many were charged.
+
+        The check and the update run in one write transaction, so concurrent processes cannot overspend the quota.
+        """
+        day = _quota_day()
+        with self._lock, self._db:
+            # IMMEDIATE takes the write lock before reading, so no other process charges in between
+            self._db.execute("BEGIN IMMEDIATE")
+            used = self._used(day)
+            charged = requests if limit is None else max(min(requests, limit - used), 0)
+            if charged:
+                self._db.execute(
+                    "INSERT INTO quota VALUES (?, ?) ON CONFLICT(day) DO UPDATE SET used = used + excluded.used",
+                    (day, charged),
+                )
+        return charged
+
+    def snapshot(self):
+        used = self.used()
+        return {"day": _quota_day(), "used": used, "remaining": max(self.daily_quota - used, 0), "daily_quota": self.daily_quota}
+
+
+_quota_ledger = None
+_quota_ledger_lock = threading.Lock()
+
+
+def get_quota_ledger():
+    """Process-wide quota ledger, opened on the first Google search rather than when sources are imported."""
+    global _quota_ledger
+    with _quota_ledger_lock:
+        if _quota_ledger is None:
+            _quota_ledger = QuotaLedger()
+        return _quota_ledger
+
+
+async def _fetch_page(session, query, start, num):
+    params = {
+        "key": GOOGLE_API_KEY,
+        "cx": SEARCH_ENGINE_ID,
+        "q": query,
+        "num": num,
+        "start": start,
+        "fields": RESULT_FIELDS,
+    }
+    async with session.get(GOOGLE_SEARCH_URL, params=params) as response:
+        response.raise_for_status()
+        return (await response.json(content_type=None)).get("items", [])
+
+
+class GoogleAdapter(SourceAdapter):
+    """Google Custom Search: result pages fetched concurrently, charged against a shared daily quota ledger."""
+
+    name = "google"
+    function_name = "search_google_api"
+    description = "Searches Google and returns relevant web results for a query."
+    query_description = "The search query for Google."
+    error_label = "Google Search"
+    rate_limit = (10, 1.0)
+    cache_ttl = 6 * 3600
+
+    def __init__(self, results=GOOGLE_RESULTS, ledger=None):
+        self.results = results
+        self._ledger = ledger
+
+    @property
+    def ledger(self):
+        if self._ledger is None:
+            self._ledger = get_quota_ledger()
+        return self._ledger
+
+    async def fetch(self, session, query):
+        pages = -(-self.results // RESULTS_PER_PAGE)
+        ledger = self.ledger
+        # The charge may wait on another process's write lock, so it runs off the shared source loop
+        charged = await asyncio.to_thread(ledger.charge, pages, ledger.daily_quota - ledger.reserve)
+        if not charged:
+            remaining = await asyncio.to_thread(ledger.remaining)
+            raise SourceUnavailable(f"daily quota nearly exhausted ({remaining} requests left)")
+        if charged < pages:
+            logging.warning(f"Google quota low: fetching {charged} of {pages} result pages")
+            pages = charged
+        starts = [1 + page * RESULTS_PER_PAGE for page in range(pages)]
+        batches = await asyncio.gather(*(
+            _fetch_page(session, query, start, min(RESULTS_PER_PAGE, self.results - start + 1)) for start in starts
+        ), return_exceptions=True)
+        failed = [batch for batch in batches if isinstance(batch, BaseException)]
+        if len(failed) == len(batches):
+            raise failed[0]
+        if failed:
+            # The quota for every page is spent either way, so the pages that arrived are kept
+            logging.warning(f"Google: {len(failed)} of {len(batches)} result pages failed for '{query}': {failed[0]!r}")
+        return [item for batch in batches if not isinstance(batch, BaseException) for item in batch]
+
+    def parse(self, raw, query):
+        return [
+            (f"[Google Result {i + 1}] {item['title']} - {item['displayLink']}\n{item.get('snippet', '')}", item["link"])
+            for i, item in enumerate(raw)
+        ]
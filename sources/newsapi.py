@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+from sources.registry import SourceAdapter
+
+load_dotenv()
+
+NEWSAPI_KEY = os.getenv("NEWSAPI_KEY")
+NEWSAPI_URL = "https://newsapi.org/v2/everything"
+NEWSAPI_DATA_DIR = os.getenv("NEWSAPI_DATA_DIR", os.path.join(tempfile.gettempdir(), "deepquest_news"))
+# NewsAPI allows up to 100 articles per page; every page costs one request of the daily quota
+NEWSAPI_PAGE_SIZE = int(os.getenv("NEWSAPI_PAGE_SIZE", "20"))
+NEWSAPI_MAX_PAGES = int(os.getenv("NEWSAPI_MAX_PAGES", "1"))
+# Only look this many days back (0 = no lower bound); the free plan rejects windows older than a month
+NEWSAPI_WINDOW_DAYS = int(os.getenv("NEWSAPI_WINDOW_DAYS", "0"))
+NEWSAPI_RESULTS = int(os.getenv("NEWSAPI_RESULTS", "5"))
+
+
+def normalize_query(query):
+    return " ".join((query or "").lower().split())
+
+
+class ArticleStore:
+    """Local SQLite store of articles keyed by URL, with the newest publish time seen per query as its cursor."""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(NEWSAPI_DATA_DIR, "articles.sqlite")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.executescript(
+            "PRAGMA journal_mode=WAL;"
+            "CREATE TABLE IF NOT EXISTS articles (url TEXT PRIMARY KEY, published_at TEXT, title TEXT, source TEXT,"
+            " description TEXT, fetched_at REAL);"
+            "CREATE TABLE IF NOT EXISTS query_articles (query TEXT, url TEXT, PRIMARY KEY (query, url));"
+            "CREATE TABLE IF NOT EXISTS cursors (query TEXT PRIMARY KEY, published_at TEXT);"
+        )
+
+    def cursor(self, query):
+        with self._lock:
+            row = self._db.execute("SELECT published_at FROM cursors WHERE query = ?", (normalize_query(query),)).fetchone()
+        return row[0] if row else None
+
+    def add(self, query, articles):
+        """Store articles for a query and advance its cursor; returns how many URLs were new to the store."""
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock, self._db:
+            before = self._db.total_changes
+            self._db.executemany(
+                "INSERT OR IGNORE INTO articles VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (a["url"], a.get("publishedAt") or "", a.get("title") or "", (a.get("source") or {}).get("name") or "",
+                     a.get("description") or "", now)
+                    for a in articles if a.get("url")
+                ],
+            )
+            added = self._db.total_changes - before
+            self._db.executemany("INSERT OR IGNORE INTO query_articles VALUES (?, ?)", [(key, a["url"]) for a in articles if a.get("url")])
+            newest = max((a.get("publishedAt") or "" for a in articles), default="")
+            if newest:
+                self._db.execute(
+                    "INSERT INTO cursors VALUES (?, ?) ON CONFLICT(query) DO UPDATE SET published_at = "
+                    "max(published_at, excluded.published_at)",
+                    (key, newest),
+                )
+        return added
+
+    def articles(self, query, limit=NEWSAPI_RESULTS):
+        """Stored articles for a query, newest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT a.url, a.published_at, a.title, a.source, a.description FROM articles a"
+                " JOIN query_articles q ON q.url = a.url WHERE q.query = ? ORDER BY a.published_at DESC LIMIT ?",
+                (normalize_query(query), limit),
+            ).fetchall()
+        return [dict(zip(("url", "published_at", "title", "source", "description"), row)) for row in rows]
+
+
+def _iso(moment):
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+
+
+async def fetch_articles(session, query, from_date=None, to_date=None, sort_by="relevancy",
+                         page_size=NEWSAPI_PAGE_SIZE, max_pages=NEWSAPI_MAX_PAGES):
+    """Articles for a query within an optional [from_date, to_date] window, paging until max_pages or the last page."""
+    params = {"q": query, "language": "en", "sortBy": sort_by, "pageSize": min(page_size, 100)}
+    if from_date:
+        params["from"] = from_date
+    if to_date:
+        params["to"] = to_date
+    articles = []
+    for page in range(1, max_pages + 1):
+        async with session.get(NEWSAPI_URL, params=dict(params, page=page), headers={"X-Api-Key": NEWSAPI_KEY or ""}) as response:
+            data = await response.json(content_type=None)
+        if data.get("status") != "ok":
+            raise RuntimeError(f"{data.get('code', response.status)}: {data.get('message', 'request failed')}")
+        articles.extend(data.get("articles", []))
+        if len(articles) >= data.get("totalResults", 0) or len(data.get("articles", [])) < params["pageSize"]:
+            break
+    return articles
+
+
+class NewsApiAdapter(SourceAdapter):
+    """NewsAPI /v2/everything; repeat queries only fetch articles newer than the query's cursor."""
+
+    name = "newsapi"
+    function_name = "search_newsapi_api"
+    description = "Searches NewsAPI and returns relevant news articles for a query."
+    query_description = "The search query for NewsAPI."
+    error_label = "NewsAPI"
+    rate_limit = (5, 1.0)
+    cache_ttl = 900
+
+    def __init__(self, store=None, window_days=NEWSAPI_WINDOW_DAYS, results=NEWSAPI_RESULTS):
+        self._store = store
+        self.window_days = window_days
+        self.results = results
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = ArticleStore()
+        return self._store
+
+    async def fetch(self, session, query):
+        # Store calls are blocking SQLite, so they run off the shared source loop
+        store = await asyncio.to_thread(lambda: self.store)
+        cursor = await asyncio.to_thread(store.cursor, query)
+        window_start = datetime.now(timezone.utc) - timedelta(days=self.window_days) if self.window_days else None
+        if cursor:
+            # Incremental poll: newest first from just after the last article seen for this query
+            since = datetime.fromisoformat(cursor.replace("Z", "+00:00")) + timedelta(seconds=1)
+            since = max(since, window_start) if window_start else since
+            articles = await fetch_articles(session, query, from_date=_iso(since), sort_by="publishedAt")
+        else:
+            articles = await fetch_articles(session, query, from_date=_iso(window_start) if window_start else None)
+        added = await asyncio.to_thread(store.add, query, articles)
+        logging.info(f"NewsAPI '{query}': {len(articles)} fetched, {added} new (cursor {cursor or 'none'})")
+        return await asyncio.to_thread(store.articles, query, self.results)
+
+    def parse(self, raw, query):
+        return [
+            (
+                f"[News {i + 1}] {article['title']} ({article['source']})\n{article['description']}\n"
+                f"Published: {article['published_at'][:10]}\nURL: {article['url']}",
+                article["url"],
+            )
+            for i, article in enumerate(raw)
+        ]
@@ -0,0 +1,297 @@
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from collections import OrderedDict
+from cancellation import get_run_token, wait_future
+from citations import novel_cited
+from telemetry import incr, observe, span
+
+DEFAULT_CACHE_SIZE = 512
+
+
+class SourceUnavailable(Exception):
+    """Raised by an adapter that must not be called right now (e.g. quota exhausted); cached results are served instead."""
+
+
+class SourceAdapter:
+    """Base class for a retrieval source.
+
+    Subclasses declare how the source is exposed to the LLM (function_name, description, query_description),
+    how it may be called (rate_limit, max_concurrency, timeout, retries, cache_ttl), and implement
+    fetch() (async network I/O) and parse() (raw response -> list of (formatted text, url) records).
+    Adapters with CPU-heavy parsing override aparse() to hand that work to the CPU pool instead of the source loop.
+    """
+
+    name = None
+    function_name = None
+    description = ""
+    query_description = "The search query."
+    error_label = "Source"
+    # (calls, per_seconds)
+    rate_limit = (10, 1.0)
+    max_concurrency = 4
+    timeout = 15
+    retries = 2
+    backoff = 2
+    cache_ttl = 3600
+    # Offline adapters set this to False and receive no HTTP session
+    uses_http = True
+
+    def schema(self):
+        """OpenAI function-calling schema for this source."""
+        return {
+            "name": self.function_name,
+            "description": self.description,
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": self.query_description},
+                },
+                "required": ["query"],
+            },
+        }
+
+    async def fetch(self, session, query):
+        raise NotImplementedError
+
+    def parse(self, raw, query):
+        raise NotImplementedError
+
+    async def aparse(self, raw, query):
+        return self.parse(raw, query)
+
+
+class RateLimiter:
+    """Spaces calls evenly so at most `calls` start in any `per_seconds` window; waiters queue instead of failing."""
+
+    def __init__(self, calls, per_seconds):
+        self.interval = per_seconds / calls if calls else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def cited_text(records):
+    """The run's novel records of a fetch, tagged with citation IDs, as one prompt-ready string."""
+    return "\n\n".join(novel_cited([text for text, _ in records], [url for _, url in records]))
+
+
+async def _in_context(context, coro):
+    """Await coro with the caller's context variables (its run, current span) set, as a thread would see them."""
+    for var, value in context.items():
+        var.set(value)
+    return await coro
+
+
+class _BackgroundLoop:
+    """One event loop thread shared by all registries, so HTTP pools, rate limits and caches are process-wide."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.loop = None
+        self._session = None
+
+    def ensure(self):
+        with self._lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(target=self.loop.run_forever, name="source-loop", daemon=True).start()
+        return self.loop
+
+    def run(self, coro, timeout=None, token=None):
+        future = asyncio.run_coroutine_threadsafe(_in_context(contextvars.copy_context(), coro), self.ensure())
+        if token is None:
+            return future.result(timeout)
+        # Cancelling the future cancels the coroutine on the loop, so a cancelled run stops its requests too
+        return wait_future(future, token)
+
+    async def session(self):
+        import aiohttp
+
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=64, ttl_dns_cache=300),
+                headers={"User-Agent": "deepQuest/1.0 (contact@example.com)"},
+            )
+        return self._session
+
+
+_background = _BackgroundLoop()
+
+
+def use_session(session):
+    """Send all source HTTP through the given aiohttp-compatible session, e.g. a replay transport in benchmarks."""
+    _background._session = session
+
+
+def run_with_session(fn, timeout=None):
+    """Run the coroutine fn(session) on the shared source loop and return its result, for one-off source calls."""
+    async def call():
+        return await fn(await _background.session())
+    return _background.run(call(), timeout)
+
+
+class SourceRegistry:
+    """Registered source adapters plus the shared dispatch, caching, rate limiting and concurrency around them."""
+
+    def __init__(self, cache_size=DEFAULT_CACHE_SIZE):
+        self._adapters = OrderedDict()
+        self._limiters = {}
+        self._semaphores = {}
+        self._cache = OrderedDict()
+        self._in_flight = {}
+        self._waiters = {}
+        self._cache_size = cache_size
+        self.stats = {"calls": 0, "cache_hits": 0, "stale_hits": 0, "coalesced": 0, "errors": 0}
+
+    def register(self, adapter):
+        self._adapters[adapter.name] = adapter
+        self._limiters.pop(adapter.name, None)
+        self._semaphores.pop(adapter.name, None)
+        return adapter
+
+    def get(self, name):
+        return self._adapters.get(name)
+
+    def names(self):
+        return list(self._adapters)
+
+    def by_function(self, function_name):
+        for adapter in self._adapters.values():
+            if adapter.function_name == function_name:
+                return adapter
+        return None
+
+    def function_schemas(self, prefer=()):
+        """Function-calling schemas of every registered source, for the executor LLM calls; sources in prefer come first."""
+        return [adapter.schema() for adapter in sorted(self._adapters.values(), key=lambda a: a.name not in prefer)]
+
+    def function_names(self, names):
+        """Function-calling names of the registered sources among names, in that order."""
+        return [self._adapters[name].function_name for name in names if name in self._adapters]
+
+    def _limiter(self, adapter):
+        if adapter.name not in self._limiters:
+            self._limiters[adapter.name] = RateLimiter(*adapter.rate_limit)
+            self._semaphores[adapter.name] = asyncio.Semaphore(adapter.max_concurrency)
+        return self._limiters[adapter.name], self._semaphores[adapter.name]
+
+    async def _fetch_with_retries(self, adapter, query):
+        limiter, semaphore = self._limiter(adapter)
+        session = await _background.session() if adapter.uses_http else None
+        last_exception = None
+        for attempt in range(adapter.retries + 1):
+            try:
+                async with semaphore:
+                    await limiter.acquire()
+                    raw = await asyncio.wait_for(adapter.fetch(session, query), timeout=adapter.timeout)
+                return await adapter.aparse(raw, query)
+            except SourceUnavailable:
+                raise
+            except Exception as e:
+                last_exception = e
+                logging.warning(f"Attempt {attempt + 1} failed for {adapter.name} source: {e!r}")
+                if attempt < adapter.retries:
+                    incr("source.retries", source=adapter.name)
+                    await asyncio.sleep(adapter.backoff)
+        raise last_exception
+
+    async def _load(self, adapter, key, query):
+        start = time.perf_counter()
+        try:
+            records = await self._fetch_with_retries(adapter, query)
+        except SourceUnavailable as e:
+            stale = self._cache.get(key)
+            if stale:
+                logging.warning(f"{adapter.error_label} unavailable ({e}); serving expired cached results")
+                self.stats["stale_hits"] += 1
+                incr("source.stale_hits", source=adapter.name)
+                return stale[1]
+            self.stats["errors"] += 1
+            incr("source.errors", source=adapter.name)
+            return [(f"{adapter.error_label} Error: {str(e)}", None)]
+        except Exception as e:
+            self.stats["errors"] += 1
+            incr("source.errors", source=adapter.name)
+            logging.error(f"{adapter.error_label} Error: {e}")
+            # Errors are returned like results, but never cached
+            return [(f"{adapter.error_label} Error: {str(e)}", None)]
+        observe("source.latency", time.perf_counter() - start, source=adapter.name)
+        if adapter.cache_ttl:
+            self._cache[key] = (time.monotonic() + adapter.cache_ttl, records)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return records
+
+    async def afetch(self, name, query):
+        """Records [(text, url), ...] for a query, from cache when fresh; concurrent identical calls share one fetch."""
+        adapter = self._adapters[name]
+        key = (name, " ".join(query.lower().split()))
+        self.stats["calls"] += 1
+        incr("source.calls", source=name)
+        with span("source", source=name, query=query[:200]) as source_span:
+            cached = self._cache.get(key)
+            if cached and cached[0] > time.monotonic():
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                incr("source.cache_hits", source=name)
+                source_span.set(cache="hit", records=len(cached[1]))
+                return cached[1]
+            task = self._in_flight.get(key)
+            if task is not None and not task.cancelled():
+                self.stats["coalesced"] += 1
+                incr("source.coalesced", source=name)
+                source_span.set(cache="coalesced")
+                return await self._await_shared(name, task)
+            source_span.set(cache="miss")
+            task = asyncio.ensure_future(self._load(adapter, key, query))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+            records = await self._await_shared(name, task)
+            source_span.set(records=len(records))
+            return records
+
+    async def _await_shared(self, name, task):
+        """Await a fetch shared by coalesced callers; it is cancelled only once every caller has been cancelled."""
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    incr("source.abandoned", source=name)
+                    task.cancel()
+
+    def fetch(self, name, query, token=None):
+        """Blocking afetch for callers running in ordinary threads; raises RunCancelled once the run's token fires."""
+        return _background.run(self.afetch(name, query), token=token or get_run_token())
+
+    def fetch_many(self, requests, token=None):
+        """Fetch several (source, query) pairs concurrently; returns their record lists in order."""
+        async def gather():
+            return await asyncio.gather(*(self.afetch(name, query) for name, query in requests))
+        return _background.run(gather(), token=token or get_run_token())
+
+    def search(self, name, query, token=None):
+        """Fetch a source and return its novel results, tagged with citation IDs, as one prompt-ready string."""
+        if name not in self._adapters:
+            return f"[MCP] Source '{name}' not supported."
+        return cited_text(self.fetch(name, query, token))
+
+    def dispatch(self, function_name, arguments, token=None):
+        """Run the source behind an LLM function call."""
+        adapter = self.by_function(function_name)
+        if adapter is None:
+            return "[Function not implemented]"
+        return self.search(adapter.name, arguments.get("query", ""), token)
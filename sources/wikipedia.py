@@ -0,0 +1,145 @@
+import asyncio
+import os
+import re
+from collections import OrderedDict
+from dotenv import load_dotenv
+from cpu_pool import get_cpu_pool
+from passage_ranker import select_passages
+from sources.registry import SourceAdapter
+
+load_dotenv()
+
+WIKIPEDIA_API_URL = os.getenv("WIKIPEDIA_API_URL", "https://en.wikipedia.org/w/api.php")
+WIKIPEDIA_SEARCH_LIMIT = int(os.getenv("WIKIPEDIA_SEARCH_LIMIT", "3"))
+# Intro-only extracts are smaller and batch 50 pages per request; full pages are narrowed to their relevant sections
+WIKIPEDIA_INTRO_ONLY = os.getenv("WIKIPEDIA_INTRO_ONLY", "false").lower() == "true"
+WIKIPEDIA_TOKEN_BUDGET = int(os.getenv("WIKIPEDIA_TOKEN_BUDGET", "800"))
+WIKIPEDIA_REVISION_CACHE_SIZE = int(os.getenv("WIKIPEDIA_REVISION_CACHE_SIZE", "2000"))
+# MediaWiki accepts at most 50 titles/page IDs per query
+MAX_TITLES_PER_REQUEST = 50
+
+SECTION_PATTERN = re.compile(r"^(={2,6})\s*(.+?)\s*\1\s*$", re.MULTILINE)
+
+# (revision ID, intro only) -> extract; a page's revision ID changes on every edit, so entries never go stale
+_revision_cache = OrderedDict()
+
+
+def _cache_get(key):
+    extract = _revision_cache.get(key)
+    if extract is not None:
+        _revision_cache.move_to_end(key)
+    return extract
+
+
+def _cache_put(key, extract):
+    _revision_cache[key] = extract
+    while len(_revision_cache) > WIKIPEDIA_REVISION_CACHE_SIZE:
+        _revision_cache.popitem(last=False)
+
+
+def sections_to_markdown(extract):
+    """Turn '== Heading ==' section markers of a plain-text extract into markdown headings."""
+    return SECTION_PATTERN.sub(lambda m: "#" * len(m.group(1)) + " " + m.group(2), extract or "")
+
+
+async def _query(session, params):
+    """Run an action=query request, following 'continue' and merging pages by page ID."""
+    params = dict(params, action="query", format="json", formatversion=2)
+    pages = {}
+    while True:
+        async with session.get(WIKIPEDIA_API_URL, params=params) as response:
+            response.raise_for_status()
+            data = await response.json(content_type=None)
+        for page in data.get("query", {}).get("pages", []):
+            merged = pages.setdefault(page["pageid"], {})
+            merged.update({key: value for key, value in page.items() if value is not None})
+        if "continue" not in data:
+            return list(pages.values())
+        params.update(data["continue"])
+
+
+async def search_pages(session, query, limit=WIKIPEDIA_SEARCH_LIMIT):
+    """Pages matching a search query, best first, with their current revision IDs."""
+    pages = await _query(session, {
+        "generator": "search",
+        "gsrsearch": query,
+        "gsrlimit": limit,
+        "prop": "info",
+        "inprop": "url",
+    })
+    return sorted((page for page in pages if "missing" not in page), key=lambda page: page.get("index", 0))
+
+
+async def fetch_extracts(session, pages, intro_only=WIKIPEDIA_INTRO_ONLY):
+    """page ID -> plain-text extract for pages whose revision isn't cached yet; cached revisions skip the network."""
+    extracts = {}
+    missing = []
+    for page in pages:
+        cached = _cache_get((page.get("lastrevid"), intro_only))
+        if cached is not None:
+            extracts[page["pageid"]] = cached
+        else:
+            missing.append(page)
+    params = {"prop": "extracts|info", "explaintext": 1, "exsectionformat": "wiki"}
+    if intro_only:
+        # Intro extracts can be batched; TextExtracts returns them 20 at a time through 'continue'
+        params.update(exintro=1, exlimit="max")
+        batches = [missing[i:i + MAX_TITLES_PER_REQUEST] for i in range(0, len(missing), MAX_TITLES_PER_REQUEST)]
+    else:
+        # Full-page extracts are limited to one page per request, so those requests run concurrently instead
+        batches = [[page] for page in missing]
+    responses = await asyncio.gather(*(
+        _query(session, dict(params, pageids="|".join(str(page["pageid"]) for page in batch))) for batch in batches
+    ))
+    for fetched in responses:
+        for page in fetched:
+            extract = page.get("extract")
+            if extract:
+                extracts[page["pageid"]] = extract
+                _cache_put((page.get("lastrevid"), intro_only), extract)
+    return extracts
+
+
+def page_passages(extract, query, token_budget):
+    """The sections of a page extract most relevant to the query, as markdown."""
+    # BM25 only: this runs on the source loop or in a CPU pool worker
+    markdown = sections_to_markdown(extract)
+    text = select_passages(markdown, query, token_budget, use_embeddings=False)
+    # Every section was larger than the budget: fall back to the start of the page
+    return text or markdown[:token_budget * 4]
+
+
+class WikipediaAdapter(SourceAdapter):
+    name = "wikipedia"
+    function_name = "search_wikipedia_api"
+    description = "Searches Wikipedia and returns relevant extracts for a query."
+    query_description = "The search query for Wikipedia."
+    error_label = "Wikipedia"
+    rate_limit = (20, 1.0)
+    timeout = 20
+    cache_ttl = 3600
+
+    def __init__(self, intro_only=WIKIPEDIA_INTRO_ONLY, token_budget=WIKIPEDIA_TOKEN_BUDGET):
+        self.intro_only = intro_only
+        self.token_budget = token_budget
+
+    async def fetch(self, session, query):
+        pages = await search_pages(session, query)
+        extracts = await fetch_extracts(session, pages, self.intro_only)
+        return [
+            {"title": page["title"], "url": page.get("fullurl"), "extract": extracts[page["pageid"]]}
+            for page in pages
+            if page["pageid"] in extracts
+        ]
+
+    def _records(self, raw, texts):
+        return [(f"[Wikipedia] {page['title']}\n{text}\nURL: {page['url']}", page["url"]) for page, text in zip(raw, texts)]
+
+    def parse(self, raw, query):
+        return self._records(raw, [page_passages(page["extract"], query, self.token_budget) for page in raw])
+
+    async def aparse(self, raw, query):
+        # Full pages can be long; rank their sections in the CPU pool (when configured) while the loop serves I/O
+        pool = get_cpu_pool()
+        texts = await asyncio.gather(*(pool.arun(page_passages, page["extract"], query, self.token_budget) for page in raw))
+        return self._records(raw, texts)
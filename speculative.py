@@ -0,0 +1,75 @@
+import concurrent.futures
+import logging
+import os
+import threading
+from dotenv import load_dotenv
+from sources.registry import cited_text
+from telemetry import bind_context
+
+load_dotenv()
+
+SPECULATIVE_PREFETCH = os.getenv("SPECULATIVE_PREFETCH", "true").lower() in ("1", "true", "yes")
+PREFETCH_WAIT_SECONDS = float(os.getenv("PREFETCH_WAIT_SECONDS", "30"))
+
+
+class SpeculativePrefetcher:
+    """Runs cache-warming searches for plan steps in the background while the plan is still streaming.
+
+    A prefetch only fetches raw records into the registry cache; they are deduplicated and given citation IDs
+    when a step takes them, so a prefetch that no step uses leaves the run's dedup and citation indices alone.
+    Each step is searched on the first of its planner source_hints the registry has, or on the default source.
+    """
+
+    def __init__(self, registry, source="google", max_workers=3):
+        self.registry = registry
+        self.source = source
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="prefetch"
+        )
+        self._lock = threading.Lock()
+        self._futures = {}
+        self._sources = {}
+        self._used = set()
+
+    def submit(self, step, source_hints=()):
+        """Start a background fetch for a step unless one is already running; it counts against the caller's run."""
+        source = next((name for name in source_hints if self.registry.get(name)), self.source)
+        with self._lock:
+            if step in self._futures:
+                return
+            self._sources[step] = source
+            self._futures[step] = self._executor.submit(bind_context(self.registry.fetch), source, step)
+
+    def function_name(self, step):
+        """Function-calling name of the source a step was prefetched from, to replay the search as a tool call."""
+        with self._lock:
+            source = self._sources.get(step, self.source)
+        return self.registry.get(source).function_name
+
+    def take(self, step, timeout=PREFETCH_WAIT_SECONDS):
+        """Return the prefetched evidence for a step, waiting for it if still in flight, or None."""
+        with self._lock:
+            future = self._futures.get(step)
+        if future is None:
+            return None
+        try:
+            records = future.result(timeout=timeout)
+        except Exception as e:
+            logging.warning(f"Speculative prefetch for step '{step}' unusable: {e}")
+            return None
+        with self._lock:
+            self._used.add(step)
+        return cited_text(records)
+
+    def report(self):
+        with self._lock:
+            submitted = len(self._futures)
+            used = len(self._used)
+        stats = {"submitted": submitted, "used": used, "wasted": submitted - used}
+        logging.info(
+            f"Speculative prefetch: {used} of {submitted} searches used, {stats['wasted']} wasted"
+        )
+        return stats
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
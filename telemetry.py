@@ -0,0 +1,410 @@
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from collections import deque
+from dotenv import load_dotenv
+from run_context import current_run
+
+load_dotenv()
+
+# Comma-separated exporters run when a research run finishes: console, json, otlp (empty for none)
+TELEMETRY_EXPORTERS = os.getenv("TELEMETRY_EXPORTERS", "console")
+TELEMETRY_JSON_PATH = os.getenv("TELEMETRY_JSON_PATH", "telemetry.jsonl")
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318")
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "deepquest")
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+# Bounds memory for long-lived processes (MCP servers) that never finish a run
+MAX_SPANS = 5000
+HISTOGRAM_SAMPLES = 1000
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation in a run's trace, with free-form attributes such as token counts."""
+
+    def __init__(self, name, trace_id, parent_id, attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = dict(attributes)
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = "ok"
+        self.error = None
+        self._start = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def fail(self, error):
+        self.status = "error"
+        self.error = error if isinstance(error, str) else repr(error)
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.duration = time.perf_counter() - self._start
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration": round(self.duration, 4) if self.duration is not None else None,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class Histogram:
+    """Count, sum, min/max and bucket counts of observed values, plus a bounded sample for percentiles."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = list(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.samples = deque(maxlen=HISTOGRAM_SAMPLES)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.samples.append(value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+                break
+        else:
+            self.bucket_counts[-1] += 1
+
+    def percentile(self, q):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.total, 4),
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+        }
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(key):
+    return ",".join(f"{k}={v}" for k, v in key)
+
+
+class RunTelemetry:
+    """Run-scoped trace and metrics: spans for pipeline stages and calls, counters and histograms.
+
+    Spans nest through a context variable, so LLM and source calls made inside a step become its children.
+    finish() hands the run to the configured exporters once.
+    """
+
+    def __init__(self, name="research_run", exporters=None, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self.trace_id = os.urandom(16).hex()
+        self.exporters = exporters if exporters is not None else exporters_from_env()
+        self.spans = deque(maxlen=MAX_SPANS)
+        self.counters = {}
+        self.histograms = {}
+        self.started_ns = time.time_ns()
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def start_span(self, name, **attributes):
+        """Open a span under the current one without making it current; close it with end_span()."""
+        parent = _current_span.get()
+        parent_id = parent.span_id if parent is not None and parent.trace_id == self.trace_id else None
+        return Span(name, self.trace_id, parent_id, attributes)
+
+    def end_span(self, span):
+        span.end()
+        with self._lock:
+            self.spans.append(span)
+        self.observe(f"{span.name}.seconds", span.duration)
+        if span.status == "error":
+            self.incr(f"{span.name}.errors")
+
+    @contextlib.contextmanager
+    def span(self, name, **attributes):
+        span = self.start_span(name, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.fail(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end_span(span)
+
+    def incr(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        if value is None:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def counter(self, name, **labels):
+        """Total of a counter across all label sets that include the given labels."""
+        wanted = set(_label_key(labels))
+        with self._lock:
+            return sum(v for (n, key), v in self.counters.items() if n == name and wanted <= set(key))
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "counters": {f"{n}{{{_format_labels(k)}}}" if k else n: v for (n, k), v in self.counters.items()},
+                "histograms": {
+                    f"{n}{{{_format_labels(k)}}}" if k else n: h.to_dict() for (n, k), h in self.histograms.items()
+                },
+            }
+
+    def summary_rows(self):
+        """One row per span name: calls, total/p50/p90/max seconds, tokens and errors, in first-seen order."""
+        with self._lock:
+            spans = list(self.spans)
+        rows = {}
+        for span in spans:
+            row = rows.setdefault(span.name, {"durations": [], "tokens": 0, "errors": 0})
+            row["durations"].append(span.duration or 0.0)
+            row["tokens"] += (span.attributes.get("prompt_tokens") or 0) + (span.attributes.get("completion_tokens") or 0)
+            row["errors"] += span.status == "error"
+        table = []
+        for name, row in rows.items():
+            durations = sorted(row["durations"])
+            table.append({
+                "Stage": name,
+                "Calls": len(durations),
+                "Total s": round(sum(durations), 2),
+                "p50 s": round(durations[len(durations) // 2], 2),
+                "p90 s": round(durations[min(len(durations) - 1, int(0.9 * len(durations)))], 2),
+                "Max s": round(durations[-1], 2),
+                "Tokens": row["tokens"],
+                "Errors": row["errors"],
+            })
+        return table
+
+    def summary_text(self):
+        rows = self.summary_rows()
+        if not rows:
+            return "No spans recorded."
+        headers = list(rows[0])
+        widths = [max(len(str(h)), *(len(str(r[h])) for r in rows)) for h in headers]
+        lines = ["  ".join(str(h).ljust(w) for h, w in zip(headers, widths))]
+        lines += ["  ".join(str(r[h]).ljust(w) for h, w in zip(headers, widths)) for r in rows]
+        return "\n".join(lines)
+
+    def to_dict(self):
+        with self._lock:
+            spans = [span.to_dict() for span in self.spans]
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "attributes": self.attributes,
+            "started_ns": self.started_ns,
+            "spans": spans,
+            **self.metrics(),
+        }
+
+    def finish(self):
+        """Export the run once; exporter failures are logged and never raised."""
+        if self.finished:
+            return
+        self.finished = True
+        for exporter in self.exporters:
+            try:
+                exporter.export(self)
+            except Exception as e:
+                logging.warning(f"Telemetry export via {type(exporter).__name__} failed: {e}")
+
+
+class ConsoleExporter:
+    """Logs the run-summary table and counters."""
+
+    def export(self, telemetry):
+        counters = ", ".join(f"{name}={value:g}" for name, value in sorted(telemetry.metrics()["counters"].items()))
+        logging.info(f"Run summary for {telemetry.name} {telemetry.attributes}:\n{telemetry.summary_text()}\n{counters}")
+
+
+class JsonFileExporter:
+    """Appends each finished run (spans and metrics) as one JSON line."""
+
+    def __init__(self, path=TELEMETRY_JSON_PATH):
+        self.path = path
+
+    def export(self, telemetry):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(telemetry.to_dict(), default=str) + "\n")
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes):
+    return [{"key": str(k), "value": _otlp_value(v)} for k, v in attributes.items() if v is not None]
+
+
+class OtlpExporter:
+    """Sends spans and metrics to an OpenTelemetry collector over OTLP/HTTP with JSON encoding."""
+
+    def __init__(self, endpoint=OTLP_ENDPOINT, service_name=SERVICE_NAME, timeout=5):
+        self.endpoint = endpoint.rstrip("/")
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def _post(self, path, payload):
+        request = urllib.request.Request(
+            f"{self.endpoint}{path}",
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+    def _resource(self, telemetry):
+        return {"attributes": _otlp_attributes(dict(telemetry.attributes, **{"service.name": self.service_name}))}
+
+    def export(self, telemetry):
+        scope = {"name": self.service_name}
+        with telemetry._lock:
+            spans = list(telemetry.spans)
+            counters = dict(telemetry.counters)
+            histograms = dict(telemetry.histograms)
+        otlp_spans = [
+            {
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                **({"parentSpanId": span.parent_id} if span.parent_id else {}),
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": _otlp_attributes(span.attributes),
+                "status": {"code": 2, "message": span.error or ""} if span.status == "error" else {"code": 1},
+            }
+            for span in spans
+        ]
+        self._post("/v1/traces", {
+            "resourceSpans": [{"resource": self._resource(telemetry), "scopeSpans": [{"scope": scope, "spans": otlp_spans}]}]
+        })
+
+        start, now = str(telemetry.started_ns), str(time.time_ns())
+        metrics = [
+            {
+                "name": name,
+                "sum": {
+                    "dataPoints": [{"attributes": _otlp_attributes(dict(key)), "asDouble": float(value),
+                                    "startTimeUnixNano": start, "timeUnixNano": now}],
+                    "aggregationTemporality": 1,
+                    "isMonotonic": True,
+                },
+            }
+            for (name, key), value in counters.items()
+        ]
+        metrics += [
+            {
+                "name": name,
+                "histogram": {
+                    "dataPoints": [{
+                        "attributes": _otlp_attributes(dict(key)),
+                        "count": str(h.count),
+                        "sum": h.total,
+                        "min": h.min,
+                        "max": h.max,
+                        "bucketCounts": [str(c) for c in h.bucket_counts],
+                        "explicitBounds": h.buckets,
+                        "startTimeUnixNano": start,
+                        "timeUnixNano": now,
+                    }],
+                    "aggregationTemporality": 1,
+                },
+            }
+            for (name, key), h in histograms.items()
+        ]
+        self._post("/v1/metrics", {
+            "resourceMetrics": [{"resource": self._resource(telemetry), "scopeMetrics": [{"scope": scope, "metrics": metrics}]}]
+        })
+
+
+EXPORTERS = {"console": ConsoleExporter, "json": JsonFileExporter, "otlp": OtlpExporter}
+
+
+def exporters_from_env(names=None):
+    """Exporter instances for a comma-separated list of names (TELEMETRY_EXPORTERS by default)."""
+    exporters = []
+    for name in (TELEMETRY_EXPORTERS if names is None else names).split(","):
+        name = name.strip().lower()
+        if not name or name == "none":
+            continue
+        if name not in EXPORTERS:
+            logging.warning(f"Unknown telemetry exporter '{name}' ignored")
+            continue
+        exporters.append(EXPORTERS[name]())
+    return exporters
+
+
+def bind_context(fn):
+    """Wrap fn so worker threads run it inside the caller's run (see run_context) and current span."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+
+def get_run_telemetry():
+    """Telemetry of the active run (see run_context); outside a run a sink without exporters."""
+    return current_run().telemetry
+
+
+def span(name, **attributes):
+    """Context manager timing an operation as a span of the active run."""
+    return get_run_telemetry().span(name, **attributes)
+
+
+def incr(name, value=1, **labels):
+    get_run_telemetry().incr(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    get_run_telemetry().observe(name, value, **labels)
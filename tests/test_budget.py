@@ -0,0 +1,14 @@
+from budget import BUDGET_TOKENS_PER_STEP, RunBudget
+
+
+def test_plan_is_cut_to_the_steps_the_budget_affords():
+    budget = RunBudget(token_budget=3 * BUDGET_TOKENS_PER_STEP)
+    steps = [
+        {"text": "cheap", "estimated_cost": "low"},
+        {"text": "costly", "estimated_cost": "high"},
+        {"text": "medium", "estimated_cost": "medium"},
+    ]
+    assert [step["text"] for step in budget.affordable_steps(steps)] == ["cheap", "costly"]
+    budget.record(3 * BUDGET_TOKENS_PER_STEP, 0)
+    assert [step["text"] for step in budget.affordable_steps(steps)] == ["cheap"]
+    assert RunBudget(token_budget=0).affordable_steps(steps) == steps
@@ -0,0 +1,144 @@
+import json
+import os
+
+import pytest
+
+from sources import SourceRegistry
+from sources.edgar import (
+    COMPANY_FACTS_URL, SUBMISSIONS_URL, TICKERS_URL, DiskCache, EdgarAdapter, TickerIndex, compact_company_facts,
+    compact_submissions,
+)
+from sources.registry import _background
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "edgar")
+APPLE_CIK = 320193
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = TickerIndex(path=str(tmp_path / "tickers.sqlite"))
+    index.load(fixture("company_tickers.json"))
+    return index
+
+
+@pytest.mark.parametrize("query, ticker", [
+    ("AAPL", "AAPL"),
+    ("320193", "AAPL"),
+    ("brk.b", "BRK-B"),
+    ("Apple Inc.", "AAPL"),
+    ("apple hospitality reit", "APLE"),
+    ("Tesla, Inc. 10-K risk factors", "TSLA"),
+    ("Microsoft cloud revenue", "MSFT"),
+    ("latest filings for NVDA and AMD", "NVDA"),
+])
+def test_ticker_index_resolves_queries(index, query, ticker):
+    assert index.resolve(query)["ticker"] == ticker
+
+
+def test_ticker_index_misses_and_staleness(tmp_path, index):
+    assert index.resolve("ai chips") is None
+    assert not index.is_stale()
+    assert TickerIndex(path=str(tmp_path / "empty.sqlite")).is_stale()
+    # The index persists across instances, as it does across sessions and processes
+    assert TickerIndex(path=index.path).resolve("MSFT")["cik"] == 789019
+
+
+def test_disk_cache_round_trip_and_expiry(tmp_path):
+    cache = DiskCache(directory=str(tmp_path))
+    cache.put("facts-1", {"Revenue": 1})
+    assert cache.get("facts-1") == {"Revenue": 1}
+    assert cache.get("facts-2") is None
+    assert os.listdir(tmp_path) == ["facts-1.json"]
+    assert DiskCache(directory=str(tmp_path), ttl=-1).get("facts-1") is None
+
+
+def test_compact_submissions_keeps_recent_key_filings():
+    compact = compact_submissions(fixture(f"submissions_CIK{APPLE_CIK:010d}.json"), max_filings=3)
+    assert compact["name"] == "Apple Inc."
+    assert compact["sic"] == "Electronic Computers"
+    assert [filing["form"] for filing in compact["filings"]] == ["10-K", "10-Q", "10-Q"]
+    assert compact["filings"][0] == {
+        "form": "10-K",
+        "filed": "2024-11-01",
+        "period": "2024-09-28",
+        "description": "10-K",
+        "url": "https://www.sec.gov/Archives/edgar/data/320193/000032019324000123/aapl-20240928.htm",
+    }
+
+
+def test_compact_company_facts_picks_latest_annual_values():
+    facts = compact_company_facts(fixture(f"companyfacts_CIK{APPLE_CIK:010d}.json"))
+    assert facts["Revenue"]["value"] == 391035000000
+    assert facts["Revenue"]["concept"] == "RevenueFromContractWithCustomerExcludingAssessedTax"
+    assert facts["Net income"]["end"] == "2024-09-28"
+    assert facts["Diluted EPS"]["value"] == 6.08
+    assert facts["Shares outstanding"]["value"] == 15115823000
+    assert "Total assets" not in facts
+
+
+class FixtureResponse:
+    def __init__(self, body):
+        self.status = 200 if body is not None else 404
+        self.body = body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    async def json(self, content_type=None):
+        return self.body
+
+
+class FixtureSession:
+    """Serves the EDGAR fixtures by URL and 404s anything else."""
+
+    closed = False
+
+    def __init__(self):
+        self.urls = []
+        self.routes = {
+            TICKERS_URL: "company_tickers.json",
+            SUBMISSIONS_URL.format(cik=APPLE_CIK): f"submissions_CIK{APPLE_CIK:010d}.json",
+            COMPANY_FACTS_URL.format(cik=APPLE_CIK): f"companyfacts_CIK{APPLE_CIK:010d}.json",
+        }
+
+    def get(self, url, headers=None):
+        self.urls.append(url)
+        return FixtureResponse(fixture(self.routes[url]) if url in self.routes else None)
+
+
+def test_edgar_adapter_end_to_end(tmp_path, monkeypatch):
+    session = FixtureSession()
+    monkeypatch.setattr(_background, "_session", session)
+    registry = SourceRegistry()
+    registry.register(EdgarAdapter(
+        index=TickerIndex(path=str(tmp_path / "tickers.sqlite")), cache=DiskCache(directory=str(tmp_path / "cache"))
+    ))
+
+    records = registry.fetch("sec", "Apple annual report")
+    company, filing = records[0][0], records[1][0]
+    assert company.startswith("[SEC Company] Apple Inc. (AAPL, CIK 320193)")
+    assert "Revenue: $391.04B (period ending 2024-09-28, 10-K)" in company
+    assert filing.startswith("[SEC Filing 1] Apple Inc. 10-K filed 2024-11-01 for period 2024-09-28")
+    # Five key filings; the Form 4 is left out
+    assert len(records) == 1 + 5
+    assert len(session.urls) == 3
+
+    # A second adapter (another process) reuses the ticker index and compacted documents on disk
+    registry.register(EdgarAdapter(
+        index=TickerIndex(path=str(tmp_path / "tickers.sqlite")), cache=DiskCache(directory=str(tmp_path / "cache"))
+    ))
+    assert registry.fetch("sec", "AAPL")[0][0] == company
+    assert len(session.urls) == 3
+
+    assert registry.fetch("sec", "no such company")[0][0] == "SEC API: No filings found for 'no such company'."
@@ -0,0 +1,96 @@
+import threading
+
+import pytest
+
+import engine
+from run_context import RunContext
+
+
+@pytest.fixture(autouse=True)
+def no_replanning(monkeypatch):
+    # The replanner is an LLM call; here the plan stays as it is
+    monkeypatch.setattr(engine, "replanner", lambda results, steps, rounds, *args, **kwargs: (steps, rounds + 1, False))
+
+
+def echo_step(step, context, prefetcher=None, token=None):
+    return f"result of {step}"
+
+
+def test_execute_plan_runs_every_step_in_batches():
+    steps = [f"step {i}" for i in range(7)]
+    seen = []
+    _, completed, context, stop_reason = engine.execute_plan(
+        "query", steps, RunContext(), echo_step, on_step=lambda step, result, done, context: seen.append(len(done)),
+    )
+    assert stop_reason is None
+    assert sorted(completed) == [(step, f"result of {step}") for step in steps]
+    assert seen == list(range(1, 8))
+    assert context.count("Step: ") == 7
+
+
+def test_execute_plan_resumes_after_completed_steps():
+    steps = ["a", "b", "c", "d"]
+    _, completed, _, _ = engine.execute_plan("query", steps, RunContext(), echo_step, completed_steps=[("a", "done")])
+    assert completed[0] == ("a", "done")
+    assert sorted(step for step, _ in completed[1:]) == ["b", "c", "d"]
+
+
+def test_steps_run_after_the_steps_they_depend_on():
+    steps = ["survey", "papers", "compare", "news"]
+    run = RunContext(steps={
+        "survey": {"id": 1, "depends_on": []},
+        "papers": {"id": 2, "depends_on": []},
+        "compare": {"id": 3, "depends_on": [1, 2]},
+        "news": {"id": 4, "depends_on": [9]},
+    })
+    batches = [[]]
+    engine.execute_plan(
+        "query", steps, run, echo_step, batch_size=3,
+        on_step=lambda step, result, done, context: batches[-1].append(step),
+        on_replan=lambda steps, new_steps: batches.append([]),
+    )
+    # The unknown dependency of "news" is ignored; "compare" waits for the batch holding steps 1 and 2
+    assert [sorted(batch) for batch in batches if batch] == [["news", "papers", "survey"], ["compare"]]
+
+
+def test_next_batch_runs_a_blocked_step_rather_than_stalling():
+    details = {"a": {"id": 1, "depends_on": [2]}, "b": {"id": 2, "depends_on": [1]}}
+    assert engine.next_batch(["a", "b"], set(), details) == ["a"]
+    assert engine.next_batch(["a", "b"], {"a"}, details) == ["b"]
+
+
+def test_execute_plan_stops_when_asked_or_out_of_budget():
+    steps = [f"step {i}" for i in range(9)]
+    batches = []
+    _, completed, _, stop_reason = engine.execute_plan(
+        "query", steps, RunContext(), echo_step, should_stop=lambda: len(batches) == 1,
+        on_replan=lambda steps, new_steps: batches.append(steps),
+    )
+    assert (len(completed), stop_reason) == (3, "stop requested")
+
+    run = RunContext()
+    run.budget.token_budget = 100
+    run.budget.record(100, 0)
+    assert engine.execute_plan("query", steps, run, echo_step)[1:] == ([], "", "budget")
+
+
+def test_concurrent_jobs_keep_their_own_state():
+    runs = [RunContext(), RunContext()]
+    results = {}
+
+    def job(i):
+        def step(step, context, prefetcher=None, token=None):
+            from dedup import get_run_index
+
+            assert get_run_index() is runs[i].dedup_index
+            return f"job {i}"
+
+        results[i] = engine.execute_plan("query", ["x", "y", "z"], runs[i], step)[1]
+
+    threads = [threading.Thread(target=job, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert {result for _, result in results[0]} == {"job 0"}
+    assert {result for _, result in results[1]} == {"job 1"}
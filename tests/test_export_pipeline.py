@@ -0,0 +1,36 @@
+import io
+import json
+
+import pytest
+
+from export_pipeline import ExportPipeline, _markdown_to_html_body
+
+INJECTED = "Findings <script>alert(1)</script>\n\n<img src=x onerror=alert(2)>\n"
+
+
+def test_html_export_escapes_raw_html():
+    pytest.importorskip("markdown_it")
+    body = _markdown_to_html_body(INJECTED)
+    assert "<script>" not in body and "<img" not in body
+    assert "&lt;script&gt;alert(1)&lt;/script&gt;" in body
+
+
+def test_json_exports_of_one_report_keep_their_own_bundles(tmp_path):
+    pipeline = ExportPipeline(export_dir=str(tmp_path))
+    bundles = [{"query": "tenant a", "steps": []}, {"query": "tenant b", "steps": []}]
+    paths = [pipeline.request("json", "Same report", bundle).result() for bundle in bundles]
+    for path, bundle in zip(paths, bundles):
+        with open(path, encoding="utf-8") as f:
+            assert json.load(f)["query"] == bundle["query"]
+    assert pipeline.path("json", "Same report", bundles[1]) == paths[1] != paths[0]
+    assert pipeline.status("json", "Same report", {"query": "tenant c"}) == "missing"
+
+
+def test_docx_export_keeps_raw_html_as_text():
+    pytest.importorskip("markdown_it")
+    docx = pytest.importorskip("docx")
+    from docx_exporter import markdown_to_docx
+
+    text = "\n".join(p.text for p in docx.Document(io.BytesIO(markdown_to_docx(INJECTED))).paragraphs)
+    assert "<script>alert(1)</script>" in text
+    assert "<img src=x onerror=alert(2)>" in text
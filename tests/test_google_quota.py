@@ -0,0 +1,86 @@
+import asyncio
+import multiprocessing
+
+import sources.google
+from sources.google import GoogleAdapter, QuotaLedger
+
+
+class PageResponse:
+    def __init__(self, status, items):
+        self.status = status
+        self.items = items
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise RuntimeError(f"HTTP {self.status}")
+
+    async def json(self, content_type=None):
+        return {"items": self.items}
+
+
+class PagedSession:
+    """Serves Custom Search result pages by start index; pages in failing answer with HTTP 500."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+
+    def get(self, url, params=None, **kwargs):
+        start = params["start"]
+        item = {"title": f"Result {start}", "displayLink": "example.com", "link": f"https://example.com/{start}"}
+        return PageResponse(500 if start in self.failing else 200, [item])
+
+
+def charge_until_refused(path, results):
+    ledger = QuotaLedger(path=path, daily_quota=60, reserve=0)
+    charged = 0
+    for _ in range(40):
+        charged += ledger.charge(1, limit=ledger.daily_quota)
+    results.put(charged)
+
+
+def test_charges_from_several_processes_never_overspend(tmp_path):
+    path = str(tmp_path / "quota.sqlite")
+    QuotaLedger(path=path)
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    workers = [context.Process(target=charge_until_refused, args=(path, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    charged = sum(results.get(timeout=60) for _ in workers)
+    for worker in workers:
+        worker.join()
+    assert charged == 60
+    assert QuotaLedger(path=path, daily_quota=60).used() == 60
+
+
+def test_ledger_is_opened_on_first_search(tmp_path, monkeypatch):
+    path = tmp_path / "missing" / "dir" / "quota.sqlite"
+    monkeypatch.setattr(sources.google, "_quota_ledger", None)
+    monkeypatch.setattr(sources.google, "GOOGLE_QUOTA_PATH", str(path))
+    adapter = GoogleAdapter(results=10)
+    assert not path.parent.exists()
+    asyncio.run(adapter.fetch(PagedSession(), "query"))
+    assert path.exists()
+    assert adapter.ledger.used() == 1
+
+
+def test_pages_that_arrive_are_kept_when_others_fail(tmp_path):
+    adapter = GoogleAdapter(results=30, ledger=QuotaLedger(path=str(tmp_path / "quota.sqlite")))
+    items = asyncio.run(adapter.fetch(PagedSession(failing={11}), "query"))
+    assert [item["title"] for item in items] == ["Result 1", "Result 21"]
+    assert adapter.ledger.used() == 3
+
+
+def test_charge_is_capped_by_limit(tmp_path):
+    ledger = QuotaLedger(path=str(tmp_path / "quota.sqlite"), daily_quota=10, reserve=2)
+    assert ledger.charge(5, limit=8) == 5
+    assert ledger.charge(5, limit=8) == 3
+    assert ledger.charge(1, limit=8) == 0
+    assert ledger.available() == 0
+    assert ledger.remaining() == 2
@@ -0,0 +1,58 @@
+import pytest
+
+from sources import FakeSourceAdapter, McpSourceAdapter, SourceRegistry
+from sources.registry import _background
+
+
+class FakeResponse:
+    def __init__(self, status, body):
+        self.status = status
+        self.body = body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise RuntimeError(f"HTTP {self.status}")
+
+    async def json(self, content_type=None):
+        return self.body
+
+
+class FakeSession:
+    """Answers every POST with the next (status, body) pair; the last one repeats."""
+
+    closed = False
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.posts = 0
+
+    def post(self, url, **kwargs):
+        self.posts += 1
+        status, body = self.responses[0] if len(self.responses) == 1 else self.responses.pop(0)
+        return FakeResponse(status, body)
+
+
+@pytest.fixture
+def mcp_registry():
+    registry = SourceRegistry()
+    registry.register(McpSourceAdapter(FakeSourceAdapter("google")))
+    return registry
+
+
+@pytest.mark.parametrize("failure", [(503, {"detail": "overloaded"}), (200, {"error": {"message": "quota"}})])
+def test_failed_mcp_call_is_not_cached(mcp_registry, monkeypatch, failure):
+    session = FakeSession(failure, (200, {"result": ["[Google Result 1] Recovered"]}))
+    monkeypatch.setattr(_background, "_session", session)
+
+    [(error, url)] = mcp_registry.fetch("google", "query")
+    assert error.startswith("[MCP] google Error:") and url is None
+
+    assert mcp_registry.fetch("google", "query") == [("[Google Result 1] Recovered", None)]
+    assert mcp_registry.fetch("google", "query") == [("[Google Result 1] Recovered", None)]
+    assert session.posts == 2
@@ -0,0 +1,59 @@
+import logging
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import config
+from cancellation import CancelToken, RunCancelled
+from model_router import TASK_PROFILES, ModelRouter
+
+
+class SlowClient:
+    """Chat client whose calls block until released, returning a response that records being closed."""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=self)
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.closed = threading.Event()
+
+    def create(self, model, messages, **kwargs):
+        self.started.set()
+        self.release.wait(10)
+        return SimpleNamespace(model=model, usage=None, choices=[], close=self.closed.set)
+
+
+def test_default_deployments_give_every_task_a_fallback(caplog):
+    with caplog.at_level(logging.WARNING):
+        router = ModelRouter(log_path="")
+    for task, profile in TASK_PROFILES.items():
+        order = router.candidates(task, 1000)
+        assert order[0] == profile["default"]
+        assert len(order) >= 2
+    assert not caplog.records
+
+
+def test_missing_fallback_is_reported(caplog):
+    with caplog.at_level(logging.WARNING):
+        router = ModelRouter(deployments=["gpt-4.1", "model-router"], log_path="")
+    warned = {task for task in TASK_PROFILES if any(f"serve {task} calls" in r.message for r in caplog.records)}
+    assert warned == {"planner", "executor", "outliner"}
+    assert router.candidates("planner", 1000) == ["gpt-4.1"]
+
+
+def test_cancel_interrupts_a_call_in_flight(monkeypatch):
+    client = SlowClient()
+    monkeypatch.setattr(config, "_client", client)
+    token = CancelToken()
+    threading.Thread(target=lambda: client.started.wait(5) and token.cancel("superseded"), daemon=True).start()
+
+    start = time.perf_counter()
+    with pytest.raises(RunCancelled, match="superseded"):
+        ModelRouter(log_path="").chat_completion("writer", [{"role": "user", "content": "report"}], token=token)
+    assert time.perf_counter() - start < 2
+    # The abandoned response is closed once it arrives
+    assert not client.closed.is_set()
+    client.release.set()
+    assert client.closed.wait(5)
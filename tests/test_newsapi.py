@@ -0,0 +1,41 @@
+import asyncio
+import threading
+
+import sources.newsapi
+from sources.newsapi import NewsApiAdapter
+
+
+class RecordingStore:
+    """ArticleStore stand-in that notes which thread each call runs on."""
+
+    def __init__(self):
+        self.threads = []
+
+    def cursor(self, query):
+        self.threads.append(threading.current_thread())
+        return None
+
+    def add(self, query, articles):
+        self.threads.append(threading.current_thread())
+        return len(articles)
+
+    def articles(self, query, limit):
+        self.threads.append(threading.current_thread())
+        return []
+
+
+def test_store_calls_stay_off_the_source_loop(monkeypatch):
+    async def fetch_articles(session, query, **kwargs):
+        return [{"url": "https://news.example.com/1", "title": "Story"}]
+
+    monkeypatch.setattr(sources.newsapi, "fetch_articles", fetch_articles)
+    store = RecordingStore()
+    loop_thread = []
+
+    async def fetch():
+        loop_thread.append(threading.current_thread())
+        return await NewsApiAdapter(store=store).fetch(None, "query")
+
+    assert asyncio.run(fetch()) == []
+    assert len(store.threads) == 3
+    assert loop_thread[0] not in store.threads
@@ -0,0 +1,36 @@
+from dedup import estimate_tokens
+from passage_ranker import chunk_markdown, select_passages
+
+
+def long_list(items=300):
+    lines = [f"- Item {i}: generic filler about shipping schedules and warehouse logistics" for i in range(items)]
+    lines[150] = "- Item 150: solid-state battery cells reach 500 Wh/kg in pilot production"
+    return "## Inventory\n" + "\n".join(lines)
+
+
+def test_block_without_blank_lines_is_split_on_lines():
+    chunks = chunk_markdown(long_list(), max_tokens=200)
+    assert len(chunks) > 1
+    # Chunk size allows for the repeated heading line
+    assert all(estimate_tokens(chunk) <= 200 + estimate_tokens("## Inventory\n") for chunk in chunks)
+    assert all(chunk.startswith("## Inventory") for chunk in chunks)
+
+
+def test_long_paragraph_is_split_on_sentences():
+    paragraph = " ".join(f"Sentence number {i} talks about nothing in particular." for i in range(200))
+    chunks = chunk_markdown(paragraph, max_tokens=100)
+    assert len(chunks) > 1
+    assert all(chunk.endswith(".") for chunk in chunks)
+
+
+def test_select_passages_finds_relevant_line_in_long_list():
+    selected = select_passages(long_list(), "solid-state battery Wh/kg", token_budget=300)
+    assert "solid-state battery cells" in selected
+    assert estimate_tokens(selected) <= 300
+
+
+def test_select_passages_falls_back_to_truncated_top_chunk():
+    code = "```\n" + "x" * 20000 + "\n```"
+    selected = select_passages(code, "anything", token_budget=50)
+    assert selected
+    assert estimate_tokens(selected) <= 50
@@ -0,0 +1,17 @@
+import report_cache
+from citations import CitationIndex
+from report_cache import ReportCache
+
+
+def test_lookup_only_offers_runs_of_the_same_mode(tmp_path, monkeypatch):
+    monkeypatch.setattr(report_cache, "EMBEDDING_DEPLOYMENT", "")
+    cache = ReportCache(path=str(tmp_path / "reports.sqlite"))
+    cache.store("Solid-state battery outlook", "bfs", "BFS report", [("bfs step", "result")], CitationIndex())
+
+    assert cache.lookup("solid-state battery outlook", "dfs") is None
+    entry = cache.lookup("solid-state battery outlook", "bfs")
+    assert (entry["mode"], entry["report"], entry["completed_steps"]) == ("bfs", "BFS report", [("bfs step", "result")])
+
+    cache.store("Solid-state battery outlook", "dfs", "DFS report", [("dfs step", "result")], CitationIndex())
+    assert cache.lookup("solid-state battery outlook", "dfs")["report"] == "DFS report"
+    assert cache.lookup("solid-state battery outlook", "bfs")["report"] == "BFS report"
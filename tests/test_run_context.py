@@ -0,0 +1,125 @@
+import concurrent.futures
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import config
+import model_router
+from cancellation import RunCancelled, get_run_token
+from citations import get_citation_index, novel_cited
+from run_context import RunContext, current_run, use_run
+from telemetry import bind_context
+
+
+def search_results(run_name, count):
+    return [f"[Google Result {i}] {run_name} page {i}\nURL: https://{run_name}.example.com/{i}" for i in range(count)]
+
+
+def test_overlapping_runs_number_citations_independently():
+    runs = {"alpha": RunContext(), "beta": RunContext()}
+    barrier = threading.Barrier(len(runs))
+    cited = {}
+
+    def research(name):
+        with use_run(runs[name]):
+            cited[name] = []
+            for result in search_results(name, 5):
+                # Both runs register a source before either registers the next one
+                barrier.wait(timeout=5)
+                cited[name] += novel_cited([result])
+
+    threads = [threading.Thread(target=research, args=(name,)) for name in runs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for name, run in runs.items():
+        assert [text.split("]")[0] + "]" for text in cited[name]] == ["[S1]", "[S2]", "[S3]", "[S4]", "[S5]"]
+        assert all(name in entry["url"] for entry in run.citation_index.sources.values())
+        assert len(run.citation_index.sources) == 5
+
+
+class FakeClient:
+    """Chat client whose usage is the number of words in the last message, for prompt and completion alike."""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, model, messages, **kwargs):
+        words = len(messages[-1]["content"].split())
+        return SimpleNamespace(
+            model=model,
+            usage=SimpleNamespace(prompt_tokens=words, completion_tokens=words),
+            choices=[SimpleNamespace(message=SimpleNamespace(content="ok", function_call=None))],
+        )
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    monkeypatch.setattr(model_router.router, "log_path", "")
+    monkeypatch.setattr(config, "_client", FakeClient())
+
+
+def run_in_parallel(runs, work):
+    """Run work(name) for every run on its own thread with that run active, starting them together."""
+    barrier = threading.Barrier(len(runs))
+
+    def target(name):
+        with use_run(runs[name]):
+            barrier.wait(timeout=5)
+            work(name)
+
+    threads = [threading.Thread(target=target, args=(name,)) for name in runs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_overlapping_runs_charge_their_own_budget(fake_llm):
+    runs = {"short": RunContext(), "long": RunContext()}
+    prompts = {"short": "one two", "long": "one two three four five six"}
+
+    def research(name):
+        for _ in range(3):
+            model_router.chat_completion("writer", [{"role": "user", "content": prompts[name]}])
+
+    run_in_parallel(runs, research)
+
+    assert runs["short"].budget.tokens == 3 * 2 * 2
+    assert runs["long"].budget.tokens == 3 * 2 * 6
+    assert runs["short"].budget.calls == runs["long"].budget.calls == 3
+
+
+def test_cancelling_one_run_leaves_the_other_running(fake_llm):
+    runs = {"cancelled": RunContext(), "running": RunContext()}
+    runs["cancelled"].token.cancel("stop requested")
+    outcomes = {}
+
+    def research(name):
+        # Step executors run on worker threads and pick up the run's token from there
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            assert executor.submit(bind_context(get_run_token)).result() is runs[name].token
+            future = executor.submit(
+                bind_context(model_router.chat_completion), "executor", [{"role": "user", "content": "step"}]
+            )
+        try:
+            outcomes[name] = future.result().choices[0].message.content
+        except RunCancelled as e:
+            outcomes[name] = str(e)
+
+    run_in_parallel(runs, research)
+
+    assert outcomes == {"cancelled": "stop requested", "running": "ok"}
+    assert not runs["running"].token.cancelled()
+
+
+def test_use_run_restores_previous_run():
+    outer, inner = RunContext(), RunContext()
+    with use_run(outer):
+        with use_run(inner):
+            assert get_citation_index() is inner.citation_index
+        assert current_run() is outer
+    assert current_run() not in (outer, inner)
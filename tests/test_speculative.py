@@ -0,0 +1,43 @@
+from run_context import RunContext, use_run
+from sources import FakeSourceAdapter, SourceRegistry
+from speculative import SpeculativePrefetcher
+
+
+def google_registry():
+    registry = SourceRegistry()
+    registry.register(FakeSourceAdapter("google", responses={
+        step: [(f"[Google Result 1] Findings for {step}", f"https://example.com/{step.replace(' ', '-')}")]
+        for step in ("used step", "wasted step")
+    }))
+    return registry
+
+
+def test_prefetch_searches_the_hinted_source():
+    registry = google_registry()
+    registry.register(FakeSourceAdapter("arxiv", responses={"paper step": [("Paper findings", "https://arxiv.org/abs/1")]}))
+    with use_run(RunContext()):
+        prefetcher = SpeculativePrefetcher(registry)
+        prefetcher.submit("paper step", source_hints=["sec", "arxiv"])
+        prefetcher.submit("used step", source_hints=["sec"])
+        assert "Paper findings" in prefetcher.take("paper step")
+        assert prefetcher.function_name("paper step") == registry.get("arxiv").function_name
+        assert prefetcher.function_name("used step") == registry.get("google").function_name
+        prefetcher.close()
+    assert registry.get("arxiv").calls == ["paper step"]
+
+
+def test_prefetch_is_cited_only_when_taken():
+    registry = google_registry()
+    run = RunContext()
+    with use_run(run):
+        prefetcher = SpeculativePrefetcher(registry)
+        prefetcher.submit("used step")
+        prefetcher.submit("wasted step")
+        assert prefetcher.take("used step") == "[S1] Findings for used step"
+        # The unused prefetch has registered nothing with the run
+        assert list(run.citation_index.sources) == ["S1"]
+        # but a later search for the step is served by it instead of fetching again
+        assert registry.search("google", "wasted step") == "[S2] Findings for wasted step"
+        prefetcher.close()
+    assert registry.get("google").calls.count("wasted step") == 1
+    assert prefetcher.report() == {"submitted": 2, "used": 1, "wasted": 1}
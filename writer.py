@@ -1,5 +1,52 @@
-from config import client
+from budget import get_run_budget
+from cancellation import get_run_token
+from model_router import chat_completion
+from citations import get_citation_index
+from dedup import estimate_tokens
+from telemetry import bind_context, span
+from dotenv import load_dotenv
+import concurrent.futures
+import json
 import logging
+import os
+import time
+
+load_dotenv()
+
+# Contexts larger than this go through the map-reduce writer
+MAP_REDUCE_THRESHOLD_TOKENS = int(os.getenv("MAP_REDUCE_THRESHOLD_TOKENS", "30000"))
+# Input-token budget per map-reduce stage and number of concurrent LLM calls
+REPORT_TOKEN_BUDGET = int(os.getenv("REPORT_TOKEN_BUDGET", "60000"))
+REPORT_MAX_WORKERS = int(os.getenv("REPORT_MAX_WORKERS", "4"))
+# With less time than this left before the run deadline, the report is written in one pass
+REPORT_SINGLE_PASS_SECONDS = float(os.getenv("REPORT_SINGLE_PASS_SECONDS", "90"))
+
+OUTLINE_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "report_outline",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "sections": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "title": {"type": "string"},
+                            "note_ids": {"type": "array", "items": {"type": "integer"}},
+                        },
+                        "required": ["title", "note_ids"],
+                        "additionalProperties": False,
+                    },
+                }
+            },
+            "required": ["sections"],
+            "additionalProperties": False,
+        },
+    },
+}
 
 
 def report_writer(context):
@@ -9,13 +56,12 @@ def report_writer(context):
         "As an autonomous research agent, write a highly detailed, exhaustive, and well-structured research report that answers the original query. "
         "Include attribution to all sources referenced or used in any step. "
         "Ensure that every piece of information, even if only slightly related to the research topic, is included and clearly explained. "
-        "Organize the report with clear sections, provide in-depth analysis, and cite all sources explicitly. "
-        "If possible, include a bibliography or references section at the end listing all sources."
-        "Also mention the numerical count of total number of resources used in the report, including web pages, papers, and articles."
+        "Organize the report with clear sections, provide in-depth analysis, and cite all sources inline with their [S#] IDs. "
+        "Do not write a bibliography or count the resources used; the references section is added automatically from the cited IDs."
     )
-    report_response = client.chat.completions.create(
-        model="model-router",
-        messages=[
+    report_response = chat_completion(
+        "writer",
+        [
             {
                 "role": "system",
                 "content": "You are a research report writing assistant.",
@@ -26,22 +72,190 @@ def report_writer(context):
     model_name = getattr(report_response, 'model', None)
     if model_name:
         logging.info(f"Report generated using model: {model_name}")
-    return report_response.choices[0].message.content
+    report = report_response.choices[0].message.content
+    return f"{report}\n\n{get_citation_index().bibliography(report)}"
+
+
+def _message_text(response, label):
+    model_name = getattr(response, 'model', None)
+    if model_name:
+        logging.info(f"{label} used model: {model_name}")
+    return response.choices[0].message.content or ""
+
+
+def _truncate_to_tokens(text, max_tokens):
+    return text if estimate_tokens(text) <= max_tokens else text[: max_tokens * 4] + "\n[...truncated]"
+
+
+def summarize_step(step, result, max_input_tokens):
+    """Map: condense one step's result into section notes that keep every fact, number and source ID."""
+    prompt = (
+        f"Research step: {step}\n\nResult:\n{_truncate_to_tokens(result, max_input_tokens)}\n\n"
+        "Write dense research notes from this result for use in a report section. "
+        "Keep every fact, figure, date and named entity, each with the [S#] source IDs it is attributed to; "
+        "drop repetition and boilerplate."
+    )
+    response = chat_completion(
+        "summarizer",
+        [
+            {"role": "system", "content": "You are a research note-taking assistant."},
+            {"role": "user", "content": prompt},
+        ],
+    )
+    return _message_text(response, "Step summary")
+
+
+def build_outline(query, notes):
+    """Cluster step notes into report sections, returning [{"title", "note_ids"}]."""
+    digest = "\n".join(f"[{i}] {step}: {note[:300]}" for i, (step, note) in enumerate(notes))
+    prompt = (
+        f"Research query: {query}\n\nResearch notes (id, step and opening lines):\n{digest}\n\n"
+        "Group these notes into the sections of a well-structured research report that answers the query. "
+        "Give each section a title and the ids of the notes it should draw on. Every note id must be used at least once."
+    )
+    response = chat_completion(
+        "outliner",
+        [
+            {"role": "system", "content": "You are a research report outlining assistant."},
+            {"role": "user", "content": prompt},
+        ],
+        response_format=OUTLINE_RESPONSE_FORMAT,
+    )
+    try:
+        sections = json.loads(_message_text(response, "Outline")).get("sections", [])
+    except json.JSONDecodeError as e:
+        logging.error(f"Could not parse report outline: {e}")
+        sections = []
+    valid = [
+        {"title": s["title"], "note_ids": [i for i in s.get("note_ids", []) if 0 <= i < len(notes)]}
+        for s in sections
+        if s.get("title")
+    ]
+    valid = [s for s in valid if s["note_ids"]]
+    used = {i for s in valid for i in s["note_ids"]}
+    leftover = [i for i in range(len(notes)) if i not in used]
+    if leftover:
+        valid.append({"title": "Additional Findings", "note_ids": leftover})
+    return valid
+
+
+def write_section(query, title, section_notes, max_input_tokens):
+    """Write one report section from its notes."""
+    material = _truncate_to_tokens("\n\n".join(section_notes), max_input_tokens)
+    prompt = (
+        f"Research query: {query}\n\nSection title: {title}\n\nNotes:\n{material}\n\n"
+        "Write this section of the research report in Markdown, starting with a '## ' heading. "
+        "Be detailed and analytical, include every relevant fact from the notes and keep their [S#] source IDs inline. "
+        "Do not write an introduction, conclusion or reference list."
+    )
+    response = chat_completion(
+        "writer",
+        [
+            {"role": "system", "content": "You are a research report writing assistant."},
+            {"role": "user", "content": prompt},
+        ],
+    )
+    return _message_text(response, f"Section '{title}'")
+
+
+def map_reduce_report_writer(query, completed_steps, token_budget=REPORT_TOKEN_BUDGET, max_workers=REPORT_MAX_WORKERS):
+    """Hierarchical report generation for large contexts: summarize steps (map), outline, write sections
+    concurrently, then stitch them with a merged bibliography. token_budget bounds the input tokens of each stage."""
+    start = time.perf_counter()
+    completed_steps = [(step, result) for step, result in completed_steps if result]
+    if not completed_steps:
+        return report_writer(f"Original query: {query}\n")
+    per_step_budget = max(500, token_budget // len(completed_steps))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        summaries = list(executor.map(bind_context(lambda sr: summarize_step(sr[0], sr[1], per_step_budget)), completed_steps))
+    notes = [(step, summary) for (step, _), summary in zip(completed_steps, summaries)]
+    map_done = time.perf_counter()
+
+    outline = build_outline(query, notes)
+    per_section_budget = max(1000, token_budget // max(1, len(outline)))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        sections = list(executor.map(
+            bind_context(lambda s: write_section(query, s["title"], [notes[i][1] for i in s["note_ids"]], per_section_budget)),
+            outline,
+        ))
+    sections_done = time.perf_counter()
+
+    headings = "\n".join(f"- {s['title']}" for s in outline)
+    stitch_prompt = (
+        f"Research query: {query}\n\nReport sections:\n{headings}\n\n"
+        f"Section openings:\n" + "\n\n".join(_truncate_to_tokens(s, 200) for s in sections) + "\n\n"
+        "Write a Markdown title line ('# ...'), an executive summary ('## Executive Summary') and a conclusion "
+        "('## Conclusion') for this report. Separate the conclusion from the rest with a line containing only '<<<SECTIONS>>>'."
+    )
+    response = chat_completion(
+        "writer",
+        [
+            {"role": "system", "content": "You are a research report writing assistant."},
+            {"role": "user", "content": stitch_prompt},
+        ],
+    )
+    head, _, conclusion = _message_text(response, "Report stitching").partition("<<<SECTIONS>>>")
+    body = "\n\n".join(part.strip() for part in [head, *sections, conclusion] if part.strip())
+    report = f"{body}\n\n{get_citation_index().bibliography(body)}"
+    end = time.perf_counter()
+    logging.info(
+        f"Map-reduce report: {len(notes)} notes, {len(outline)} sections in {end - start:.1f}s "
+        f"(map {map_done - start:.1f}s, sections {sections_done - map_done:.1f}s, stitch {end - sections_done:.1f}s)"
+    )
+    return report
+
+
+def compact_context(completed_steps, max_tokens):
+    """Rebuild the step context with every result cut to an equal share of max_tokens."""
+    per_step = max(200, max_tokens // max(1, len(completed_steps)))
+    return "".join(f"\nStep: {step}\nResult: {_truncate_to_tokens(result or '', per_step)}\n" for step, result in completed_steps)
+
+
+def write_report(query, completed_steps, context):
+    """Use the single-shot writer for small contexts and the map-reduce writer above MAP_REDUCE_THRESHOLD_TOKENS.
+
+    Once the run budget reaches its last degradation stage, or the run deadline is close, the report is always
+    written in one pass, from a context trimmed to fit what is left of the budget.
+    """
+    start = time.perf_counter()
+    budget = get_run_budget()
+    seconds_left = get_run_token().remaining()
+    deadline_near = seconds_left is not None and seconds_left < REPORT_SINGLE_PASS_SECONDS
+    with span("report", context_tokens=estimate_tokens(context), steps=len(completed_steps)) as report_span:
+        if budget.degraded("single_pass_report") or deadline_near:
+            remaining = budget.remaining_tokens()
+            max_tokens = MAP_REDUCE_THRESHOLD_TOKENS if remaining is None else min(MAP_REDUCE_THRESHOLD_TOKENS, remaining // 2)
+            if estimate_tokens(context) > max_tokens:
+                context = compact_context(completed_steps, max_tokens)
+            report = report_writer(context)
+            mode = "single-pass (deadline)" if deadline_near else "single-pass (budget)"
+        elif estimate_tokens(context) <= MAP_REDUCE_THRESHOLD_TOKENS:
+            report = report_writer(context)
+            mode = "single-shot"
+        else:
+            report = map_reduce_report_writer(query, completed_steps)
+            mode = "map-reduce"
+        report_span.set(writer=mode, report_tokens=estimate_tokens(report))
+    logging.info(f"Report written with {mode} writer in {time.perf_counter() - start:.1f}s")
+    return report
 
 
 def eval_agent(context, research_target, max_attempts=3):
     """Evaluates if the generated report meets the research target. If not, reruns report_writer up to 3 times."""
     for attempt in range(1, max_attempts + 1):
         report = report_writer(context)
+        if get_run_budget().degraded("skip_eval"):
+            logging.info("Report evaluation skipped: run budget is running low.")
+            return report
         eval_prompt = (
             f"Research Target: {research_target}\n\n"
             f"Generated Report:\n{report}\n\n"
             "As an evaluation agent, assess if the report fully and satisfactorily meets the research target. "
             "Reply with 'YES' if it does, or 'NO' if it does not. If 'NO', briefly state what is missing or could be improved."
         )
-        eval_response = client.chat.completions.create(
-            model="model-router",
-            messages=[
+        eval_response = chat_completion(
+            "evaluator",
+            [
                 {"role": "system", "content": "You are a critical research report evaluator."},
                 {"role": "user", "content": eval_prompt},
             ],